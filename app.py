@@ -4,7 +4,9 @@ from flask_migrate import Migrate
 
 import config
 from models.db_models import db
+from routes.commands import commands_bp
 from routes.summoner import summoner_bp
+from routes.summoner_async import summoner_async_bp
 from routes.main import main_bp
 
 
@@ -26,7 +28,9 @@ def create_app():
 
 app = create_app()
 app.register_blueprint(summoner_bp)
+app.register_blueprint(summoner_async_bp)
 app.register_blueprint(main_bp)
+app.register_blueprint(commands_bp)
 
 
 if __name__ == '__main__':
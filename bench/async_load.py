@@ -0,0 +1,96 @@
+"""Cold profile builds per second on one worker thread, sync vs async Riot calls.
+
+    python -m bench.async_load --profiles 20 --concurrency 10 --latency 0.05
+
+Builds the same unknown summoners from scratch (lookup, rank, first page of
+matches) against a local fake Riot server, once per mode, each on a fresh
+database:
+
+  sync   sync_summoner() one profile after another, as a sync worker thread does
+  async  AsyncSummonerData.create() + sync() for --concurrency profiles at a time,
+         all on one event loop
+
+Reports the latency of one profile build, profiles/s and Riot requests/s for
+each mode. Needs aiohttp.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from bench.common import create_bench_app
+from bench.fake_riot import FakeRiot, FakeRiotServer
+from models.api_handler import APIHandler
+from models.async_summoner_data import AsyncSummonerData
+from models.database_handler import INITIAL_SYNC_MATCHES, summoner_cache
+from models.summoner_data import sync_summoner
+from utils.async_request_utils import create_session
+
+
+def run_sync(summoner_names: list) -> list:
+    latencies = []
+    for summoner_name in summoner_names:
+        start = time.perf_counter()
+        sync_summoner(summoner_name, "bench", "EUW1")
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def run_async(summoner_names: list, concurrency: int) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async with create_session() as session:
+        async def build(summoner_name: str) -> None:
+            async with semaphore:
+                start = time.perf_counter()
+                summoner = await AsyncSummonerData.create(summoner_name, "bench", "EUW1", session)
+                await summoner.sync()
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(build(summoner_name) for summoner_name in summoner_names))
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", type=int, default=20)
+    parser.add_argument("--matches", type=int, default=INITIAL_SYNC_MATCHES, help="games per summoner")
+    parser.add_argument("--concurrency", type=int, default=10, help="profiles built at once in async mode")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds the fake server waits per request")
+    parser.add_argument("--app-rate-limit", default="100000:10", help="X-App-Rate-Limit advertised by the fake server")
+    args = parser.parse_args()
+
+    os.environ.setdefault("RIOT_API_KEY", "bench")
+    modes = {
+        "sync": lambda names: run_sync(names),
+        "async": lambda names: asyncio.run(run_async(names, args.concurrency)),
+    }
+
+    print(f"{'mode':<6} {'seconds':>8} {'profiles/s':>11} {'requests/s':>11} {'p50 build':>10} {'p95 build':>10}")
+    for mode, run in modes.items():
+        # Every mode starts from scratch: same histories, a new database and an empty summoner cache
+        riot = FakeRiot(summoners=args.profiles, matches_per_summoner=args.matches)
+        summoner_names = [summoner["name"] for summoner in riot.summoners.values()]
+        headers = {"X-App-Rate-Limit": args.app_rate_limit}
+        with tempfile.TemporaryDirectory() as directory, FakeRiotServer(riot, latency=args.latency, headers=headers) as server:
+            APIHandler.api_base_url = server.api_base_url
+            app = create_bench_app(f"sqlite:///{os.path.join(directory, f'{mode}.db')}")
+            summoner_cache.clear()
+
+            with app.app_context():
+                start = time.perf_counter()
+                latencies = run(summoner_names)
+                elapsed = time.perf_counter() - start
+
+        p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+        print(
+            f"{mode:<6} {elapsed:>8.2f} {len(summoner_names) / elapsed:>11.1f} {server.request_count / elapsed:>11.1f}"
+            f" {statistics.median(latencies):>10.3f} {p95:>10.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
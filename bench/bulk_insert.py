@@ -0,0 +1,70 @@
+"""Rows/second of DatabaseHandler.save_matches_data_to_db on a SQLite file.
+
+    python -m bench.bulk_insert --matches 10000
+
+"row by row" is the previous write path (ORM objects and one commit per
+game); "bulk" is the current batched insert in a single transaction. The bulk
+save is then repeated to check that rerunning it adds no duplicate rows.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from bench.common import create_bench_app
+from bench.fake_riot import FakeRiot
+from models.api_handler import APIHandler
+from models.database_handler import DatabaseHandler
+from models.db_models import db, MatchModel, MatchParticipantModel
+from models.match_stats import MatchStats
+
+
+class BenchSummoner(DatabaseHandler, APIHandler, MatchStats):
+    def __init__(self, puuid: str) -> None:
+        self.puuid = puuid
+
+
+def save_row_by_row(summoner: BenchSummoner, matches_data: dict) -> None:
+    for match_id, game_data in matches_data.items():
+        db.session.add(MatchModel(**summoner._match_row(match_id, game_data)))
+        for participant_row in summoner._participant_rows(match_id, game_data):
+            db.session.add(MatchParticipantModel(**participant_row))
+        db.session.commit()
+
+
+def timed_save(save, summoner: BenchSummoner, matches_data: dict, directory: str, name: str) -> tuple:
+    app = create_bench_app(f"sqlite:///{os.path.join(directory, name)}.db")
+    with app.app_context():
+        start = time.perf_counter()
+        save(summoner, matches_data)
+        elapsed = time.perf_counter() - start
+
+        rerun = None
+        if save is not save_row_by_row:
+            save(summoner, matches_data)
+            rerun = MatchModel.query.count()
+        return elapsed, MatchModel.query.count(), rerun
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--matches", type=int, default=10000)
+    args = parser.parse_args()
+
+    riot = FakeRiot(summoners=1, matches_per_summoner=args.matches)
+    puuid = next(iter(riot.match_ids))
+    summoner = BenchSummoner(puuid)
+    matches_data = {
+        match_id: summoner._parse_match_data(riot.matches[match_id]) for match_id in riot.match_ids[puuid]
+    }
+
+    print(f"{'write path':<12} {'rows':>7} {'seconds':>9} {'rows/s':>10} {'rows after rerun':>17}")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, save in (("row by row", save_row_by_row), ("bulk", BenchSummoner.save_matches_data_to_db)):
+            elapsed, rows, rerun = timed_save(save, summoner, matches_data, directory, name.replace(" ", "_"))
+            rerun = "-" if rerun is None else rerun
+            print(f"{name:<12} {rows:>7} {elapsed:>9.2f} {rows / elapsed:>10.0f} {rerun:>17}")
+
+
+if __name__ == "__main__":
+    main()
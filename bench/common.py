@@ -0,0 +1,61 @@
+"""Helpers shared by the benchmarks: a Flask app bound to a throwaway database."""
+import os
+
+from flask import Flask
+
+from models.database_handler import summoner_cache_key
+from models.db_models import db
+from routes.commands import commands_bp
+from routes.main import main_bp
+from routes.summoner import backfill_key, summoner_bp
+from utils.raw_cache import use_raw_match_cache
+from utils.sync_queue import sync_queue
+
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def create_bench_app(database_uri: str, raw_match_cache_path: str = None) -> Flask:
+    """Same setup as app.create_app, without the config module (which holds the real settings).
+
+    The raw match cache is off unless raw_match_cache_path is given, so every run hits the (fake) API
+    and nothing is written to the real instance/ folder.
+    """
+    use_raw_match_cache(raw_match_cache_path)
+    app = Flask("app", root_path=ROOT_PATH)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+
+    app.register_blueprint(summoner_bp)
+    app.register_blueprint(main_bp)
+    app.register_blueprint(commands_bp)
+    return app
+
+
+def wait_for_sync(region: str, summoner_name: str, timeout: float = 120, raise_error: bool = True, backfill: bool = True) -> None:
+    """Waits for the background sync a summoner page view queued, and for the backfill of older matches
+    that follows it unless backfill is False, re-raising the error of a job that failed."""
+    jobs = [("sync", summoner_cache_key(region, summoner_name))]
+    if backfill:
+        jobs.append(("backfill", backfill_key(region, summoner_name)))
+    for what, key in jobs:
+        job = sync_queue.job(key)
+        if job is None:
+            continue
+        if not job.wait(timeout):
+            raise TimeoutError(f"{what} of {summoner_name} still {job.state} after {timeout} seconds")
+        if job.error is not None and raise_error:
+            raise job.error
+
+
+def load_profile(client, region: str, summoner_name: str):
+    """GETs a summoner page the way a browser ends up seeing it: waits for the sync and reloads if it was still syncing."""
+    response = client.get(f"/summoners/{region}/{summoner_name}")
+    wait_for_sync(region, summoner_name, raise_error=False)
+    if response.status_code == 202:
+        response = client.get(f"/summoners/{region}/{summoner_name}")
+    return response
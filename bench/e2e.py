@@ -0,0 +1,244 @@
+"""End-to-end cost of the summoner page, as JSON for tracking across commits.
+
+    python -m bench.e2e --summoners 20 --matches 100 --output e2e.json
+    python -m bench.e2e --fixtures test/fixtures/synthetic
+
+Serves /summoners/<region>/<name> through the Flask test client against the
+fake Riot server (or the fixtures of bench.riot_fixtures with --fixtures,
+offline) and a fresh database, viewing every summoner once per scenario:
+
+  cold            unknown summoner: first response (202), sync, full page.
+                  Each backfill is awaited afterwards, outside the measure, so
+                  the database ends up seeded with summoners x matches games
+  warm            known summoner with fresh data, not in the summoner or page cache
+  warm_cached     the same view again, served from the page cache
+  warm_new_games  --new-games more games on Riot and an expired match list:
+                  stale page, sync of the new games, fresh page
+
+For each scenario it reports the percentiles of the first response and of the
+fresh page, the SQL statements and Riot calls (on every thread, with the
+backfill of older games counted apart) and the tracemalloc peak. The summoner
+and page caches are emptied between scenarios. Latencies include the
+tracemalloc overhead; --no-memory turns it off. Needs no API key or network
+access.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import ExitStack
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+
+from bench.common import ROOT_PATH, create_bench_app, wait_for_sync
+from bench.fake_riot import FakeRiot, FakeRiotServer
+from bench.riot_fixtures import recorded_summoners
+from models.api_handler import APIHandler
+from models.database_handler import summoner_cache
+from models.db_models import db, SummonerModel
+from routes.summoner import page_cache
+from utils.request_utils import BACKGROUND, current_priority, get_session, use_transport
+
+
+PERCENTILES = (50, 90, 99)
+COUNTED = ("sql_statements", "riot_calls", "background_sql_statements", "background_riot_calls")
+
+
+class Totals:
+    """SQL statements and Riot calls made on any thread while the benchmark runs, with the ones
+    of BACKGROUND work (the backfill of older games) counted apart."""
+
+    def __init__(self, engine) -> None:
+        self.counts = Counter()
+        self._lock = threading.Lock()
+        event.listen(engine, "before_cursor_execute", self._count_statement)
+        get_session().hooks["response"].append(self._count_call)
+
+    def _count(self, what: str) -> None:
+        if current_priority() == BACKGROUND:
+            what = f"background_{what}"
+        with self._lock:
+            self.counts[what] += 1
+
+    def _count_statement(self, *args) -> None:
+        self._count("sql_statements")
+
+    def _count_call(self, response, *args, **kwargs) -> None:
+        self._count("riot_calls")
+
+    def snapshot(self) -> Counter:
+        with self._lock:
+            return Counter(self.counts)
+
+
+def percentiles(values: list) -> dict:
+    """Nearest-rank percentiles, mean and max of a list of seconds, in milliseconds."""
+    ordered = sorted(values)
+    summary = {f"p{percentile}": ordered[max(0, -(-len(ordered) * percentile // 100) - 1)] for percentile in PERCENTILES}
+    summary.update(mean=sum(ordered) / len(ordered), max=ordered[-1])
+    return {key: round(value * 1000, 2) for key, value in summary.items()}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT_PATH, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def clear_caches() -> None:
+    summoner_cache.clear()
+    page_cache.clear()
+
+
+def run_scenario(totals: Totals, summoners: list, view, trace_memory: bool, before_view=None, after_view=None) -> dict:
+    """Calls view(region, name) for every summoner; view returns (first response, fresh page) seconds.
+    before_view(region, name) and after_view(region, name) run outside the measure around each view."""
+    first_responses, fresh_pages = [], []
+    counts = Counter()
+    peak = 0
+
+    for region, summoner_name in summoners:
+        if before_view:
+            before_view(region, summoner_name)
+        if trace_memory:
+            tracemalloc.reset_peak()
+        counts_before = totals.snapshot()
+        first_response, fresh_page = view(region, summoner_name)
+        counts.update(totals.snapshot() - counts_before)
+        if trace_memory:
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+        if after_view:
+            after_view(region, summoner_name)
+
+        first_responses.append(first_response)
+        fresh_pages.append(fresh_page)
+
+    scenario = {
+        "views": len(summoners),
+        "first_response_ms": percentiles(first_responses),
+        "fresh_page_ms": percentiles(fresh_pages),
+    }
+    for what in COUNTED:
+        scenario[what] = {"total": counts[what], "per_view": round(counts[what] / len(summoners), 2)}
+    scenario["peak_memory_bytes"] = peak if trace_memory else None
+    return scenario
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--summoners", type=int, default=20)
+    parser.add_argument("--matches", type=int, default=100, help="games per summoner")
+    parser.add_argument("--new-games", type=int, default=2, help="games added before warm_new_games")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds each Riot response takes")
+    parser.add_argument("--app-rate-limit", default="100000:10", help="X-App-Rate-Limit advertised by the fake server")
+    parser.add_argument("--fixtures", help="replay this bench.riot_fixtures directory instead of the fake server (no warm_new_games)")
+    parser.add_argument("--no-memory", action="store_true", help="do not trace memory (lower latencies, no peak_memory_bytes)")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    os.environ.setdefault("RIOT_API_KEY", "bench")
+    trace_memory = not args.no_memory
+    report = {
+        "commit": git_commit(),
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "parameters": {key: value for key, value in vars(args).items() if key != "output"},
+        "scenarios": {},
+    }
+
+    with ExitStack() as stack:
+        directory = stack.enter_context(tempfile.TemporaryDirectory())
+        if args.fixtures:
+            riot = None
+            summoners = recorded_summoners(args.fixtures)
+            use_transport("replay", args.fixtures, latency=args.latency)
+            stack.callback(use_transport, None)
+        else:
+            riot = FakeRiot(summoners=args.summoners, matches_per_summoner=args.matches)
+            summoners = [("EUW1", summoner["name"]) for summoner in riot.summoners.values()]
+            headers = {"X-App-Rate-Limit": args.app_rate_limit}
+            server = stack.enter_context(FakeRiotServer(riot, latency=args.latency, headers=headers))
+            APIHandler.api_base_url = server.api_base_url
+
+        app = create_bench_app(f"sqlite:///{os.path.join(directory, 'e2e.db')}")
+        client = app.test_client()
+        stack.enter_context(app.app_context())
+        totals = Totals(db.engine)
+        if trace_memory:
+            tracemalloc.start()
+            stack.callback(tracemalloc.stop)
+
+        def get(region: str, summoner_name: str) -> int:
+            status_code = client.get(f"/summoners/{region}/{summoner_name}").status_code
+            assert status_code in (200, 202), f"{summoner_name}: {status_code}"
+            return status_code
+
+        def view(region: str, summoner_name: str) -> tuple:
+            """A view that needs no sync: the first response is already the fresh page."""
+            start = time.perf_counter()
+            get(region, summoner_name)
+            first_response = time.perf_counter() - start
+            return first_response, first_response
+
+        def view_after_sync(region: str, summoner_name: str) -> tuple:
+            """A view that queues a sync: the first response (202 or stale page), then the page once the sync is done."""
+            start = time.perf_counter()
+            get(region, summoner_name)
+            first_response = time.perf_counter() - start
+            wait_for_sync(region, summoner_name, backfill=False)
+            get(region, summoner_name)
+            return first_response, time.perf_counter() - start
+
+        def expire_match_list(region: str, summoner_name: str) -> None:
+            summoner = riot.summoners[summoner_name.lower()]
+            riot.add_games(summoner["puuid"], args.new_games)
+            db.session.execute(
+                db.update(SummonerModel)
+                .where(SummonerModel.summoner_puuid == summoner["puuid"])
+                .values(matches_synced_at=SummonerModel.matches_synced_at - 10 ** 7)
+            )
+            db.session.commit()
+
+        clear_caches()
+        report["scenarios"]["cold"] = run_scenario(totals, summoners, view_after_sync, trace_memory, after_view=wait_for_sync)
+
+        clear_caches()
+        report["scenarios"]["warm"] = run_scenario(totals, summoners, view, trace_memory)
+        report["scenarios"]["warm_cached"] = run_scenario(totals, summoners, view, trace_memory)
+
+        clear_caches()
+        if riot is not None:
+            report["scenarios"]["warm_new_games"] = run_scenario(totals, summoners, view_after_sync, trace_memory, before_view=expire_match_list)
+        else:
+            report["scenarios"]["warm_new_games"] = {"skipped": "fixtures hold no newer games"}
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+    for name, scenario in report["scenarios"].items():
+        if "skipped" not in scenario:
+            print(
+                f"{name:<15} fresh p50 {scenario['fresh_page_ms']['p50']:>8.1f} ms  p99 {scenario['fresh_page_ms']['p99']:>8.1f} ms"
+                f"  SQL/view {scenario['sql_statements']['per_view']:>7.1f}  HTTP/view {scenario['riot_calls']['per_view']:>6.1f}",
+                file=sys.stderr,
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+"""Local stand-in for the Riot API used by the benchmarks in this directory.
+
+It serves the four endpoints the app uses (summoner by name, league entries,
+match ids by puuid and match details) from a deterministic synthetic history,
+so runs are repeatable and need no API key or network access.
+"""
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from utils.request_utils import method_key
+from utils.season_constants import SEASON_START_TIMESTAMP
+
+
+CHAMPIONS = [
+    "Aatrox", "Ahri", "Akali", "Alistar", "Amumu", "Annie", "Ashe", "Bard", "Brand", "Braum",
+    "Caitlyn", "Camille", "Darius", "Diana", "Draven", "Ekko", "Ezreal", "Fiora", "Garen", "Gwen",
+]
+POSITIONS = ["TOP", "JUNGLE", "MIDDLE", "BOTTOM", "UTILITY"]
+QUEUES = [420, 420, 420, 440, 400, 450]
+ITEMS = [1001, 1004, 1006, 1011, 1018, 0]
+SPELLS = [1, 3, 4, 6, 7, 11, 12, 14, 21]
+
+FIRST_GAME_ID = 6300000000
+GAME_INTERVAL = 30 * 60
+
+
+class FakeRiot:
+    """Synthetic Riot backend: summoners, their match histories and the match payloads."""
+
+    def __init__(self, summoners: int = 1, matches_per_summoner: int = 100, seed: int = 0) -> None:
+        self.random = random.Random(seed)
+        self.summoners = {}
+        self.match_ids = {}
+        self.matches = {}
+        self.next_game_id = FIRST_GAME_ID
+        self.games_created = 0
+
+        for index in range(summoners):
+            self.add_summoner(f"Bench Summoner {index}", matches_per_summoner)
+
+    def add_summoner(self, summoner_name: str, matches: int) -> dict:
+        index = len(self.summoners)
+        summoner = {
+            "id": f"bench-id-{index:05d}",
+            "accountId": f"bench-account-{index:05d}",
+            "puuid": f"bench-puuid-{index:05d}",
+            "name": summoner_name,
+            "profileIconId": 1 + index % 20,
+            "summonerLevel": 30 + index,
+        }
+        self.summoners[summoner_name.lower()] = summoner
+        self.match_ids[summoner["puuid"]] = []
+        self.add_games(summoner["puuid"], matches)
+        return summoner
+
+    def add_games(self, puuid: str, count: int) -> list:
+        """Appends count new games (newest last played) to the history of puuid."""
+        return self.add_premade_games([puuid], count)
+
+    def add_premade_games(self, puuids: list, count: int) -> list:
+        """Appends count new games played together by every puuid in puuids."""
+        new_ids = []
+        for _ in range(count):
+            game_id = self.next_game_id
+            self.next_game_id += self.random.randint(1, 5000)
+            match_id = f"EUW1_{game_id}"
+            game_creation = (SEASON_START_TIMESTAMP + self.games_created * GAME_INTERVAL) * 1000
+            self.games_created += 1
+            self.matches[match_id] = self._match(match_id, game_id, game_creation, puuids)
+            for puuid in puuids:
+                self.match_ids[puuid].insert(0, match_id)
+            new_ids.append(match_id)
+        return new_ids
+
+    def _match(self, match_id: str, game_id: int, game_creation: int, puuids: list) -> dict:
+        rng = self.random
+        champions = rng.sample(CHAMPIONS, 10)
+        tracked_slots = dict(zip(rng.sample(range(10), len(puuids)), puuids))
+        blue_win = rng.random() < 0.5
+        queue_id = rng.choice(QUEUES)
+        participants = []
+
+        for slot in range(10):
+            team_id = 100 if slot < 5 else 200
+            participants.append({
+                "puuid": tracked_slots.get(slot, f"bench-random-{game_id}-{slot}"),
+                "summonerName": f"Player {game_id % 1000}-{slot}",
+                "championName": champions[slot],
+                "teamId": team_id,
+                "teamPosition": POSITIONS[slot % 5],
+                "win": blue_win == (team_id == 100),
+                "kills": rng.randint(0, 15),
+                "deaths": rng.randint(0, 12),
+                "assists": rng.randint(0, 20),
+                "totalMinionsKilled": rng.randint(0, 250),
+                "neutralMinionsKilled": rng.randint(0, 40),
+                "visionScore": rng.randint(0, 60),
+                "summoner1Id": rng.choice(SPELLS),
+                "summoner2Id": rng.choice(SPELLS),
+                **{f"item{item}": rng.choice(ITEMS) for item in range(7)},
+            })
+
+        return {
+            "metadata": {
+                "matchId": match_id,
+                "participants": [participant["puuid"] for participant in participants],
+            },
+            "info": {
+                "gameId": game_id,
+                "gameCreation": game_creation,
+                "gameDuration": rng.randint(900, 2400),
+                "gameMode": "ARAM" if queue_id == 450 else "CLASSIC",
+                "queueId": queue_id,
+                "participants": participants,
+            },
+        }
+
+    def route(self, path: str, params: dict):
+        """Returns (status, body) for a Riot API path relative to /lol/."""
+        parts = [unquote(part) for part in path.strip("/").split("/")]
+
+        if parts[:4] == ["summoner", "v4", "summoners", "by-name"]:
+            # Como Riot, sin distinguir mayúsculas ni espacios
+            name_key = "".join(parts[4].split()).lower()
+            summoner = next((summoner for name, summoner in self.summoners.items() if "".join(name.split()) == name_key), None)
+            return (200, summoner) if summoner else (404, {"status": {"status_code": 404}})
+
+        if parts[:4] == ["league", "v4", "entries", "by-summoner"]:
+            return 200, [{
+                "queueType": "RANKED_SOLO_5x5",
+                "tier": "GOLD",
+                "rank": "II",
+                "leaguePoints": 42,
+                "wins": 60,
+                "losses": 55,
+            }]
+
+        if parts[:4] == ["match", "v5", "matches", "by-puuid"]:
+            match_ids = self.match_ids.get(parts[4], [])
+            start_time = int(params.get("startTime", 0))
+            end_time = int(params.get("endTime", 2 ** 62))
+            match_ids = [
+                match_id for match_id in match_ids
+                if start_time <= self.matches[match_id]["info"]["gameCreation"] // 1000 <= end_time
+            ]
+            start = int(params.get("start", 0))
+            return 200, match_ids[start:start + int(params.get("count", 20))]
+
+        if parts[:3] == ["match", "v5", "matches"]:
+            match = self.matches.get(parts[3])
+            return (200, match) if match else (404, {"status": {"status_code": 404}})
+
+        return 404, {"status": {"status_code": 404}}
+
+
+class FakeRiotServer:
+    """Serves a FakeRiot backend over HTTP on localhost in a background thread.
+
+    Use as a context manager; `api_base_url` is meant for APIHandler.api_base_url.
+    """
+
+    def __init__(self, riot: FakeRiot, latency: float = 0.0, headers: dict = None) -> None:
+        self.riot = riot
+        self.latency = latency
+        self.headers = headers or {}
+        self.request_count = 0
+        # Requests received per endpoint, with the ids blanked out as in method_key
+        self.endpoints = Counter()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def api_base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/{{region}}/lol/"
+
+    def __enter__(self) -> "FakeRiotServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                with fake._lock:
+                    fake.request_count += 1
+                    fake.endpoints[method_key(url.path.split("/lol/", 1)[-1])] += 1
+                if fake.latency:
+                    time.sleep(fake.latency)
+
+                params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                status, body = fake.riot.route(url.path.split("/lol/", 1)[-1], params)
+                payload = json.dumps(body).encode()
+
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json;charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in fake.headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
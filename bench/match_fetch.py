@@ -0,0 +1,57 @@
+"""Wall-clock time of APIHandler._matches_data against a local fake Riot server.
+
+    python -m bench.match_fetch --matches 200 --latency 0.05
+
+Each run fetches the same match ids with a different number of requests in
+flight, so the table shows how the fetch time scales with concurrency. The
+raw match cache is off, so every run downloads every match.
+"""
+import argparse
+import time
+
+from bench.fake_riot import FakeRiot, FakeRiotServer
+from models.api_handler import APIHandler
+from models.match_stats import MatchStats
+from utils.raw_cache import use_raw_match_cache
+
+
+class BenchSummoner(APIHandler, MatchStats):
+    def __init__(self, api_base_url: str, puuid: str) -> None:
+        self.api_base_url = api_base_url
+        self.api_key = "bench"
+        self.region = "EUW1"
+        self.puuid = puuid
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--matches", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds the fake server waits per request")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--app-rate-limit", default="500:10,30000:600",
+                        help="X-App-Rate-Limit advertised by the fake server (production key limits by default)")
+    args = parser.parse_args()
+    use_raw_match_cache(None)
+
+    riot = FakeRiot(summoners=1, matches_per_summoner=args.matches)
+    puuid = next(iter(riot.match_ids))
+    match_ids = riot.match_ids[puuid]
+
+    headers = {"X-App-Rate-Limit": args.app_rate_limit}
+    with FakeRiotServer(riot, latency=args.latency, headers=headers) as server:
+        summoner = BenchSummoner(server.api_base_url, puuid)
+        baseline = None
+
+        print(f"{'workers':>8} {'seconds':>9} {'matches/s':>10} {'speedup':>8}")
+        for workers in args.workers:
+            start = time.perf_counter()
+            matches_data = summoner._matches_data(match_ids, max_workers=workers)
+            elapsed = time.perf_counter() - start
+
+            assert list(matches_data) == match_ids
+            baseline = baseline or elapsed
+            print(f"{workers:>8} {elapsed:>9.2f} {len(match_ids) / elapsed:>10.1f} {baseline / elapsed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""SQL statements and Riot API calls made by one summoner page view.
+
+    python -m bench.page_view_counts
+
+Counts what SummonerData construction and a /summoners/<region>/<name> view
+cost for a new summoner, a known summoner, a known summoner whose entry is not
+in the in-process summoner cache (e.g. after a restart) and a known summoner
+whose rank, profile or match list has outlived its TTL. SQL statements and
+Riot calls are counted on the thread that serves the request; the Riot calls of
+the background sync the view queues are reported apart. Exits with status 1 if
+a count goes over its budget in BUDGETS.
+"""
+import os
+import sys
+import tempfile
+import threading
+from collections import Counter
+
+from sqlalchemy import event
+
+from bench.common import create_bench_app, wait_for_sync
+from bench.fake_riot import FakeRiot, FakeRiotServer
+from models.api_handler import APIHandler
+from models.database_handler import summoner_cache
+from models.db_models import db, SummonerModel
+from models.summoner_data import SummonerData
+from utils.request_utils import get_session, method_key
+
+
+# (case, what) -> (max SQL statements, max Riot calls on the request thread, max Riot calls in the background)
+BUDGETS = {
+    ("new", "page view"): (None, 0, None),
+    ("known", "construction"): (0, 0, 0),
+    ("known, cache miss", "construction"): (1, 0, 0),
+    ("known", "page view"): (6, 0, 0),
+    ("known, page cached", "page view"): (1, 0, 0),
+    ("known, rank expired", "page view"): (None, 0, 1),
+    ("known, profile expired", "page view"): (None, 0, 1),
+    ("known, matches expired", "page view"): (None, 0, 1),
+}
+
+# Column that says when each kind of stored data was refreshed
+REFRESHED_AT = {"rank": "last_update", "profile": "profile_updated_at", "matches": "matches_synced_at"}
+
+
+class Counts:
+    """Counts the statements one thread sends to the database and the Riot calls made on and off that thread."""
+
+    def __init__(self, engine) -> None:
+        self.thread = threading.current_thread()
+        self.statements = 0
+        self.calls = Counter()
+        self.background_calls = Counter()
+        self._lock = threading.Lock()
+        event.listen(engine, "before_cursor_execute", self._count_statement)
+        get_session().hooks["response"].append(self._count_call)
+
+    def _count_statement(self, *args) -> None:
+        if threading.current_thread() is self.thread:
+            self.statements += 1
+
+    def _count_call(self, response, *args, **kwargs) -> None:
+        calls = self.calls if threading.current_thread() is self.thread else self.background_calls
+        with self._lock:
+            calls[method_key(response.url).split("/lol/", 1)[-1]] += 1
+
+    def measure(self, action) -> tuple:
+        statements, calls, background_calls = self.statements, Counter(self.calls), Counter(self.background_calls)
+        action()
+        return self.statements - statements, self.calls - calls, self.background_calls - background_calls
+
+
+def main() -> int:
+    os.environ.setdefault("RIOT_API_KEY", "bench")
+    riot = FakeRiot(summoners=1, matches_per_summoner=60)
+    summoner_name = next(iter(riot.summoners.values()))["name"]
+
+    headers = {"X-App-Rate-Limit": "500:10,30000:600"}
+    with tempfile.TemporaryDirectory() as directory, FakeRiotServer(riot, headers=headers) as server:
+        APIHandler.api_base_url = server.api_base_url
+        app = create_bench_app(f"sqlite:///{os.path.join(directory, 'counts.db')}")
+        client = app.test_client()
+        summoner_cache.clear()
+
+        def page_view():
+            assert client.get(f"/summoners/EUW1/{summoner_name}").status_code in (200, 202)
+            wait_for_sync("EUW1", summoner_name)
+
+        def construction():
+            SummonerData(summoner_name, "bench", "EUW1")
+
+        def expire(kind):
+            column = getattr(SummonerModel, REFRESHED_AT[kind])
+            db.session.execute(db.update(SummonerModel).values({column: column - 10 ** 7}))
+            db.session.commit()
+
+        with app.app_context():
+            counts = Counts(db.engine)
+            results = [
+                ("new", "page view", counts.measure(page_view)),
+                ("known", "construction", counts.measure(construction)),
+                ("known", "page view", counts.measure(page_view)),
+                ("known, page cached", "page view", counts.measure(page_view)),
+            ]
+            for kind in REFRESHED_AT:
+                expire(kind)
+                results.append((f"known, {kind} expired", "page view", counts.measure(page_view)))
+            summoner_cache.clear()
+            results.append(("known, cache miss", "construction", counts.measure(construction)))
+
+    failures = 0
+    print(f"{'summoner':<22} {'measured':<13} {'SQL':>5} {'HTTP':>5} {'sync HTTP':>10}  background endpoints")
+    for case, what, (statements, calls, background_calls) in results:
+        measured = (statements, sum(calls.values()), sum(background_calls.values()))
+        budget = BUDGETS.get((case, what), (None, None, None))
+        over = any(limit is not None and value > limit for value, limit in zip(measured, budget))
+        failures += over
+        endpoints = ", ".join(f"{count}x {path}" for path, count in sorted(background_calls.items()))
+        print(f"{case:<22} {what:<13} {measured[0]:>5} {measured[1]:>5} {measured[2]:>10}  {endpoints}{'  OVER BUDGET' if over else ''}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
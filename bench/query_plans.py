@@ -0,0 +1,90 @@
+"""Query-plan regression check for the summoner page on SQLite.
+
+    python -m bench.query_plans
+
+Loads a profile twice (cold, then warm) through the Flask test client against
+the fake Riot server, records every SELECT the page runs and checks its
+EXPLAIN QUERY PLAN. Exits with status 1 if a query scans a whole table instead
+of searching an index, so a dropped index or a rewritten query that can no
+longer use one shows up before it reaches production.
+"""
+import os
+import re
+import sys
+import tempfile
+
+from sqlalchemy import event
+
+from bench.common import create_bench_app, load_profile
+from bench.fake_riot import FakeRiot, FakeRiotServer
+from models.api_handler import APIHandler
+from models.db_models import db
+
+
+FULL_SCAN = re.compile(r"\bSCAN (\w+)")
+
+# (table, fragment of the statement) pairs that are allowed to scan the table
+ALLOWED_SCANS = []
+
+
+def record_statements(engine) -> list:
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "INSERT INTO", "UPDATE", "DELETE")) and not executemany:
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    return statements
+
+
+def full_scans(statement: str, parameters, tables: set) -> list:
+    plan = db.session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    details = [row[-1] for row in plan]
+    scans = [
+        table for detail in details for table in FULL_SCAN.findall(detail)
+        if table in tables and not any(table == allowed and fragment in statement for allowed, fragment in ALLOWED_SCANS)
+    ]
+    return scans, details
+
+
+def main() -> int:
+    os.environ.setdefault("RIOT_API_KEY", "bench")
+    riot = FakeRiot(summoners=3, matches_per_summoner=120)
+
+    headers = {"X-App-Rate-Limit": "500:10,30000:600"}
+    with tempfile.TemporaryDirectory() as directory, FakeRiotServer(riot, headers=headers) as server:
+        APIHandler.api_base_url = server.api_base_url
+        app = create_bench_app(f"sqlite:///{os.path.join(directory, 'plans.db')}")
+        client = app.test_client()
+
+        with app.app_context():
+            # Other summoners in the database, so the queries have rows to skip
+            for summoner in list(riot.summoners.values())[1:]:
+                load_profile(client, "EUW1", summoner["name"])
+
+            statements = record_statements(db.engine)
+            summoner_name = next(iter(riot.summoners.values()))["name"]
+            for _ in range(2):
+                response = load_profile(client, "EUW1", summoner_name)
+                assert response.status_code == 200, response.status_code
+
+            tables = set(db.metadata.tables)
+            failures = 0
+            seen = set()
+            for statement, parameters in list(statements):
+                if statement in seen:
+                    continue
+                seen.add(statement)
+                scans, details = full_scans(statement, parameters, tables)
+                failures += bool(scans)
+                print(f"{'FULL SCAN ' + ', '.join(scans) if scans else 'ok':<24} {' '.join(statement.split())[:110]}")
+                for detail in details:
+                    print(f"{'':<26}{detail}")
+
+    print(f"\n{len(seen)} distinct statements, {failures} with full table scans")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""Records Riot API fixtures and replays the summoner sync from them, offline.
+
+    python -m bench.riot_fixtures record --out test/fixtures/synthetic --summoners 3 --matches 1000
+    RIOT_API_KEY=... python -m bench.riot_fixtures record --out test/fixtures/live --live "Flan de Nata"
+    python -m bench.riot_fixtures replay --fixtures test/fixtures/synthetic --latency 0.05 --rate-limit-rate 0.02
+
+record syncs each summoner from scratch (sync_summoner, then backfill_matches
+unless --no-backfill) on a throwaway database and writes every Riot response,
+rate limit headers included, to the fixture directory. By default the
+responses come from the synthetic FakeRiot history, so large histories cost
+nothing; with --live they come from the real API.
+
+replay runs the same syncs for every summoner found in a fixture directory
+with no network access: responses come from the fixtures after --latency
+seconds each ("recorded" to reuse the real timings), and --rate-limit-rate of
+them are turned into 429s. The seed makes the 429s land on the same requests
+every run. Reports the time, requests and stored matches of each summoner.
+"""
+import argparse
+import glob
+import json
+import os
+import tempfile
+import time
+
+from bench.common import create_bench_app
+from bench.fake_riot import FakeRiot, FakeRiotServer
+from models.api_handler import APIHandler
+from models.database_handler import summoner_cache, summoner_cache_key
+from models.db_models import MatchParticipantModel
+from models.summoner_data import backfill_matches, sync_summoner
+from utils.request_utils import use_transport
+
+
+def sync_from_scratch(summoners: list, api_key: str, backfill: bool = True) -> list:
+    """Syncs every (region, name) on a new database. Returns (region, name, seconds, stored matches) for each."""
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_bench_app(f"sqlite:///{os.path.join(directory, 'fixtures.db')}")
+        summoner_cache.clear()
+        with app.app_context():
+            for region, summoner_name in summoners:
+                start = time.perf_counter()
+                sync_summoner(summoner_name, api_key, region)
+                if backfill:
+                    backfill_matches(summoner_name, api_key, region)
+                elapsed = time.perf_counter() - start
+                summoner = summoner_cache.get(summoner_cache_key(region, summoner_name))
+                matches = MatchParticipantModel.query.filter_by(puuid=summoner["summoner_puuid"]).count() if summoner else 0
+                results.append((region, summoner_name, elapsed, matches))
+    return results
+
+
+def recorded_summoners(directory: str) -> list:
+    """(region, name) of every summoner found by name in a fixture directory."""
+    summoners = []
+    for path in sorted(glob.glob(os.path.join(directory, "*", "summoner", "v4", "summoners", "by-name", "*.json"))):
+        with open(path, encoding="utf-8") as file:
+            fixture = json.load(file)
+        if fixture["status"] == 200:
+            region = os.path.relpath(path, directory).split(os.sep)[0]
+            summoners.append((region.upper(), fixture["body"]["name"]))
+    return summoners
+
+
+def record(args) -> None:
+    if args.live:
+        api_key = os.environ["RIOT_API_KEY"]
+        summoners = [(args.region, summoner_name) for summoner_name in args.live]
+        use_transport("record", args.out)
+        results = sync_from_scratch(summoners, api_key, backfill=not args.no_backfill)
+    else:
+        riot = FakeRiot(summoners=args.summoners, matches_per_summoner=args.matches, seed=args.seed)
+        summoners = [(args.region, summoner["name"]) for summoner in riot.summoners.values()]
+        with FakeRiotServer(riot, headers={"X-App-Rate-Limit": args.app_rate_limit}) as server:
+            APIHandler.api_base_url = server.api_base_url
+            use_transport("record", args.out)
+            results = sync_from_scratch(summoners, "bench", backfill=not args.no_backfill)
+    use_transport(None)
+
+    files = len(glob.glob(os.path.join(args.out, "**", "*.json"), recursive=True))
+    for region, summoner_name, elapsed, matches in results:
+        print(f"recorded {region} {summoner_name}: {matches} matches in {elapsed:.2f}s")
+    print(f"{files} fixtures in {args.out}")
+
+
+def replay(args) -> None:
+    summoners = recorded_summoners(args.fixtures)
+    if not summoners:
+        raise SystemExit(f"No summoner fixtures in {args.fixtures}")
+    latency = args.latency if args.latency == "recorded" else float(args.latency)
+    adapter = use_transport(
+        "replay", args.fixtures, latency=latency, rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after, seed=args.seed,
+    )
+    try:
+        start = time.perf_counter()
+        results = sync_from_scratch(summoners, "replay", backfill=not args.no_backfill)
+        elapsed = time.perf_counter() - start
+    finally:
+        use_transport(None)
+
+    print(f"{'region':<6} {'summoner':<24} {'seconds':>8} {'matches':>8}")
+    for region, summoner_name, seconds, matches in results:
+        print(f"{region:<6} {summoner_name:<24} {seconds:>8.2f} {matches:>8}")
+    print(f"{adapter.request_count} requests ({adapter.rate_limited_count} answered with 429) in {elapsed:.2f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = subparsers.add_parser("record", help="sync summoners and write their Riot responses as fixtures")
+    record_parser.add_argument("--out", required=True, help="fixture directory")
+    record_parser.add_argument("--live", nargs="+", metavar="NAME", help="record these summoners from the real API (needs RIOT_API_KEY)")
+    record_parser.add_argument("--region", default="EUW1")
+    record_parser.add_argument("--summoners", type=int, default=3, help="synthetic summoners")
+    record_parser.add_argument("--matches", type=int, default=200, help="games per synthetic summoner")
+    record_parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic histories")
+    record_parser.add_argument("--app-rate-limit", default="500:10,30000:600", help="X-App-Rate-Limit of the synthetic responses")
+    record_parser.add_argument("--no-backfill", action="store_true", help="only the first sync, not the older games")
+    record_parser.set_defaults(run=record)
+
+    replay_parser = subparsers.add_parser("replay", help="sync every recorded summoner from the fixtures, offline")
+    replay_parser.add_argument("--fixtures", required=True, help="fixture directory")
+    replay_parser.add_argument("--latency", default="0", help='seconds per response, or "recorded"')
+    replay_parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of responses turned into 429s")
+    replay_parser.add_argument("--retry-after", type=float, default=1, help="Retry-After of the injected 429s")
+    replay_parser.add_argument("--seed", type=int, default=0, help="seed that picks the 429s")
+    replay_parser.add_argument("--no-backfill", action="store_true", help="only the first sync, not the older games")
+    replay_parser.set_defaults(run=replay)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""unique (summoner_puuid, match_id) on matches
+
+Revision ID: 0fcdceb9f4c1
+Revises: 6f1c2a9d4e07
+Create Date: 2026-10-17 10:03:54.118240
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0fcdceb9f4c1'
+down_revision = '6f1c2a9d4e07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Borra las partidas duplicadas antes de crear el indice unico, dejando la primera que se guardo
+    op.execute(
+        "DELETE FROM matches WHERE id NOT IN "
+        "(SELECT MIN(id) FROM matches GROUP BY summoner_puuid, match_id)"
+    )
+    op.create_index('uq_matches_summoner_puuid_match_id', 'matches', ['summoner_puuid', 'match_id'], unique=True)
+
+
+def downgrade():
+    op.drop_index('uq_matches_summoner_puuid_match_id', table_name='matches')
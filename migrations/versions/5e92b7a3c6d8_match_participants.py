@@ -0,0 +1,212 @@
+"""normalize matches into matches + match_participants
+
+Revision ID: 5e92b7a3c6d8
+Revises: d4a7c0e9b215
+Create Date: 2026-10-17 12:41:26.903117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e92b7a3c6d8'
+down_revision = 'd4a7c0e9b215'
+branch_labels = None
+depends_on = None
+
+
+STAT_COLUMNS = [
+    'win', 'kills', 'deaths', 'assists', 'kda', 'cs', 'vision', 'summoner_spell1', 'summoner_spell2',
+    'item0', 'item1', 'item2', 'item3', 'item4', 'item5', 'item6', 'team_position',
+]
+
+
+def participant_columns(match_id_foreign_key):
+    return [
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('match_id', sa.String(), nullable=False),
+        sa.Column('participant_index', sa.Integer(), nullable=False),
+        sa.Column('puuid', sa.String(), nullable=True),
+        sa.Column('summoner_name', sa.String(), nullable=True),
+        sa.Column('champion_name', sa.String(), nullable=True),
+        sa.Column('team_id', sa.Integer(), nullable=True),
+        sa.Column('team_position', sa.String(), nullable=True),
+        sa.Column('win', sa.Integer(), nullable=True),
+        sa.Column('kills', sa.Integer(), nullable=True),
+        sa.Column('deaths', sa.Integer(), nullable=True),
+        sa.Column('assists', sa.Integer(), nullable=True),
+        sa.Column('kda', sa.Float(), nullable=True),
+        sa.Column('cs', sa.Integer(), nullable=True),
+        sa.Column('vision', sa.Integer(), nullable=True),
+        sa.Column('summoner_spell1', sa.Integer(), nullable=True),
+        sa.Column('summoner_spell2', sa.Integer(), nullable=True),
+        sa.Column('item0', sa.Integer(), nullable=True),
+        sa.Column('item1', sa.Integer(), nullable=True),
+        sa.Column('item2', sa.Integer(), nullable=True),
+        sa.Column('item3', sa.Integer(), nullable=True),
+        sa.Column('item4', sa.Integer(), nullable=True),
+        sa.Column('item5', sa.Integer(), nullable=True),
+        sa.Column('item6', sa.Integer(), nullable=True),
+        sa.Column('game_start', sa.BigInteger(), nullable=True),
+        sa.Column('queue_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['match_id'], [match_id_foreign_key]),
+        sa.PrimaryKeyConstraint('id'),
+    ]
+
+
+def as_int(value):
+    return int(value) if value is not None else None
+
+
+def upgrade():
+    op.create_table('_matches_new',
+    sa.Column('match_id', sa.String(), nullable=False),
+    sa.Column('game_id', sa.BigInteger(), nullable=True),
+    sa.Column('game_start', sa.BigInteger(), nullable=True),
+    sa.Column('game_mode', sa.String(), nullable=True),
+    sa.Column('game_duration', sa.Integer(), nullable=True),
+    sa.Column('queue_id', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('match_id')
+    )
+    op.create_table('match_participants', *participant_columns('_matches_new.match_id'))
+
+    with op.batch_alter_table('summoners', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('matches_synced_until', sa.BigInteger(), nullable=True))
+
+    # Cada fila antigua es (partida, invocador seguido) con los 10 participantes en columnas.
+    # La partida se guarda una vez y cada invocador seguido rellena las estadisticas de su hueco,
+    # que se encuentra por campeon (no se repiten dentro de una partida).
+    connection = op.get_bind()
+    old_matches = sa.Table('matches', sa.MetaData(), autoload_with=connection)
+    new_matches = sa.Table('_matches_new', sa.MetaData(), autoload_with=connection)
+    participants = sa.Table('match_participants', sa.MetaData(), autoload_with=connection)
+
+    match_rows = {}
+    participant_rows = {}
+    for row in connection.execute(sa.select(old_matches).order_by(old_matches.c.id)).mappings():
+        match_id = row['match_id']
+        if match_id not in match_rows:
+            match_rows[match_id] = {
+                'match_id': match_id,
+                'game_id': row['game_id'],
+                'game_start': row['game_start'],
+                'game_mode': row['game_mode'],
+                'game_duration': row['game_duration'],
+                'queue_id': row['queue_id'],
+            }
+            participant_rows[match_id] = [
+                {
+                    'match_id': match_id,
+                    'participant_index': index - 1,
+                    'puuid': None,
+                    'summoner_name': row[f'participant{index}_summoner_name'],
+                    'champion_name': row[f'participant{index}_champion_name'],
+                    'team_id': as_int(row[f'participant{index}_team_id']),
+                    'game_start': row['game_start'],
+                    'queue_id': row['queue_id'],
+                    **dict.fromkeys(STAT_COLUMNS),
+                }
+                for index in range(1, 11)
+            ]
+
+        for participant in participant_rows[match_id]:
+            if participant['champion_name'] == row['champion_name'] and participant['puuid'] is None:
+                participant['puuid'] = row['summoner_puuid']
+                participant.update({column: row[column] for column in STAT_COLUMNS})
+                for column in ('kills', 'deaths', 'assists'):
+                    participant[column] = as_int(participant[column])
+                break
+
+    if match_rows:
+        connection.execute(new_matches.insert(), list(match_rows.values()))
+        connection.execute(participants.insert(), [row for rows in participant_rows.values() for row in rows])
+
+    op.drop_table('matches')
+    op.rename_table('_matches_new', 'matches')
+
+    with op.batch_alter_table('match_participants', schema=None) as batch_op:
+        batch_op.create_index('ix_match_participants_puuid_game_start', ['puuid', 'game_start'], unique=False)
+        batch_op.create_index('uq_match_participants_puuid_match_id', ['puuid', 'match_id'], unique=True)
+        batch_op.create_index('uq_match_participants_match_id_participant_index', ['match_id', 'participant_index'], unique=True)
+
+
+def downgrade():
+    old_columns = [
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('summoner_puuid', sa.String(), nullable=True),
+        sa.Column('match_id', sa.String(), nullable=True),
+        sa.Column('game_id', sa.BigInteger(), nullable=True),
+        sa.Column('game_start', sa.BigInteger(), nullable=True),
+        sa.Column('champion_name', sa.String(), nullable=True),
+        sa.Column('win', sa.Integer(), nullable=True),
+        sa.Column('kills', sa.Float(), nullable=True),
+        sa.Column('deaths', sa.Float(), nullable=True),
+        sa.Column('assists', sa.Float(), nullable=True),
+        sa.Column('kda', sa.Float(), nullable=True),
+        sa.Column('cs', sa.Integer(), nullable=True),
+        sa.Column('vision', sa.Integer(), nullable=True),
+        sa.Column('summoner_spell1', sa.Integer(), nullable=True),
+        sa.Column('summoner_spell2', sa.Integer(), nullable=True),
+        *[sa.Column(f'item{item}', sa.Integer(), nullable=True) for item in range(7)],
+        *[sa.Column(f'participant{index}_summoner_name', sa.String(), nullable=True) for index in range(1, 11)],
+        *[sa.Column(f'participant{index}_champion_name', sa.String(), nullable=True) for index in range(1, 11)],
+        *[sa.Column(f'participant{index}_team_id', sa.String(), nullable=True) for index in range(1, 11)],
+        sa.Column('game_mode', sa.String(), nullable=True),
+        sa.Column('game_duration', sa.Integer(), nullable=True),
+        sa.Column('queue_id', sa.Integer(), nullable=True),
+        sa.Column('team_position', sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(['summoner_puuid'], ['summoners.summoner_puuid']),
+        sa.PrimaryKeyConstraint('id'),
+    ]
+    op.create_table('_matches_old', *old_columns)
+
+    # Solo se pueden volver a guardar las partidas de los invocadores seguidos
+    connection = op.get_bind()
+    matches = sa.Table('matches', sa.MetaData(), autoload_with=connection)
+    participants = sa.Table('match_participants', sa.MetaData(), autoload_with=connection)
+    summoners = sa.Table('summoners', sa.MetaData(), autoload_with=connection)
+    old_matches = sa.Table('_matches_old', sa.MetaData(), autoload_with=connection)
+
+    lobbies = {}
+    for participant in connection.execute(sa.select(participants).order_by(participants.c.match_id, participants.c.participant_index)).mappings():
+        lobbies.setdefault(participant['match_id'], []).append(participant)
+    games = {match['match_id']: match for match in connection.execute(sa.select(matches)).mappings()}
+    tracked_puuids = {puuid for (puuid,) in connection.execute(sa.select(summoners.c.summoner_puuid))}
+
+    rows = []
+    for match_id, lobby in lobbies.items():
+        match = games[match_id]
+        for participant in lobby:
+            if participant['puuid'] not in tracked_puuids:
+                continue
+            row = {
+                'summoner_puuid': participant['puuid'],
+                'match_id': match_id,
+                'game_id': match['game_id'],
+                'game_start': match['game_start'],
+                'champion_name': participant['champion_name'],
+                'game_mode': match['game_mode'],
+                'game_duration': match['game_duration'],
+                'queue_id': match['queue_id'],
+                **{column: participant[column] for column in STAT_COLUMNS},
+            }
+            for index, slot in enumerate(lobby[:10], start=1):
+                row[f'participant{index}_summoner_name'] = slot['summoner_name']
+                row[f'participant{index}_champion_name'] = slot['champion_name']
+                row[f'participant{index}_team_id'] = str(slot['team_id']) if slot['team_id'] is not None else None
+            rows.append(row)
+    if rows:
+        connection.execute(old_matches.insert(), rows)
+
+    op.drop_table('match_participants')
+    op.drop_table('matches')
+    op.rename_table('_matches_old', 'matches')
+
+    with op.batch_alter_table('matches', schema=None) as batch_op:
+        batch_op.create_index('ix_matches_summoner_puuid_game_start', ['summoner_puuid', 'game_start'], unique=False)
+        batch_op.create_index('uq_matches_summoner_puuid_match_id', ['summoner_puuid', 'match_id'], unique=True)
+        batch_op.create_index('ix_matches_match_id', ['match_id'], unique=False)
+
+    with op.batch_alter_table('summoners', schema=None) as batch_op:
+        batch_op.drop_column('matches_synced_until')
@@ -0,0 +1,39 @@
+"""match game_id and game_start
+
+Revision ID: 6f1c2a9d4e07
+Revises: 2189ff368dff
+Create Date: 2026-10-17 09:12:31.284519
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f1c2a9d4e07'
+down_revision = '2189ff368dff'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('matches', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('game_id', sa.BigInteger(), nullable=True))
+        batch_op.add_column(sa.Column('game_start', sa.BigInteger(), nullable=True))
+        batch_op.create_index('ix_matches_summoner_puuid_game_start', ['summoner_puuid', 'game_start'], unique=False)
+
+    # game_id sale del propio match_id (EUW1_6345549710); game_start solo lo tiene la API,
+    # asi que las partidas ya guardadas se quedan sin el y se ordenan al final
+    matches = sa.table('matches', sa.column('id', sa.Integer), sa.column('match_id', sa.String), sa.column('game_id', sa.BigInteger))
+    connection = op.get_bind()
+    for row_id, match_id in connection.execute(sa.select(matches.c.id, matches.c.match_id)).fetchall():
+        game_id = match_id.rsplit('_', 1)[-1] if match_id else None
+        if game_id and game_id.isdigit():
+            connection.execute(matches.update().where(matches.c.id == row_id).values(game_id=int(game_id)))
+
+
+def downgrade():
+    with op.batch_alter_table('matches', schema=None) as batch_op:
+        batch_op.drop_index('ix_matches_summoner_puuid_game_start')
+        batch_op.drop_column('game_start')
+        batch_op.drop_column('game_id')
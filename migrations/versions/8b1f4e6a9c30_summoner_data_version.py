@@ -0,0 +1,30 @@
+"""summoner data_version and data_updated_at
+
+Revision ID: 8b1f4e6a9c30
+Revises: 5e92b7a3c6d8
+Create Date: 2026-10-17 14:02:51.318442
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b1f4e6a9c30'
+down_revision = '5e92b7a3c6d8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('summoners', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('data_version', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('data_updated_at', sa.Integer(), nullable=True))
+
+    op.execute("UPDATE summoners SET data_updated_at = last_update")
+
+
+def downgrade():
+    with op.batch_alter_table('summoners', schema=None) as batch_op:
+        batch_op.drop_column('data_updated_at')
+        batch_op.drop_column('data_version')
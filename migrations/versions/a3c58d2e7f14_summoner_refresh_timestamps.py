@@ -0,0 +1,31 @@
+"""summoner matches_synced_at and profile_updated_at
+
+Revision ID: a3c58d2e7f14
+Revises: 8b1f4e6a9c30
+Create Date: 2026-10-17 15:20:44.610215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c58d2e7f14'
+down_revision = '8b1f4e6a9c30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('summoners', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('matches_synced_at', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('profile_updated_at', sa.Integer(), nullable=True))
+
+    # Hasta ahora icono y nivel se guardaban junto con el rango
+    op.execute("UPDATE summoners SET profile_updated_at = last_update")
+
+
+def downgrade():
+    with op.batch_alter_table('summoners', schema=None) as batch_op:
+        batch_op.drop_column('profile_updated_at')
+        batch_op.drop_column('matches_synced_at')
@@ -0,0 +1,33 @@
+"""indexes for the hot lookup columns
+
+Revision ID: b83e5d1f27ac
+Revises: 0fcdceb9f4c1
+Create Date: 2026-10-17 10:48:12.593301
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b83e5d1f27ac'
+down_revision = '0fcdceb9f4c1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_summoners_summoner_name', 'summoners', ['summoner_name'], unique=False)
+    op.create_index('ix_matches_match_id', 'matches', ['match_id'], unique=False)
+
+    op.execute(
+        "DELETE FROM champion_stats WHERE id NOT IN "
+        "(SELECT MIN(id) FROM champion_stats GROUP BY summoner_puuid, champion_name)"
+    )
+    op.create_index('uq_champion_stats_summoner_puuid_champion_name', 'champion_stats', ['summoner_puuid', 'champion_name'], unique=True)
+
+
+def downgrade():
+    op.drop_index('uq_champion_stats_summoner_puuid_champion_name', table_name='champion_stats')
+    op.drop_index('ix_matches_match_id', table_name='matches')
+    op.drop_index('ix_summoners_summoner_name', table_name='summoners')
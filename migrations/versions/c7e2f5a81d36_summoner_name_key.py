@@ -0,0 +1,37 @@
+"""summoner name key
+
+Revision ID: c7e2f5a81d36
+Revises: e61d09b4a2f7
+Create Date: 2026-10-18 10:12:44.508213
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e2f5a81d36'
+down_revision = 'e61d09b4a2f7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('summoners', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('summoner_name_key', sa.String(), nullable=True))
+        batch_op.create_index('ix_summoners_summoner_name_key', ['summoner_name_key'], unique=False)
+
+    # Misma normalización que models.database_handler.summoner_name_key, hecha en Python (lower() de SQLite solo entiende ASCII)
+    connection = op.get_bind()
+    summoners = connection.execute(sa.text("SELECT summoner_puuid, summoner_name FROM summoners")).fetchall()
+    for summoner_puuid, summoner_name in summoners:
+        connection.execute(
+            sa.text("UPDATE summoners SET summoner_name_key = :key WHERE summoner_puuid = :puuid"),
+            {"key": "".join((summoner_name or "").split()).lower(), "puuid": summoner_puuid},
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('summoners', schema=None) as batch_op:
+        batch_op.drop_index('ix_summoners_summoner_name_key')
+        batch_op.drop_column('summoner_name_key')
@@ -0,0 +1,87 @@
+"""champion_stats running totals
+
+Revision ID: d4a7c0e9b215
+Revises: b83e5d1f27ac
+Create Date: 2026-10-17 11:37:05.772064
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4a7c0e9b215'
+down_revision = 'b83e5d1f27ac'
+branch_labels = None
+depends_on = None
+
+
+RANKED_QUEUE_IDS = (420, 440)
+
+
+def upgrade():
+    with op.batch_alter_table('champion_stats', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('kills_total', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('deaths_total', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('assists_total', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('cs_total', sa.Integer(), nullable=True))
+
+    # Las filas existentes nunca contaron las partidas posteriores a su creacion,
+    # asi que se reconstruyen enteras a partir de matches
+    matches = sa.table(
+        'matches',
+        sa.column('summoner_puuid', sa.String), sa.column('champion_name', sa.String), sa.column('queue_id', sa.Integer),
+        sa.column('win', sa.Integer), sa.column('kills', sa.Float), sa.column('deaths', sa.Float),
+        sa.column('assists', sa.Float), sa.column('cs', sa.Integer),
+    )
+    champion_stats = sa.table(
+        'champion_stats',
+        sa.column('summoner_puuid', sa.String), sa.column('champion_name', sa.String),
+        sa.column('matches_played', sa.Integer), sa.column('wins', sa.Integer), sa.column('losses', sa.Integer),
+        sa.column('wr', sa.Float), sa.column('kda', sa.Float), sa.column('kills', sa.Float),
+        sa.column('deaths', sa.Float), sa.column('assists', sa.Float), sa.column('cs', sa.Float),
+        sa.column('kills_total', sa.Integer), sa.column('deaths_total', sa.Integer),
+        sa.column('assists_total', sa.Integer), sa.column('cs_total', sa.Integer),
+    )
+    connection = op.get_bind()
+    totals = {}
+    for match in connection.execute(sa.select(matches).where(matches.c.queue_id.in_(RANKED_QUEUE_IDS))):
+        stats = totals.setdefault((match.summoner_puuid, match.champion_name), [0, 0, 0, 0, 0, 0])
+        stats[0] += 1
+        stats[1] += match.win or 0
+        stats[2] += int(match.kills or 0)
+        stats[3] += int(match.deaths or 0)
+        stats[4] += int(match.assists or 0)
+        stats[5] += match.cs or 0
+
+    connection.execute(champion_stats.delete())
+    rows = [
+        {
+            'summoner_puuid': puuid,
+            'champion_name': champion_name,
+            'matches_played': games,
+            'wins': wins,
+            'losses': games - wins,
+            'wr': round(wins * 100 / games),
+            'kda': round((kills + assists) / (deaths or 1), 2),
+            'kills': round(kills / games, 1),
+            'deaths': round(deaths / games, 1),
+            'assists': round(assists / games, 1),
+            'cs': round(cs / games),
+            'kills_total': kills,
+            'deaths_total': deaths,
+            'assists_total': assists,
+            'cs_total': cs,
+        }
+        for (puuid, champion_name), (games, wins, kills, deaths, assists, cs) in totals.items()
+    ]
+    if rows:
+        connection.execute(champion_stats.insert(), rows)
+
+
+def downgrade():
+    with op.batch_alter_table('champion_stats', schema=None) as batch_op:
+        batch_op.drop_column('cs_total')
+        batch_op.drop_column('assists_total')
+        batch_op.drop_column('deaths_total')
+        batch_op.drop_column('kills_total')
@@ -0,0 +1,29 @@
+"""summoner matches_backfilled_to
+
+Revision ID: e61d09b4a2f7
+Revises: a3c58d2e7f14
+Create Date: 2026-10-17 18:42:10.381944
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e61d09b4a2f7'
+down_revision = 'a3c58d2e7f14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('summoners', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('matches_backfilled_to', sa.BigInteger(), nullable=True))
+
+    # Hasta ahora la primera sincronización listaba la temporada entera: esos historiales ya están completos
+    op.execute("UPDATE summoners SET matches_backfilled_to = 0 WHERE matches_synced_until IS NOT NULL")
+
+
+def downgrade():
+    with op.batch_alter_table('summoners', schema=None) as batch_op:
+        batch_op.drop_column('matches_backfilled_to')
@@ -1,102 +1,215 @@
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any
 
-from utils.request_utils import make_request
+from utils.raw_cache import get_raw_match_cache
+from utils.request_utils import RiotNotFoundError, current_priority, make_request, request_priority
 from utils.season_constants import SEASON_START_TIMESTAMP
+from utils.single_flight import SingleFlight
 
 
+# Numero de partidas que se piden a la API a la vez en _matches_data
+MATCH_FETCH_WORKERS = 8
+
+# Una misma partida pedida a la vez desde varios hilos solo se descarga una vez
+match_fetches = SingleFlight()
+
+
+def run_requests(steps, request):
+    '''
+    Ejecuta un generador de pasos (APIHandler._get_steps, _match_id_pages): cada petición que produce se hace con request(*petición)
+    y la respuesta se le devuelve con send(). Devuelve lo que devuelve el generador. La versión asíncrona es run_requests_async.
+    '''
+    try:
+        call = next(steps)
+        while True:
+            call = steps.send(request(*call))
+    except StopIteration as stop:
+        return stop.value
+
 
 class APIHandler:
-    def _get(self, endpoint, general_region=False, **params) -> Dict[str, Any] :
+    api_base_url = "https://{region}.api.riotgames.com/lol/"
+
+    def _get(self, endpoint, general_region=False, memoize=True, **params) -> Dict[str, Any] :
         '''Método privado para realizar una solicitud GET a la API de Riot utilizando el endpoint seleccionado.
+        Las respuestas se guardan en la instancia por (region, endpoint, params), así que repetir una llamada durante la misma petición no vuelve a la API.
+        Con memoize=False no se guarda (p. ej. los JSON de partida, que solo se leen una vez); invalidate_responses() descarta lo guardado.
         '''
+        return run_requests(self._get_steps(endpoint, general_region, memoize, params), make_request)
+    
+    def _get_steps(self, endpoint, general_region: bool, memoize: bool, params: dict):
+        '''Pasos de _get, compartidos con AsyncAPIHandler (ver run_requests): pide (url, params) solo si la respuesta no está guardada.'''
         region_url = "europe" if general_region else self.region
-        url = f"https://{region_url}.api.riotgames.com/lol/{endpoint}?api_key={self.api_key}"
+        key = (region_url, endpoint, tuple(sorted(params.items())))
+        responses = self.__dict__.setdefault("_responses", {})
+        if memoize and key in responses:
+            return responses[key]
         
-        try:
-            return make_request(url, params)
-        except Exception as e:
-            raise Exception(f"Error fetching data from API: {e}")
+        url = f"{self.api_base_url.format(region=region_url)}{endpoint}?api_key={self.api_key}"
+        response = yield url, params
+        if memoize:
+            responses[key] = response
+        return response
+    
+    def invalidate_responses(self, endpoint_prefix: str = "") -> None:
+        '''Olvida las respuestas guardadas por _get cuyo endpoint empieza por endpoint_prefix (todas por defecto).'''
+        responses = self.__dict__.get("_responses", {})
+        for key in [key for key in responses if key[1].startswith(endpoint_prefix)]:
+            del responses[key]
         
-    def all_match_ids_this_season(self) -> list:
+    def all_match_ids_this_season(self, known_match_ids: set = None, start_time: int = SEASON_START_TIMESTAMP, stop_at_known: bool = True,
+                                  end_time: int = None, max_games: int = 5000) -> list:
         '''
-        Devuelve todos los match id de las partidas jugadas.
+        Devuelve los match id de las partidas jugadas desde start_time (y hasta end_time si se pasa, ambos en segundos), de la más reciente a la más antigua, hasta max_games.
+        Si se pasa known_match_ids solo devuelve las nuevas y, con stop_at_known, deja de paginar en la primera página que contiene una partida ya conocida.
         '''
-        MAX_GAMES = 5000
+        return run_requests(
+            self._match_id_pages(known_match_ids, start_time, stop_at_known, end_time, max_games),
+            lambda endpoint, params: self._get(endpoint, general_region=True, **params),
+        )
+    
+    def _match_id_pages(self, known_match_ids: set, start_time: int, stop_at_known: bool, end_time: int, max_games: int):
+        '''Paginación de all_match_ids_this_season, compartida con AsyncAPIHandler: pide (endpoint, params) de cada página.'''
+        PAGE_SIZE = 100
         match_ids = []
         
-        for start_index in range(0, MAX_GAMES, 100):
+        for start_index in range(0, max_games, PAGE_SIZE):
             endpoint = f"match/v5/matches/by-puuid/{self.puuid}/ids"
             params = {
-                "startTime": SEASON_START_TIMESTAMP,
+                "startTime": start_time,
                 "start": start_index,
-                "count": int(min(100, MAX_GAMES - start_index))
+                "count": int(min(PAGE_SIZE, max_games - start_index))
             }
-            current_match_ids = self._get(endpoint, general_region=True, **params)
+            if end_time is not None:
+                params["endTime"] = end_time
+            current_match_ids = yield endpoint, params
             
             if not current_match_ids:
                 break
             
-            match_ids += current_match_ids
+            if known_match_ids:
+                new_match_ids = [match_id for match_id in current_match_ids if match_id not in known_match_ids]
+                match_ids += new_match_ids
+                if stop_at_known and len(new_match_ids) < len(current_match_ids):
+                    break
+            else:
+                match_ids += current_match_ids
+            
+            # Una página incompleta es la última, no hace falta pedir la siguiente
+            if len(current_match_ids) < params["count"]:
+                break
             
         return match_ids
     
-    def _matches_data(self, match_ids: list = None) -> dict:    
+    def _matches_data(self, match_ids: list = None, max_workers: int = MATCH_FETCH_WORKERS, progress=None, missing_ok: bool = False) -> dict:
         """
         Devuelve un diccionario con los datos del summoner y los datos de todos los participantes para cada match_id.
+        Las partidas se piden en paralelo con hasta max_workers solicitudes en vuelo; make_request sigue aplicando los limites de Riot.
+        Si se pasa progress, se llama con (partidas descargadas, total) cada vez que llega una.
+        Los hilos del pool piden las partidas con la misma prioridad (request_priority) que el hilo que llama.
+        Con missing_ok las partidas que Riot ya no tiene (404) se quedan fuera del resultado en lugar de hacer fallar todo.
         """
         if match_ids is None:
             match_ids = self.all_match_ids_this_season()
-            
-        all_matches_data = {}
+        priority = current_priority()
         
-        for match_id in match_ids:
-            endpoint = f"match/v5/matches/{match_id}"
-            match_request = self._get(general_region=True, endpoint=endpoint)
-            
-            summoner_data = None
-            participants_data = []
-
+        def match_data(match_id: str) -> dict:
+            with request_priority(priority):
+                try:
+                    return self._match_data(match_id)
+                except RiotNotFoundError:
+                    if not missing_ok:
+                        raise
+                    return None
+        
+        if max_workers <= 1 or len(match_ids) <= 1:
+            matches = self._collect(map(match_data, match_ids), len(match_ids), progress)
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(match_ids))) as executor:
+                matches = self._collect(executor.map(match_data, match_ids), len(match_ids), progress)
+        
+        return {match_id: match for match_id, match in zip(match_ids, matches) if match is not None}
+    
+    @staticmethod
+    def _collect(results, total: int, progress=None) -> list:
+        matches = []
+        for match in results:
+            matches.append(match)
+            if progress:
+                progress(len(matches), total)
+        return matches
+    
+    def _match_data(self, match_id: str) -> dict:
+        """
+        Devuelve los datos de la partida, del summoner y de todos los participantes para un solo match_id.
+        El JSON de la partida se busca primero en la caché de respuestas en crudo (utils.raw_cache) y, si hay que pedirlo, se guarda en ella.
+        Si otro hilo ya está pidiendo la misma partida (p. ej. la sincronización de un compañero de premade) se espera a su respuesta en lugar de repetir la llamada.
+        """
+        match_request = self._cached_match(match_id)
+        if match_request is None:
+            match_request = match_fetches.do(match_id, lambda: self._fetch_match(match_id))
+        return self._parse_match_data(match_request)
+    
+    def _fetch_match(self, match_id: str) -> dict:
+        return self._cache_match(match_id, self._get(general_region=True, endpoint=f"match/v5/matches/{match_id}", memoize=False))
+    
+    @staticmethod
+    def _cached_match(match_id: str) -> dict:
+        raw_match_cache = get_raw_match_cache()
+        return raw_match_cache.get(match_id) if raw_match_cache is not None else None
+    
+    @staticmethod
+    def _cache_match(match_id: str, match_request: dict) -> dict:
+        raw_match_cache = get_raw_match_cache()
+        if raw_match_cache is not None:
+            raw_match_cache.put(match_id, match_request)
+        return match_request
+    
+    def _parse_match_data(self, match_request: dict) -> dict:
+        """
+        Extrae de la respuesta de match/v5/matches/{match_id} los datos de la partida y de los 10 participantes.
+        summoner_data es la entrada de participants_data que corresponde al summoner.
+        """
+        summoner_data = None
+        participants_data = []
 
-            for participant in match_request["info"]["participants"]:
-                participant_info = {
-                    "summoner_name": participant["summonerName"],
-                    "champion_name": participant["championName"],
-                    "team_id": participant["teamId"],
-                }
-                participants_data.append(participant_info)
-                
-                if participant["puuid"] == self.puuid:
-                    summoner_data = {
-                        "summoner_puuid": self.puuid,
-                        "champion_name": participant["championName"],
-                        "kills": participant["kills"],
-                        "deaths": participant["deaths"],
-                        "assists": participant["assists"],
-                        "win": 1 if participant["win"] else 0,
-                        "kda": self.calculate_kda(participant["kills"], participant["deaths"], participant["assists"]),
-                        "cs": participant["totalMinionsKilled"] + participant["neutralMinionsKilled"],
-                        "vision": participant["visionScore"],
-                        "summoner_spell1": participant["summoner1Id"],
-                        "summoner_spell2": participant["summoner2Id"],
-                        "item0": participant["item0"],
-                        "item1": participant["item1"],
-                        "item2": participant["item2"],
-                        "item3": participant["item3"],
-                        "item4": participant["item4"],
-                        "item5": participant["item5"],
-                        "item6": participant["item6"],
-                        "team_position": participant["teamPosition"],
-                    }
-            match_data = {
-                "game_mode": match_request["info"]["gameMode"],
-                "game_duration": match_request["info"]["gameDuration"],
-                "queue_id": match_request["info"]["queueId"]
+        for participant in match_request["info"]["participants"]:
+            participant_info = {
+                "puuid": participant["puuid"],
+                "summoner_name": participant["summonerName"],
+                "champion_name": participant["championName"],
+                "team_id": participant["teamId"],
+                "team_position": participant["teamPosition"],
+                "kills": participant["kills"],
+                "deaths": participant["deaths"],
+                "assists": participant["assists"],
+                "win": 1 if participant["win"] else 0,
+                "kda": self.calculate_kda(participant["kills"], participant["deaths"], participant["assists"]),
+                "cs": participant["totalMinionsKilled"] + participant["neutralMinionsKilled"],
+                "vision": participant["visionScore"],
+                "summoner_spell1": participant["summoner1Id"],
+                "summoner_spell2": participant["summoner2Id"],
+                "item0": participant["item0"],
+                "item1": participant["item1"],
+                "item2": participant["item2"],
+                "item3": participant["item3"],
+                "item4": participant["item4"],
+                "item5": participant["item5"],
+                "item6": participant["item6"],
             }
-            all_match_data= {
-                "match_data": match_data,
-                "summoner_data": summoner_data,
-                "participants_data": participants_data,
-            }
-            all_matches_data[match_id] = all_match_data
-        
-        return all_matches_data
\ No newline at end of file
+            participants_data.append(participant_info)
+            
+            if participant["puuid"] == self.puuid:
+                summoner_data = participant_info
+        match_data = {
+            "game_id": match_request["info"]["gameId"],
+            "game_start": match_request["info"]["gameCreation"],
+            "game_mode": match_request["info"]["gameMode"],
+            "game_duration": match_request["info"]["gameDuration"],
+            "queue_id": match_request["info"]["queueId"]
+        }
+        return {
+            "match_data": match_data,
+            "summoner_data": summoner_data,
+            "participants_data": participants_data,
+        }
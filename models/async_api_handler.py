@@ -0,0 +1,79 @@
+import asyncio
+from typing import Dict, Any
+
+from utils.async_request_utils import make_request_async
+from utils.request_utils import RiotNotFoundError
+from utils.season_constants import SEASON_START_TIMESTAMP
+
+from .api_handler import APIHandler, MATCH_FETCH_WORKERS, match_fetches
+
+
+async def run_requests_async(steps, request):
+    '''Como api_handler.run_requests, con request una función que devuelve una corrutina.'''
+    try:
+        call = next(steps)
+        while True:
+            call = steps.send(await request(*call))
+    except StopIteration as stop:
+        return stop.value
+
+
+class AsyncAPIHandler(APIHandler):
+    '''
+    Variante asíncrona de APIHandler: _get y los métodos de summoner, league y match son corrutinas sobre aiohttp,
+    así varias llamadas a Riot se esperan a la vez con asyncio.gather sin ocupar un hilo cada una.
+    Necesita self.session, una sesión de utils.async_request_utils.create_session() creada en el mismo event loop.
+    Los métodos síncronos heredados que llaman a _get no se pueden usar; el resto (_parse_match_data, invalidate_responses...) sí.
+    '''
+    async def _get(self, endpoint, general_region=False, memoize=True, **params) -> Dict[str, Any]:
+        '''Como APIHandler._get, con la misma memoria de respuestas por instancia, pero sin bloquear el hilo.'''
+        return await run_requests_async(
+            self._get_steps(endpoint, general_region, memoize, params),
+            lambda url, params: make_request_async(self.session, url, params),
+        )
+
+    async def summoner_info(self) -> Dict[str, Any]:
+        return await self._get(f"summoner/v4/summoners/by-name/{self.summoner_name}")
+
+    async def league_entries(self) -> list:
+        return await self._get(f"league/v4/entries/by-summoner/{self.id}")
+
+    async def all_match_ids_this_season(self, known_match_ids: set = None, start_time: int = SEASON_START_TIMESTAMP, stop_at_known: bool = True,
+                                        end_time: int = None, max_games: int = 5000) -> list:
+        '''Mismos argumentos y resultado que APIHandler.all_match_ids_this_season.'''
+        return await run_requests_async(
+            self._match_id_pages(known_match_ids, start_time, stop_at_known, end_time, max_games),
+            lambda endpoint, params: self._get(endpoint, general_region=True, **params),
+        )
+
+    async def _matches_data(self, match_ids: list, max_workers: int = MATCH_FETCH_WORKERS, progress=None, missing_ok: bool = False) -> dict:
+        '''Como APIHandler._matches_data: hasta max_workers partidas en vuelo a la vez, esta vez como tareas del event loop.'''
+        semaphore = asyncio.Semaphore(max(max_workers, 1))
+        fetched = 0
+
+        async def match_data(match_id: str) -> dict:
+            nonlocal fetched
+            async with semaphore:
+                try:
+                    match = await self._match_data(match_id)
+                except RiotNotFoundError:
+                    if not missing_ok:
+                        raise
+                    match = None
+            fetched += 1
+            if progress:
+                progress(fetched, len(match_ids))
+            return match
+
+        matches = await asyncio.gather(*(match_data(match_id) for match_id in match_ids))
+        return {match_id: match for match_id, match in zip(match_ids, matches) if match is not None}
+
+    async def _match_data(self, match_id: str) -> dict:
+        '''Como APIHandler._match_data: a través de la caché de respuestas en crudo, y sin repetir la descarga de una partida que otro hilo o tarea ya está pidiendo.'''
+        match_request = self._cached_match(match_id)
+        if match_request is None:
+            match_request = await match_fetches.do_async(match_id, lambda: self._fetch_match(match_id))
+        return self._parse_match_data(match_request)
+
+    async def _fetch_match(self, match_id: str) -> dict:
+        return self._cache_match(match_id, await self._get(general_region=True, endpoint=f"match/v5/matches/{match_id}", memoize=False))
@@ -0,0 +1,86 @@
+import asyncio
+
+from .async_api_handler import AsyncAPIHandler
+from .database_handler import DatabaseHandler
+from .match_stats import MatchStats
+from .ranked_data import RankedSnapshot
+from .summoner_data import summoner_syncs
+
+
+class AsyncSummonerData(AsyncAPIHandler, DatabaseHandler, MatchStats):
+    """
+    Sincronización de un invocador con las llamadas a Riot asíncronas. Se crea con `await AsyncSummonerData.create(...)`
+    dentro de `async with create_session() as session`. Solo sincroniza: la página se sigue montando con SummonerData,
+    que ya no necesita llamar a la API.
+    """
+    def __init__(self, summoner_name: str, api_key: str, region: str, session) -> None:
+        self.api_key = api_key
+        self.region = region
+        self.summoner_name = summoner_name
+        self.session = session
+
+    @classmethod
+    async def create(cls, summoner_name: str, api_key: str, region: str, session, identity: dict = None) -> "AsyncSummonerData":
+        summoner = cls(summoner_name, api_key, region, session)
+        identity = identity or summoner._summoner_identity()
+        # Un invocador que se acaba de buscar en la API ya tiene el perfil al día
+        summoner.profile_fetched = identity is None
+        if identity is not None:
+            summoner.puuid = identity["summoner_puuid"]
+            summoner.id = identity["summoner_id"]
+            summoner.icon_id = identity["profile_icon_id"]
+            summoner.level = identity["summoner_level"]
+        else:
+            summoner_info = await summoner.summoner_info()
+            summoner.puuid = summoner_info["puuid"]
+            summoner.id = summoner_info["id"]
+            summoner.icon_id = summoner_info["profileIconId"]
+            summoner.level = summoner_info["summonerLevel"]
+        return summoner
+
+    async def sync(self, progress=None) -> int:
+        """
+        Lo mismo que sync_summoner (league_data + refresh_stale_data), pero con puuid e id ya conocidos el perfil,
+        las entradas de liga y la lista de partidas se piden a la vez con asyncio.gather; después, las partidas nuevas.
+        Como sync_summoner, si el mismo invocador ya se está sincronizando (en otra tarea, hilo o proceso) espera a esa
+        sincronización en lugar de repetirla. Devuelve el data_version resultante.
+        """
+        async def sync() -> int:
+            await self.refresh_stale_data(progress)
+            return self.data_version()[0]
+
+        return await summoner_syncs.do_async((self.region.upper(), self.puuid), sync, joined=lambda: self.data_version()[0])
+
+    async def refresh_stale_data(self, progress=None) -> set:
+        """Refresca lo que ha superado su TTL, como SummonerData.refresh_stale_data. Devuelve qué se ha refrescado."""
+        stale = self.freshness()[2]
+        requests = {}
+        if "profile" in stale and not self.profile_fetched:
+            self.invalidate_responses("summoner/v4")
+            requests["profile"] = self.summoner_info()
+        if "rank" in stale:
+            requests["rank"] = self.league_entries()
+        if "matches" in stale:
+            plan = self._match_sync_plan()
+            requests["matches"] = self.all_match_ids_this_season(**plan.listing)
+        responses = dict(zip(requests, await asyncio.gather(*requests.values())))
+
+        # Primero el rango: para un invocador nuevo crea su fila, que necesitan el perfil y las partidas
+        if "rank" in responses:
+            self.save_or_update_summoner_to_db({
+                **RankedSnapshot(responses["rank"]).ranks,
+                "profile_icon_id": self.icon_id,
+                "summoner_level": self.level,
+            })
+        if "profile" in responses:
+            self.icon_id = responses["profile"]["profileIconId"]
+            self.level = responses["profile"]["summonerLevel"]
+            self.update_summoner_profile_in_db()
+        if "matches" in responses:
+            listed_match_ids = responses["matches"]
+            match_ids = self._match_ids_to_fetch(plan, listed_match_ids)
+            matches_data = await self._matches_data(match_ids, progress=progress, missing_ok=True) if match_ids else {}
+            self._save_synced_matches(plan, listed_match_ids, matches_data)
+        if self.profile_fetched:
+            self._remember_summoner_name((await self.summoner_info())["name"])
+        return stale
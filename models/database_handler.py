@@ -1,19 +1,183 @@
+import os
+import threading
 import time
+from collections import namedtuple
 
-from .db_models import db, SummonerModel, MatchModel
+from cachetools import TTLCache
+from sqlalchemy.dialects import postgresql, sqlite
+
+from utils.single_flight import SingleFlight
+from utils.utils import get_game_type
+from .db_models import db, SummonerModel, MatchModel, MatchParticipantModel
 
 
 
 UPDATE_THRESHOLD = 3600
+# Segundos que se sirve cada tipo de dato guardado antes de refrescarlo en segundo plano
+RANK_TTL = int(os.getenv("RANK_TTL", UPDATE_THRESHOLD))
+MATCH_LIST_TTL = int(os.getenv("MATCH_LIST_TTL", 120))
+PROFILE_TTL = int(os.getenv("PROFILE_TTL", 24 * 3600))
+BULK_INSERT_BATCH_SIZE = 500
+# Invocadores (puuid, id, icono y nivel) que se guardan en memoria para no ir a la base de datos en cada visita
+SUMMONER_CACHE_SIZE = 1024
+SUMMONER_CACHE_TTL = 30 * 60
+# Partidas que lista la primera sincronización de un invocador; las anteriores las descarga el backfill en segundo plano
+# o se piden cuando alguien llega a ellas en el historial
+INITIAL_SYNC_MATCHES = 20
+# Valor de matches_backfilled_to cuando Riot ya no tiene partidas más antiguas
+HISTORY_COMPLETE = 0
+# Columnas de match_participants que salen de participants_data tal cual
+PARTICIPANT_FIELDS = (
+    "puuid", "summoner_name", "champion_name", "team_id", "team_position", "win", "kills", "deaths", "assists",
+    "kda", "cs", "vision", "summoner_spell1", "summoner_spell2",
+    "item0", "item1", "item2", "item3", "item4", "item5", "item6",
+)
+
+
+def dialect_insert(table):
+    """INSERT that supports ON CONFLICT clauses on the current database (SQLite or PostgreSQL)."""
+    dialect = postgresql if db.engine.dialect.name == "postgresql" else sqlite
+    return dialect.insert(table)
+
+
+def insert_ignoring_duplicates(table, index_elements: list):
+    """INSERT ... ON CONFLICT DO NOTHING for the current database."""
+    return dialect_insert(table).on_conflict_do_nothing(index_elements=index_elements)
+
+
+summoner_cache = TTLCache(maxsize=SUMMONER_CACHE_SIZE, ttl=SUMMONER_CACHE_TTL)
+summoner_cache_lock = threading.Lock()
+
+# Lo que una sincronización de partidas tiene que listar, ver DatabaseHandler._match_sync_plan
+MatchSyncPlan = namedtuple("MatchSyncPlan", ["synced_until", "known_match_ids", "listing", "first_sync", "undated_match_ids"])
+# Partidas sin game_start (migradas de la tabla antigua) a las que cada sincronización pone fecha pidiéndolas otra vez
+UNDATED_MATCHES_PER_SYNC = 100
+# Partidas sin fecha que Riot ya no tiene (404): no se vuelven a pedir mientras el proceso siga vivo
+undatable_match_ids = set()
+
+# Dos peticiones que llegan a la vez al final del historial guardado piden las partidas anteriores una sola vez
+older_match_fetches = SingleFlight()
+
+
+def summoner_name_key(summoner_name: str) -> str:
+    """Riot ignores case and spaces in summoner names, so "Flan de Nata" and "flandenata" are the same summoner."""
+    return "".join(summoner_name.split()).lower()
+
+
+def summoner_cache_key(region: str, summoner_name: str) -> tuple:
+    return region.upper(), summoner_name_key(summoner_name)
+
+
+def stored_summoner_identity(region: str, summoner_name: str) -> dict:
+    """Returns the summoner's puuid, id, icon and level from the summoner cache or, on a miss, from the database.
+    
+    Returns:
+        A dict with summoner_puuid, summoner_id, profile_icon_id and summoner_level, or None if the
+        summoner is not stored yet.
+    """
+    cache_key = summoner_cache_key(region, summoner_name)
+    with summoner_cache_lock:
+        identity = summoner_cache.get(cache_key)
+    if identity is not None:
+        return identity
+    
+    row = db.session.query(
+        SummonerModel.summoner_puuid,
+        SummonerModel.summoner_id,
+        SummonerModel.profile_icon_id,
+        SummonerModel.summoner_level,
+    ).filter_by(summoner_name_key=summoner_name_key(summoner_name)).first()
+    if row is None:
+        return None
+    
+    identity = row._asdict()
+    with summoner_cache_lock:
+        summoner_cache[cache_key] = identity
+    return identity
+
+
+class RecentMatch:
+    """One of a summoner's stored matches as its match card shows it: their own line plus the lobby's names and champions."""
+    PARTICIPANT_COLUMNS = (
+        "match_id", "game_start", "queue_id", "champion_name", "win", "kills", "deaths", "assists", "cs", "vision",
+        "summoner_spell1", "summoner_spell2", "item0", "item1", "item2", "item3", "item4", "item5", "item6",
+    )
+    __slots__ = (
+        "match_id", "game_start", "queue_id", "game_mode", "game_duration", "champion_name", "win",
+        "kills", "deaths", "assists", "cs", "vision", "summoner_spell_ids", "item_ids",
+        "participant_summoner_names", "participant_champion_names",
+    )
+
+    def __init__(self, row, participant_summoner_names: list, participant_champion_names: list) -> None:
+        self.match_id = row.match_id
+        self.game_start = row.game_start
+        self.queue_id = row.queue_id
+        self.game_mode = row.game_mode
+        self.game_duration = row.game_duration
+        self.champion_name = row.champion_name
+        self.win = row.win
+        self.kills = int(row.kills)
+        self.deaths = int(row.deaths)
+        self.assists = int(row.assists)
+        self.cs = row.cs
+        self.vision = row.vision
+        self.summoner_spell_ids = (row.summoner_spell1, row.summoner_spell2)
+        self.item_ids = (row.item0, row.item1, row.item2, row.item3, row.item4, row.item5, row.item6)
+        self.participant_summoner_names = participant_summoner_names
+        self.participant_champion_names = participant_champion_names
+
+    @property
+    def game_type(self) -> str:
+        return get_game_type(self.queue_id)
+
+    @property
+    def cursor(self) -> tuple:
+        """Position of the match in the newest-first order; pass it as recent_matches(before=...) for the next page."""
+        return self.game_start, self.match_id
+
+    def to_dict(self) -> dict:
+        return {**{field: getattr(self, field) for field in self.__slots__}, "game_type": self.game_type}
 
 
 class DatabaseHandler:
+    def _summoner_identity(self) -> dict:
+        """The summoner's puuid, id, icon and level without calling the API; see stored_summoner_identity."""
+        return stored_summoner_identity(self.region, self.summoner_name)
+    
+    def _cache_summoner_identity(self) -> None:
+        """Stores the identity of the summoner this instance was built for in the summoner cache."""
+        with summoner_cache_lock:
+            summoner_cache[summoner_cache_key(self.region, self.summoner_name)] = {
+                "summoner_puuid": self.puuid,
+                "summoner_id": self.id,
+                "profile_icon_id": self.icon_id,
+                "summoner_level": self.level,
+            }
+    
+    def _remember_summoner_name(self, riot_name: str) -> None:
+        """After the summoner was looked up by name in the API: makes its stored row findable under the name Riot
+        returned (renamed summoner, or a row saved before summoner_name_key existed) and caches its identity."""
+        summoner_model = db.session.get(SummonerModel, self.puuid)
+        if summoner_model is None:
+            return
+        if summoner_model.summoner_name_key != summoner_name_key(riot_name):
+            summoner_model.summoner_name = riot_name
+            summoner_model.summoner_name_key = summoner_name_key(riot_name)
+            db.session.commit()
+        with summoner_cache_lock:
+            summoner_cache[summoner_cache_key(self.region, self.summoner_name)] = {
+                "summoner_puuid": summoner_model.summoner_puuid,
+                "summoner_id": summoner_model.summoner_id,
+                "profile_icon_id": summoner_model.profile_icon_id,
+                "summoner_level": summoner_model.summoner_level,
+            }
+    
     def _summoner_data_from_db(self) -> dict:
         """Retrieve summoner data from the database based on the summoner_name.
         Returns:
             A dict with summoner data or None if not found.
         """
-        summoner_model = SummonerModel.query.filter_by(summoner_name=self.summoner_name).first()
+        summoner_model = SummonerModel.query.filter_by(summoner_name_key=summoner_name_key(self.summoner_name)).first()
         return {
                 "summoner_puuid": summoner_model.summoner_puuid,
                 "profile_icon_id": summoner_model.profile_icon_id,
@@ -31,7 +195,7 @@ class DatabaseHandler:
             } if summoner_model else None
         
     def save_or_update_summoner_to_db(self, league_data: dict) -> None:
-        """Saves or updates summoner data to the database based on whether the summoner's data has been updated within the last update time threshold (1 hour) or not.
+        """Saves or updates summoner data to the database based on whether the summoner's data has been updated within the last RANK_TTL seconds (1 hour by default) or not.
         
         Args:
             league_data: A dict containing the summoner's ranked and profile information.
@@ -49,11 +213,12 @@ class DatabaseHandler:
         if summoner_model:
             last_update = summoner_model.last_update
             
-            if current_timestamp - last_update >= UPDATE_THRESHOLD:
+            if current_timestamp - last_update >= RANK_TTL:
                 print("Updating database...")
 
                 summoner_model.summoner_id = self.id
                 summoner_model.summoner_name = self.summoner_name
+                summoner_model.summoner_name_key = summoner_name_key(self.summoner_name)
                 summoner_model.region = self.region
                 summoner_model.last_update = current_timestamp
                 summoner_model.soloq_rank = league_data["soloq_rank"]
@@ -68,8 +233,11 @@ class DatabaseHandler:
                 summoner_model.flex_wr = league_data["flex_wr"]
                 summoner_model.profile_icon_id = self.icon_id
                 summoner_model.summoner_level = self.level
+                summoner_model.data_version += 1
+                summoner_model.data_updated_at = current_timestamp
 
                 db.session.commit()
+                self._cache_summoner_identity()
             else:
                 print("Summoner data is up-to-date.")
         
@@ -79,6 +247,7 @@ class DatabaseHandler:
                 summoner_puuid=self.puuid,
                 summoner_id=self.id,
                 summoner_name=self.summoner_name,
+                summoner_name_key=summoner_name_key(self.summoner_name),
                 region=self.region,
                 last_update=current_timestamp,
                 soloq_rank=league_data["soloq_rank"],
@@ -93,161 +262,481 @@ class DatabaseHandler:
                 flex_wr=league_data["flex_wr"],
                 profile_icon_id=self.icon_id,
                 summoner_level=self.level,
+                profile_updated_at=current_timestamp,
+                data_version=1,
+                data_updated_at=current_timestamp,
             )
 
             db.session.add(summoner_model)
             db.session.commit()
+            self._cache_summoner_identity()
             
-    def _matches_data_from_db(self) -> list[dict]:
-        last_match = MatchModel.query.filter_by(summoner_puuid=self.puuid).order_by(MatchModel.match_id.desc()).first()
-            
-        if last_match:
-            recent_matches = [
-                match_id for match_id in self.all_match_ids_this_season() if match_id > last_match.match_id
-            ]
-            if recent_matches:
-                new_matches_data = self._matches_data(recent_matches)
-                self.save_matches_data_to_db(new_matches_data)
+    def update_summoner_profile_in_db(self) -> None:
+        """Saves the summoner's current icon and level, e.g. after a profile refresh."""
+        current_timestamp = int(time.time())
+        summoner_model = db.session.get(SummonerModel, self.puuid)
+        if summoner_model is None:
+            return
         
-        else:
-            all_matches = self.all_match_ids_this_season()
-            if all_matches:
-                all_matches_data = self._matches_data(all_matches)
-                self.save_matches_data_to_db(all_matches_data)
-        
-        matches = MatchModel.query.filter_by(summoner_puuid=self.puuid).all()
-        matches_data = []
-        
-        for match in matches:
-            match_data = {
-                "summoner_puuid": match.summoner_puuid,
-                "match_id": match.match_id,
-                "champion_name": match.champion_name,
-                "win": match.win,
-                "kills": match.kills,
-                "deaths": match.deaths,
-                "assists": match.assists,
-                "kda": match.kda,
-                "cs": match.cs,
-                "vision": match.vision,
-                "summoner_spell1": match.summoner_spell1,
-                "summoner_spell2": match.summoner_spell2,
-                "item0": match.item0,
-                "item1": match.item1,
-                "item2": match.item2,
-                "item3": match.item3,
-                "item4": match.item4,
-                "item5": match.item5,
-                "item6": match.item6,
-                "participant1_summoner_name": match.participant1_summoner_name,
-                "participant2_summoner_name": match.participant2_summoner_name,
-                "participant3_summoner_name": match.participant3_summoner_name,
-                "participant4_summoner_name": match.participant4_summoner_name,
-                "participant5_summoner_name": match.participant5_summoner_name,
-                "participant6_summoner_name": match.participant6_summoner_name,
-                "participant7_summoner_name": match.participant7_summoner_name,
-                "participant8_summoner_name": match.participant8_summoner_name,
-                "participant9_summoner_name": match.participant9_summoner_name,
-                "participant10_summoner_name": match.participant10_summoner_name,
-                "participant1_champion_name": match.participant1_champion_name,
-                "participant2_champion_name": match.participant2_champion_name,
-                "participant3_champion_name": match.participant3_champion_name,
-                "participant4_champion_name": match.participant4_champion_name,
-                "participant5_champion_name": match.participant5_champion_name,
-                "participant6_champion_name": match.participant6_champion_name,
-                "participant7_champion_name": match.participant7_champion_name,
-                "participant8_champion_name": match.participant8_champion_name,
-                "participant9_champion_name": match.participant9_champion_name,
-                "participant10_champion_name": match.participant10_champion_name,
-                "participant1_team_id": match.participant1_team_id,
-                "participant2_team_id": match.participant2_team_id,
-                "participant3_team_id": match.participant3_team_id,
-                "participant4_team_id": match.participant4_team_id,
-                "participant5_team_id": match.participant5_team_id,
-                "participant6_team_id": match.participant6_team_id,
-                "participant7_team_id": match.participant7_team_id,
-                "participant8_team_id": match.participant8_team_id,
-                "participant9_team_id": match.participant9_team_id,
-                "participant10_team_id": match.participant10_team_id,
-                "game_mode": match.game_mode,
-                "game_duration": match.game_duration,
-                "queue_id": match.queue_id,
-                "team_position": match.team_position,
+        changed = (summoner_model.profile_icon_id, summoner_model.summoner_level) != (self.icon_id, self.level)
+        summoner_model.profile_icon_id = self.icon_id
+        summoner_model.summoner_level = self.level
+        summoner_model.profile_updated_at = current_timestamp
+        if changed:
+            summoner_model.data_version += 1
+            summoner_model.data_updated_at = current_timestamp
+        db.session.commit()
+        self._cache_summoner_identity()
+    
+    def freshness(self) -> tuple:
+        """Returns (data_version, data_updated_at, stale) for the summoner in a single query.
+        
+        stale is the set of stored data older than its TTL ("rank", "profile" and "matches"), i.e. the
+        parts a background refresh has to fetch again. Everything is stale for a summoner not stored yet.
+        """
+        row = db.session.query(
+            SummonerModel.data_version,
+            SummonerModel.data_updated_at,
+            SummonerModel.last_update,
+            SummonerModel.profile_updated_at,
+            SummonerModel.matches_synced_at,
+        ).filter(SummonerModel.summoner_puuid == self.puuid).first()
+        if row is None:
+            return 0, None, {"rank", "profile", "matches"}
+        
+        now = time.time()
+        ages = {
+            "rank": (row.last_update, RANK_TTL),
+            "profile": (row.profile_updated_at, PROFILE_TTL),
+            "matches": (row.matches_synced_at, MATCH_LIST_TTL),
+        }
+        stale = {name for name, (updated_at, ttl) in ages.items() if updated_at is None or now - updated_at >= ttl}
+        return row.data_version, row.data_updated_at, stale
+    
+    def data_version(self) -> tuple:
+        """Returns (data_version, data_updated_at) of the summoner, or (0, None) if it is not stored yet.
+        
+        data_version goes up every time the data shown on the summoner's page changes, so a cached page
+        is still valid as long as the version it was rendered with is the current one.
+        """
+        row = db.session.query(SummonerModel.data_version, SummonerModel.data_updated_at).filter(
+            SummonerModel.summoner_puuid == self.puuid
+        ).first()
+        return tuple(row) if row else (0, None)
+    
+    @staticmethod
+    def bump_data_version(puuids) -> None:
+        """Marks the pages of the given summoners as changed. Does not commit."""
+        puuids = list(puuids)
+        for start in range(0, len(puuids), BULK_INSERT_BATCH_SIZE):
+            db.session.execute(
+                SummonerModel.__table__.update().where(
+                    SummonerModel.summoner_puuid.in_(puuids[start:start + BULK_INSERT_BATCH_SIZE])
+                ).values(
+                    data_version=SummonerModel.data_version + 1,
+                    data_updated_at=int(time.time()),
+                )
+            )
+    
+    def _matches_data_from_db(self, limit: int = None, sync: bool = True) -> list:
+        """Syncs the summoner's new matches from the API and returns the stored matches, newest first, as RecentMatch rows.
+        
+        Args:
+            limit: Max number of matches to return (all of them if None).
+            sync: Skip the sync and only read what is stored when False.
+        """
+        if sync:
+            self.sync_matches()
+        return self.recent_matches(limit=limit)
+    
+    def sync_matches(self, progress=None) -> None:
+        """Fetches and saves the summoner's matches that are not stored yet.
+        
+        After the first sync only games played since matches_synced_until are listed, so a refresh with
+        no new games costs a single API call. The watermark is the summoner's own: games stored by other
+        summoners' syncs do not move it, so they can't hide older games this summoner still lacks.
+        
+        Games already stored by another summoner's sync already have a row for this puuid and are not
+        fetched again. Their stats were not counted while this summoner was untracked, so the first sync
+        rebuilds the summoner's champion stats from every stored row.
+        
+        Args:
+            progress: Optional callable(fetched, total) told how many of the new matches have been fetched.
+        """
+        self.invalidate_responses("match/v5/matches/by-puuid")
+        plan = self._match_sync_plan()
+        self._save_synced_matches(plan, *self._fetch_new_matches(plan, progress))
+    
+    def _match_sync_plan(self) -> "MatchSyncPlan":
+        """What sync_matches has to list: the all_match_ids_this_season arguments and the stored match ids they may return.
+        
+        sync_matches is split into _match_sync_plan and _save_synced_matches (database only) around
+        _fetch_new_matches (API only), so the API part can run on another thread or in the async handler.
+        """
+        sync_state = db.session.query(SummonerModel.matches_synced_until, SummonerModel.matches_synced_at).filter(
+            SummonerModel.summoner_puuid == self.puuid
+        ).first()
+        synced_until, synced_at = sync_state if sync_state else (None, None)
+        stored_match_ids = db.session.query(MatchParticipantModel.match_id).filter(MatchParticipantModel.puuid == self.puuid)
+        
+        if synced_until is not None:
+            # startTime es inclusivo: la última partida sincronizada vuelve en la lista
+            start_time = synced_until // 1000
+            known_match_ids = {
+                match_id for (match_id,) in stored_match_ids.filter(MatchParticipantModel.game_start >= start_time * 1000)
             }
-            matches_data.append(match_data)
+            listing = {"known_match_ids": known_match_ids, "start_time": start_time}
+        else:
+            # Sin marca propia puede haber huecos entre las partidas guardadas, así que no se para en la primera conocida;
+            # solo se listan las INITIAL_SYNC_MATCHES más recientes y las anteriores las pide fetch_older_matches()
+            known_match_ids = {match_id for (match_id,) in stored_match_ids}
+            listing = {"max_games": INITIAL_SYNC_MATCHES}
+        
+        # Las más recientes primero: los ids de Riot crecen con el tiempo
+        undated_match_ids = [
+            match_id for (match_id,) in stored_match_ids.filter(
+                MatchParticipantModel.game_start.is_(None),
+                MatchParticipantModel.match_id.notin_(undatable_match_ids),
+            ).order_by(MatchParticipantModel.match_id.desc()).limit(UNDATED_MATCHES_PER_SYNC)
+        ]
+        return MatchSyncPlan(synced_until, known_match_ids, listing, synced_at is None, undated_match_ids)
+    
+    def _fetch_new_matches(self, plan: "MatchSyncPlan", progress=None) -> tuple:
+        """Lists the match ids of a sync plan and fetches the ones not stored yet, plus the stored ones without
+        a game_start. Makes no database queries.
+        
+        Returns:
+            (listed match ids, matches data of the new and undated ones).
+        """
+        listed_match_ids = self.all_match_ids_this_season(**plan.listing)
+        matches_data = self._matches_data(self._match_ids_to_fetch(plan, listed_match_ids), progress=progress, missing_ok=True)
+        return listed_match_ids, matches_data
+    
+    @staticmethod
+    def _match_ids_to_fetch(plan: "MatchSyncPlan", listed_match_ids: list) -> list:
+        new_match_ids = [match_id for match_id in listed_match_ids if match_id not in plan.known_match_ids]
+        return new_match_ids + [match_id for match_id in plan.undated_match_ids if match_id not in new_match_ids]
+    
+    def _save_synced_matches(self, plan: "MatchSyncPlan", listed_match_ids: list, matches_data: dict) -> None:
+        undated_match_ids = set(plan.undated_match_ids)
+        undatable_match_ids.update(undated_match_ids - set(matches_data))
+        self._date_matches({match_id: game_data for match_id, game_data in matches_data.items() if match_id in undated_match_ids})
+        new_matches_data = {match_id: game_data for match_id, game_data in matches_data.items() if match_id not in undated_match_ids}
+        if new_matches_data:
+            self.save_matches_data_to_db(new_matches_data)
+        self._finish_match_sync(plan, listed_match_ids)
+    
+    def _date_matches(self, matches_data: dict) -> None:
+        """Fills in game_start (and queue_id) of stored matches that lack it, from their refetched data.
+        
+        Matches migrated from the old per-summoner table were stored before game_start existed; without it
+        they can't be ordered, paged by cursor or used as the sync watermark.
+        """
+        if not matches_data:
+            return
+        for table in (MatchModel.__table__, MatchParticipantModel.__table__):
+            db.session.execute(
+                table.update().where(table.c.match_id == db.bindparam("dated_match_id")).values(
+                    game_start=db.bindparam("dated_game_start"),
+                    queue_id=db.bindparam("dated_queue_id"),
+                ),
+                [
+                    {
+                        "dated_match_id": match_id,
+                        "dated_game_start": game_data["match_data"]["game_start"],
+                        "dated_queue_id": game_data["match_data"]["queue_id"],
+                    }
+                    for match_id, game_data in matches_data.items()
+                ],
+            )
+        self.bump_data_version([self.puuid])
+        db.session.commit()
+    
+    def _finish_match_sync(self, plan: "MatchSyncPlan", listed_match_ids: list) -> None:
+        """Bookkeeping after the new matches of a sync are saved: first-sync stats rebuild, watermark and backfill marker."""
+        if plan.first_sync and plan.known_match_ids:
+            self.rebuild_champion_stats()
+            self.bump_data_version([self.puuid])
+            db.session.commit()
+        
+        summoner_model = db.session.get(SummonerModel, self.puuid)
+        if summoner_model:
+            # max() pasa por alto las partidas sin game_start; sin ninguna fechada la marca sigue vacía
+            summoner_model.matches_synced_until = db.session.query(db.func.max(MatchParticipantModel.game_start)).filter(
+                MatchParticipantModel.puuid == self.puuid
+            ).scalar()
+            summoner_model.matches_synced_at = int(time.time())
+            if plan.first_sync or summoner_model.matches_backfilled_to is None:
+                backfilled_to = self._backfill_marker(listed_match_ids, INITIAL_SYNC_MATCHES)
+                if backfilled_to is None:
+                    # Ninguna partida listada tiene fecha (Riot ya no las tiene): se sigue desde la partida fechada más antigua
+                    backfilled_to = db.session.query(db.func.min(MatchParticipantModel.game_start)).filter(
+                        MatchParticipantModel.puuid == self.puuid,
+                    ).scalar()
+                summoner_model.matches_backfilled_to = backfilled_to
+            db.session.commit()
+    
+    def matches_backfilled_to(self) -> int:
+        """game_start (ms) of the oldest game of the summoner's synced history, HISTORY_COMPLETE if Riot has no
+        older games, or None if the summoner has not been synced yet."""
+        return db.session.query(SummonerModel.matches_backfilled_to).filter(
+            SummonerModel.summoner_puuid == self.puuid
+        ).scalar()
+    
+    def fetch_older_matches(self, count: int, progress=None) -> int:
+        """Fetches and saves up to count of the summoner's games older than the synced history.
+        
+        Only the newest INITIAL_SYNC_MATCHES games are synced up front; this pulls the next page back,
+        for the background backfill or when someone reaches the end of the stored history, and moves
+        matches_backfilled_to.
+        Concurrent calls for the same page share a single fetch.
+        
+        Args:
+            count: Number of match ids to list (at most 100, Riot's page size).
+            progress: Optional callable(fetched, total) told how many of the new matches have been fetched.
+        
+        Returns:
+            The new matches_backfilled_to.
+        """
+        backfilled_to = self.matches_backfilled_to()
+        if backfilled_to is None or backfilled_to == HISTORY_COMPLETE:
+            return backfilled_to
+        
+        def fetch() -> int:
+            # Nadie juega dos partidas en el mismo segundo: las anteriores a la más antigua sincronizada empiezan como tarde un segundo antes
+            listed_match_ids = self.all_match_ids_this_season(end_time=backfilled_to // 1000 - 1, max_games=count)
+            known_match_ids = dict(
+                db.session.query(MatchParticipantModel.match_id, MatchParticipantModel.game_start).filter(
+                    MatchParticipantModel.puuid == self.puuid,
+                    MatchParticipantModel.match_id.in_(listed_match_ids),
+                )
+            ) if listed_match_ids else {}
+            new_match_ids = [match_id for match_id in listed_match_ids if match_id not in known_match_ids]
+            # Las partidas guardadas sin fecha se vuelven a pedir para fecharlas, o la marca no podría pasar de ellas
+            undated_match_ids = [match_id for match_id, game_start in known_match_ids.items() if game_start is None]
+            if new_match_ids or undated_match_ids:
+                matches_data = self._matches_data(new_match_ids + undated_match_ids, progress=progress, missing_ok=True)
+                undatable_match_ids.update(set(undated_match_ids) - set(matches_data))
+                self._date_matches({match_id: matches_data[match_id] for match_id in undated_match_ids if match_id in matches_data})
+                new_matches_data = {match_id: matches_data[match_id] for match_id in new_match_ids if match_id in matches_data}
+                if new_matches_data:
+                    self.save_matches_data_to_db(new_matches_data)
             
-        return matches_data
+            marker = self._backfill_marker(listed_match_ids, count)
+            if marker is None or marker >= backfilled_to:
+                # Ninguna partida de la página tiene fecha: la marca no puede retroceder, así que el backfill termina aquí
+                marker = HISTORY_COMPLETE
+            db.session.execute(
+                SummonerModel.__table__.update().where(
+                    SummonerModel.summoner_puuid == self.puuid
+                ).values(matches_backfilled_to=marker)
+            )
+            db.session.commit()
+            return marker
+        
+        return older_match_fetches.do((self.puuid, backfilled_to), fetch)
+    
+    def _backfill_marker(self, listed_match_ids: list, requested: int) -> int:
+        """matches_backfilled_to once listed_match_ids, a page of requested ids, are stored. None if none of them has a game_start."""
+        if len(listed_match_ids) < requested:
+            return HISTORY_COMPLETE
+        return db.session.query(db.func.min(MatchParticipantModel.game_start)).filter(
+            MatchParticipantModel.puuid == self.puuid,
+            MatchParticipantModel.match_id.in_(listed_match_ids),
+        ).scalar()
+    
+    def recent_matches(self, puuid: str = None, limit: int = 10, offset: int = 0, queue_filter=None, before: tuple = None) -> list:
+        """Returns a summoner's stored matches, newest first, as RecentMatch rows.
+        
+        Ordering, filtering and paging are done by the database and only the columns the match cards
+        show are read: one query for the summoner's own rows and one for the lobbies of those matches.
+        
+        Args:
+            puuid: Summoner whose matches are returned (this summoner if None).
+            limit: Max number of matches to return.
+            offset: Number of matches to skip.
+            queue_filter: Optional queue_id or iterable of queue_ids to keep.
+            before: Optional (game_start, match_id) of the last match of the previous page; only older
+                matches are returned (keyset pagination, see RecentMatch.cursor).
+        """
+        participants = MatchParticipantModel.__table__
+        matches = MatchModel.__table__
+        query = db.select(
+            *(participants.c[column] for column in RecentMatch.PARTICIPANT_COLUMNS),
+            matches.c.game_mode,
+            matches.c.game_duration,
+        ).join_from(
+            participants, matches, participants.c.match_id == matches.c.match_id
+        ).where(
+            participants.c.puuid == (puuid or self.puuid)
+        ).order_by(
+            participants.c.game_start.desc().nulls_last(), participants.c.match_id.desc()
+        ).limit(limit).offset(offset)
+        
+        if queue_filter is not None:
+            queue_ids = [queue_filter] if isinstance(queue_filter, int) else list(queue_filter)
+            query = query.where(participants.c.queue_id.in_(queue_ids))
+        if before is not None:
+            query = query.where(self._older_than(participants, *before))
+        
+        return self._recent_match_rows(db.session.execute(query).all())
+    
+    @staticmethod
+    def _older_than(participants, game_start, match_id):
+        """Keyset condition of the rows after (game_start, match_id) in the game_start DESC NULLS LAST, match_id DESC order.
+        
+        Matches without a game_start go last, so they follow every dated one; a tuple comparison alone would drop them.
+        """
+        if game_start is None:
+            return db.and_(participants.c.game_start.is_(None), participants.c.match_id < match_id)
+        return db.or_(
+            db.tuple_(participants.c.game_start, participants.c.match_id) < (game_start, match_id),
+            participants.c.game_start.is_(None),
+        )
+    
+    @staticmethod
+    def _recent_match_rows(rows) -> list:
+        """Builds the RecentMatch of each row with the names and champions of its lobby."""
+        lobbies = {row.match_id: ([], []) for row in rows}
+        if lobbies:
+            participants = MatchParticipantModel.__table__
+            lobby_rows = db.session.execute(
+                db.select(participants.c.match_id, participants.c.summoner_name, participants.c.champion_name).where(
+                    participants.c.match_id.in_(list(lobbies))
+                ).order_by(participants.c.match_id, participants.c.participant_index)
+            )
+            for match_id, summoner_name, champion_name in lobby_rows:
+                summoner_names, champion_names = lobbies[match_id]
+                summoner_names.append(summoner_name)
+                champion_names.append(champion_name)
+        
+        return [RecentMatch(row, *lobbies[row.match_id]) for row in rows]
     
     def save_matches_data_to_db(self, matches_data: dict) -> None:
         """Saves match data to the database.
         
+            Each match is stored once in matches, with one match_participants row per player, no matter
+            how many tracked summoners played it. Rows are inserted in batches of BULK_INSERT_BATCH_SIZE
+            inside a single transaction. Rows already stored are left alone, except lobby slots without a
+            puuid (matches migrated from the old per-summoner table), which are filled in. Only the rows
+            actually written count towards the champion stats of the tracked summoners, so saving the same
+            data twice, or from two syncs at once, is harmless.
+        
             Args:
                 matches_data: A dict containing match data for each match ID.
                 
             Returns:
                 None.
         """
-
-        for match_id, game_data in matches_data.items():
-            match_data = game_data["match_data"]
-            summoner_data = game_data["summoner_data"]
-            participants_data = game_data["participants_data"]
+        match_ids = list(matches_data)
+        participants = MatchParticipantModel.__table__
+        insert_matches = insert_ignoring_duplicates(MatchModel.__table__, ["match_id"])
+        insert_participants = dialect_insert(participants)
+        insert_participants = insert_participants.on_conflict_do_update(
+            index_elements=["match_id", "participant_index"],
+            set_={field: insert_participants.excluded[field] for field in PARTICIPANT_FIELDS},
+            where=participants.c.puuid.is_(None),
+        ).returning(participants.c.match_id, participants.c.participant_index)
+        new_participant_rows = []
+        
+        for start in range(0, len(match_ids), BULK_INSERT_BATCH_SIZE):
+            batch = match_ids[start:start + BULK_INSERT_BATCH_SIZE]
+            match_rows = [self._match_row(match_id, matches_data[match_id]) for match_id in batch]
+            participant_rows = {
+                (row["match_id"], row["participant_index"]): row
+                for match_id in batch for row in self._participant_rows(match_id, matches_data[match_id])
+            }
+            db.session.execute(insert_matches, match_rows)
+            written = db.session.execute(insert_participants, list(participant_rows.values()))
+            new_participant_rows += [participant_rows[tuple(key)] for key in written]
+        
+        tracked_participant_rows = self._tracked_participant_rows(new_participant_rows)
+        self.update_champion_stats(tracked_participant_rows)
+        self.bump_data_version({row["puuid"] for row in tracked_participant_rows})
+        db.session.commit()
+    
+    def rederive_matches(self, raw_matches, batch_size: int = BULK_INSERT_BATCH_SIZE) -> tuple:
+        """Rebuilds matches and match_participants rows from raw match payloads, without any API call.
+        
+        Each payload goes through _parse_match_data again, so fields added to it later are filled in for
+        every stored game. Existing rows are overwritten and missing ones inserted, batch_size matches per
+        commit. Afterwards the champion stats of every tracked summoner in those matches are rebuilt from
+        scratch and their pages marked as changed.
+        
+        Args:
+            raw_matches: Iterable of (match_id, match/v5/matches/{id} payload), e.g. RawMatchCache.items().
             
-            new_match = MatchModel(
-                summoner_puuid=summoner_data["summoner_puuid"],
+        Returns:
+            (matches, participant rows) written.
+        """
+        participants = MatchParticipantModel.__table__
+        insert_matches = dialect_insert(MatchModel.__table__)
+        insert_matches = insert_matches.on_conflict_do_update(
+            index_elements=["match_id"],
+            set_={column.name: insert_matches.excluded[column.name] for column in MatchModel.__table__.columns if column.name != "match_id"},
+        )
+        insert_participants = dialect_insert(participants)
+        insert_participants = insert_participants.on_conflict_do_update(
+            index_elements=["match_id", "participant_index"],
+            set_={field: insert_participants.excluded[field] for field in PARTICIPANT_FIELDS + ("game_start", "queue_id")},
+        )
+        written = [0, 0]
+        puuids = set()
+        
+        def write(batch: dict) -> None:
+            match_rows = [self._match_row(match_id, game_data) for match_id, game_data in batch.items()]
+            participant_rows = [row for match_id, game_data in batch.items() for row in self._participant_rows(match_id, game_data)]
+            db.session.execute(insert_matches, match_rows)
+            db.session.execute(insert_participants, participant_rows)
+            db.session.commit()
+            written[0] += len(match_rows)
+            written[1] += len(participant_rows)
+            puuids.update(row["puuid"] for row in participant_rows if row["puuid"])
+        
+        batch = {}
+        for match_id, payload in raw_matches:
+            batch[match_id] = self._parse_match_data(payload)
+            if len(batch) == batch_size:
+                write(batch)
+                batch = {}
+        if batch:
+            write(batch)
+        
+        tracked_puuids = {row["puuid"] for row in self._tracked_participant_rows([{"puuid": puuid} for puuid in puuids])} - {None}
+        for puuid in tracked_puuids:
+            self.rebuild_champion_stats(puuid)
+        self.bump_data_version(tracked_puuids)
+        db.session.commit()
+        return tuple(written)
+    
+    def _tracked_participant_rows(self, participant_rows: list) -> list:
+        """Keeps the rows of this summoner and of any other summoner stored in the database."""
+        puuids = list({row["puuid"] for row in participant_rows} - {self.puuid})
+        tracked_puuids = {self.puuid}
+        
+        for start in range(0, len(puuids), BULK_INSERT_BATCH_SIZE):
+            tracked_puuids.update(
+                puuid for (puuid,) in db.session.query(SummonerModel.summoner_puuid).filter(
+                    SummonerModel.summoner_puuid.in_(puuids[start:start + BULK_INSERT_BATCH_SIZE])
+                )
+            )
+        return [row for row in participant_rows if row["puuid"] in tracked_puuids]
+    
+    @staticmethod
+    def _match_row(match_id: str, game_data: dict) -> dict:
+        return dict(match_id=match_id, **game_data["match_data"])
+    
+    @staticmethod
+    def _participant_rows(match_id: str, game_data: dict) -> list:
+        match_data = game_data["match_data"]
+        
+        return [
+            dict(
                 match_id=match_id,
-                champion_name=summoner_data["champion_name"],
-                win=summoner_data["win"],
-                kills=summoner_data["kills"],
-                deaths=summoner_data["deaths"],
-                assists=summoner_data["assists"],
-                kda=summoner_data["kda"],
-                cs=summoner_data["cs"],
-                vision=summoner_data["vision"],
-                summoner_spell1=summoner_data["summoner_spell1"],
-                summoner_spell2=summoner_data["summoner_spell2"],
-                item0=summoner_data["item0"],
-                item1=summoner_data["item1"],
-                item2=summoner_data["item2"],
-                item3=summoner_data["item3"],
-                item4=summoner_data["item4"],
-                item5=summoner_data["item5"],
-                item6=summoner_data["item6"],
-                participant1_summoner_name=participants_data[0]["summoner_name"],
-                participant2_summoner_name=participants_data[1]["summoner_name"],
-                participant3_summoner_name=participants_data[2]["summoner_name"],
-                participant4_summoner_name=participants_data[3]["summoner_name"],
-                participant5_summoner_name=participants_data[4]["summoner_name"],
-                participant6_summoner_name=participants_data[5]["summoner_name"],
-                participant7_summoner_name=participants_data[6]["summoner_name"],
-                participant8_summoner_name=participants_data[7]["summoner_name"],
-                participant9_summoner_name=participants_data[8]["summoner_name"],
-                participant10_summoner_name=participants_data[9]["summoner_name"],
-                participant1_champion_name=participants_data[0]["champion_name"],
-                participant2_champion_name=participants_data[1]["champion_name"],
-                participant3_champion_name=participants_data[2]["champion_name"],
-                participant4_champion_name=participants_data[3]["champion_name"],
-                participant5_champion_name=participants_data[4]["champion_name"],
-                participant6_champion_name=participants_data[5]["champion_name"],
-                participant7_champion_name=participants_data[6]["champion_name"],
-                participant8_champion_name=participants_data[7]["champion_name"],
-                participant9_champion_name=participants_data[8]["champion_name"],
-                participant10_champion_name=participants_data[9]["champion_name"],
-                participant1_team_id=participants_data[0]["team_id"],
-                participant2_team_id=participants_data[1]["team_id"],
-                participant3_team_id=participants_data[2]["team_id"],
-                participant4_team_id=participants_data[3]["team_id"],
-                participant5_team_id=participants_data[4]["team_id"],
-                participant6_team_id=participants_data[5]["team_id"],
-                participant7_team_id=participants_data[6]["team_id"],
-                participant8_team_id=participants_data[7]["team_id"],
-                participant9_team_id=participants_data[8]["team_id"],
-                participant10_team_id=participants_data[9]["team_id"],
-                game_mode=match_data["game_mode"],
-                game_duration=match_data["game_duration"],
+                participant_index=participant_index,
+                game_start=match_data["game_start"],
                 queue_id=match_data["queue_id"],
-                team_position=summoner_data["team_position"]
+                **{field: participant_data[field] for field in PARTICIPANT_FIELDS},
             )
-            
-            db.session.add(new_match)
-            db.session.commit()
\ No newline at end of file
+            for participant_index, participant_data in enumerate(game_data["participants_data"])
+        ]
@@ -8,7 +8,9 @@ class SummonerModel(db.Model):
     __tablename__ = 'summoners'
     summoner_puuid = db.Column(db.String, primary_key=True, unique=True)
     summoner_id = db.Column(db.String)
-    summoner_name = db.Column(db.String)
+    summoner_name = db.Column(db.String, index=True)
+    # summoner_name sin espacios y en minúsculas, como lo compara Riot; es por lo que se busca un nombre (ver summoner_name_key)
+    summoner_name_key = db.Column(db.String, index=True)
     region = db.Column(db.String)
     last_update = db.Column(db.Integer)
     soloq_rank = db.Column(db.String, default='Unranked')
@@ -23,13 +25,25 @@ class SummonerModel(db.Model):
     flex_wr = db.Column(db.Integer, default=0)
     profile_icon_id = db.Column(db.Integer)
     summoner_level = db.Column(db.Integer)
+    # game_start (ms) de la partida más reciente que había en la última sincronización del invocador
+    matches_synced_until = db.Column(db.BigInteger)
+    # game_start (ms) de la partida más antigua del historial sincronizado; las anteriores se piden bajo demanda. 0 cuando ya no quedan más
+    matches_backfilled_to = db.Column(db.BigInteger)
+    # Momento (s) de la última sincronización de partidas y de la última actualización de icono y nivel; last_update es la del rango
+    matches_synced_at = db.Column(db.Integer)
+    profile_updated_at = db.Column(db.Integer)
+    # Sube cada vez que cambian los datos que muestra su página (rango o partidas nuevas); forma parte de la clave de la caché de páginas
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    data_updated_at = db.Column(db.Integer)
     
     champion_stats = db.relationship('ChampionStatsModel', backref='summoner', lazy=True)
-    matches = db.relationship('MatchModel', lazy=True, backref='summoner')
     
     
 class ChampionStatsModel(db.Model):
     __tablename__ = 'champion_stats'
+    __table_args__ = (
+        db.Index('uq_champion_stats_summoner_puuid_champion_name', 'summoner_puuid', 'champion_name', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     summoner_puuid = db.Column(db.String, db.ForeignKey('summoners.summoner_puuid'))
     champion_name = db.Column(db.String)
@@ -42,18 +56,45 @@ class ChampionStatsModel(db.Model):
     deaths = db.Column(db.Integer)
     assists = db.Column(db.Integer)
     cs = db.Column(db.Integer)
+    kills_total = db.Column(db.Integer, default=0)
+    deaths_total = db.Column(db.Integer, default=0)
+    assists_total = db.Column(db.Integer, default=0)
+    cs_total = db.Column(db.Integer, default=0)
     
     
 class MatchModel(db.Model):
     __tablename__ = 'matches'
+    match_id = db.Column(db.String, primary_key=True)
+    game_id = db.Column(db.BigInteger)
+    game_start = db.Column(db.BigInteger)
+    game_mode = db.Column(db.String)
+    game_duration = db.Column(db.Integer)
+    queue_id = db.Column(db.Integer)
+    
+    participants = db.relationship(
+        'MatchParticipantModel', lazy=True, backref='match', order_by='MatchParticipantModel.participant_index'
+    )
+
+
+class MatchParticipantModel(db.Model):
+    __tablename__ = 'match_participants'
+    __table_args__ = (
+        db.Index('ix_match_participants_puuid_game_start', 'puuid', 'game_start'),
+        db.Index('uq_match_participants_puuid_match_id', 'puuid', 'match_id', unique=True),
+        db.Index('uq_match_participants_match_id_participant_index', 'match_id', 'participant_index', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    summoner_puuid = db.Column(db.String, db.ForeignKey('summoners.summoner_puuid'))
-    match_id = db.Column(db.String)
+    match_id = db.Column(db.String, db.ForeignKey('matches.match_id'), nullable=False)
+    participant_index = db.Column(db.Integer, nullable=False)
+    puuid = db.Column(db.String)
+    summoner_name = db.Column(db.String)
     champion_name = db.Column(db.String)
+    team_id = db.Column(db.Integer)
+    team_position = db.Column(db.String)
     win = db.Column(db.Integer)
-    kills = db.Column(db.Float)
-    deaths = db.Column(db.Float)
-    assists = db.Column(db.Float)
+    kills = db.Column(db.Integer)
+    deaths = db.Column(db.Integer)
+    assists = db.Column(db.Integer)
     kda = db.Column(db.Float)
     cs = db.Column(db.Integer)
     vision = db.Column(db.Integer)
@@ -66,39 +107,6 @@ class MatchModel(db.Model):
     item4 = db.Column(db.Integer)
     item5 = db.Column(db.Integer)
     item6 = db.Column(db.Integer)
-    participant1_summoner_name = db.Column(db.String)
-    participant2_summoner_name = db.Column(db.String)
-    participant3_summoner_name = db.Column(db.String)
-    participant4_summoner_name = db.Column(db.String)
-    participant5_summoner_name = db.Column(db.String)
-    participant6_summoner_name = db.Column(db.String)
-    participant7_summoner_name = db.Column(db.String)
-    participant8_summoner_name = db.Column(db.String)
-    participant9_summoner_name = db.Column(db.String)
-    participant10_summoner_name = db.Column(db.String)
-    participant1_champion_name = db.Column(db.String)
-    participant2_champion_name = db.Column(db.String)
-    participant3_champion_name = db.Column(db.String)
-    participant4_champion_name = db.Column(db.String)
-    participant5_champion_name = db.Column(db.String)
-    participant6_champion_name = db.Column(db.String)
-    participant7_champion_name = db.Column(db.String)
-    participant8_champion_name = db.Column(db.String)
-    participant9_champion_name = db.Column(db.String)
-    participant10_champion_name = db.Column(db.String)
-    participant1_team_id = db.Column(db.String)
-    participant2_team_id = db.Column(db.String)
-    participant3_team_id = db.Column(db.String)
-    participant4_team_id = db.Column(db.String)
-    participant5_team_id = db.Column(db.String)
-    participant6_team_id = db.Column(db.String)
-    participant7_team_id = db.Column(db.String)
-    participant8_team_id = db.Column(db.String)
-    participant9_team_id = db.Column(db.String)
-    participant10_team_id = db.Column(db.String)
-    game_mode = db.Column(db.String)
-    game_duration = db.Column(db.Integer)
+    # Copia de matches para filtrar y ordenar las partidas de un puuid con un solo índice
+    game_start = db.Column(db.BigInteger)
     queue_id = db.Column(db.Integer)
-    team_position = db.Column(db.String)
-    
-    # summoner_model = db.relationship('SummonerModel', backref='match_records', overlaps="matches,summoner")
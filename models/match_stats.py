@@ -1,23 +1,41 @@
-from .db_models import db, ChampionStatsModel, MatchModel
+from .database_handler import dialect_insert, HISTORY_COMPLETE
+from .db_models import db, ChampionStatsModel, MatchParticipantModel
 from sqlalchemy import cast, Numeric, Float
 
 
 RECENT_MATCHES_LIMIT = 10
+ROLES = ("TOP", "JUNGLE", "MIDDLE", "BOTTOM", "UTILITY")
+# Páginas de partidas antiguas que se piden a Riot como mucho para completar una página del historial
+MAX_HISTORY_FETCHES = 3
+RANKED_QUEUE_IDS = (420, 440)
+# Columnas de champion_stats que se acumulan; wr, kda y las medias salen de ellas
+CHAMPION_STATS_SUMS = ("matches_played", "wins", "kills_total", "deaths_total", "assists_total", "cs_total")
 
 
 class MatchStats:
-    def recent_matches_data(self) -> list:
-        matches_data = self._matches_data_from_db()
-        self.update_champion_stats()
-
-        def match_id_key(match_data):
-            return match_data["match_id"]
-
-        matches_data.sort(key=match_id_key, reverse=True)
-        recent_matches_data = matches_data[:RECENT_MATCHES_LIMIT]
+    def recent_matches_data(self, sync: bool = True) -> list:
+        recent_matches_data = self._matches_data_from_db(limit=RECENT_MATCHES_LIMIT, sync=sync)
 
         return recent_matches_data
     
+    def match_history(self, before: tuple = None, limit: int = 20, queue_filter=None) -> tuple:
+        """
+        Una página del historial de partidas, de la más reciente a la más antigua, empezando después de before (ver RecentMatch.cursor).
+        Si lo guardado no llega para llenar la página se piden a Riot las partidas anteriores al historial sincronizado (fetch_older_matches),
+        así las antiguas solo se descargan cuando alguien llega a ellas. Devuelve (partidas, si puede haber más).
+        """
+        matches = self.recent_matches(limit=limit, queue_filter=queue_filter, before=before)
+        backfilled_to = self.matches_backfilled_to()
+        
+        for _ in range(MAX_HISTORY_FETCHES):
+            if len(matches) >= limit or backfilled_to is None or backfilled_to == HISTORY_COMPLETE:
+                break
+            backfilled_to = self.fetch_older_matches(limit)
+            matches = self.recent_matches(limit=limit, queue_filter=queue_filter, before=before)
+        
+        # Sin marca (invocador migrado que aún no se ha sincronizado) no hay nada que pedir hasta la sincronización
+        return matches, len(matches) >= limit or backfilled_to not in (None, HISTORY_COMPLETE)
+    
     def calculate_kda(self, kills: int, deaths: int, assists: int) -> float:
         kda = (kills + assists) / (deaths if deaths != 0 else 1)
         return round(kda, 2)
@@ -25,53 +43,88 @@ class MatchStats:
     def calculate_average(self, value: int, total_games: int) -> float:
         return round(value / total_games, 1)
     
-    def update_champion_stats(self):
-        # Crea una tabla temporal con los datos agregados de matches
-
-        temp_stats = db.session.query(
-            MatchModel.summoner_puuid,
-            MatchModel.champion_name,
-            db.func.count().label("matches_played"),
-            db.func.sum(MatchModel.win).label("wins"),
-            (db.func.count() - db.func.sum(MatchModel.win)).label("losses"),
-            (db.func.round(cast(db.func.sum(MatchModel.win) * 100.0, Numeric) / db.func.count())).label("wr"),
-            (db.func.round(cast(db.func.sum(MatchModel.kills) + db.func.sum(MatchModel.assists), Numeric) / cast(db.func.sum(MatchModel.deaths) + 0.001, Numeric), 2)).label("kda"),
-            (db.func.round(cast(db.func.sum(MatchModel.kills) * 1.0, Numeric) / db.func.count(), 1)).label("kills"),
-            (db.func.round(cast(db.func.sum(MatchModel.deaths) * 1.0, Numeric) / db.func.count(), 1)).label("deaths"),
-            (db.func.round(cast(db.func.sum(MatchModel.assists) * 1.0, Numeric) / db.func.count(), 1)).label("assists"),
-            (db.func.round(cast(db.func.sum(MatchModel.cs) * 1.0, Numeric) / db.func.count())).label("cs")
-        ).filter(MatchModel.queue_id.in_([420, 440])).group_by(MatchModel.summoner_puuid, MatchModel.champion_name).subquery()
-
-        # Insertar los registros de la tabla temporal en champion_stats
-        insert_stat = ChampionStatsModel.__table__.insert().from_select(
-            [
-                ChampionStatsModel.summoner_puuid,
-                ChampionStatsModel.champion_name,
-                ChampionStatsModel.matches_played,
-                ChampionStatsModel.wins,
-                ChampionStatsModel.losses,
-                ChampionStatsModel.wr,
-                ChampionStatsModel.kda,
-                ChampionStatsModel.kills,
-                ChampionStatsModel.deaths,
-                ChampionStatsModel.assists,
-                ChampionStatsModel.cs,
-            ],
-            temp_stats.select().where(
-                db.not_(
-                    db.session.query(ChampionStatsModel).filter(
-                        ChampionStatsModel.summoner_puuid == temp_stats.c.summoner_puuid,
-                        ChampionStatsModel.champion_name == temp_stats.c.champion_name
-                    ).exists()
+    def update_champion_stats(self, new_matches: list) -> None:
+        """
+        Suma las partidas nuevas (filas de match_participants, solo ranked) a las estadísticas de campeón de su summoner.
+        Solo se tocan las filas (puuid, campeón) de esas partidas: los totales se acumulan con un upsert y wr, kda y las medias se recalculan a partir de ellos.
+        No hace commit; se llama desde save_matches_data_to_db dentro de su transacción.
+        """
+        totals = {}
+        for match in new_matches:
+            if match["queue_id"] not in RANKED_QUEUE_IDS:
+                continue
+            key = (match["puuid"], match["champion_name"])
+            champion = totals.setdefault(key, dict.fromkeys(CHAMPION_STATS_SUMS, 0))
+            champion["matches_played"] += 1
+            champion["wins"] += match["win"]
+            champion["kills_total"] += int(match["kills"])
+            champion["deaths_total"] += int(match["deaths"])
+            champion["assists_total"] += int(match["assists"])
+            champion["cs_total"] += match["cs"]
+        
+        if not totals:
+            return
+        
+        stats = ChampionStatsModel.__table__
+        insert_stats = dialect_insert(stats)
+        insert_stats = insert_stats.on_conflict_do_update(
+            index_elements=["summoner_puuid", "champion_name"],
+            set_={column: stats.c[column] + insert_stats.excluded[column] for column in CHAMPION_STATS_SUMS},
+        )
+        db.session.execute(insert_stats, [
+            {"summoner_puuid": puuid, "champion_name": champion_name, **sums}
+            for (puuid, champion_name), sums in totals.items()
+        ])
+        
+        champions_by_puuid = {}
+        for puuid, champion_name in totals:
+            champions_by_puuid.setdefault(puuid, []).append(champion_name)
+        
+        games = stats.c.matches_played
+        for puuid, champion_names in champions_by_puuid.items():
+            db.session.execute(
+                stats.update().where(
+                    stats.c.summoner_puuid == puuid,
+                    stats.c.champion_name.in_(champion_names),
+                ).values(
+                    losses=games - stats.c.wins,
+                    wr=db.func.round(cast(stats.c.wins * 100.0, Numeric) / games),
+                    kda=db.func.round(
+                        cast(stats.c.kills_total + stats.c.assists_total, Numeric)
+                        / db.case((stats.c.deaths_total == 0, 1), else_=stats.c.deaths_total),
+                        2,
+                    ),
+                    kills=db.func.round(cast(stats.c.kills_total * 1.0, Numeric) / games, 1),
+                    deaths=db.func.round(cast(stats.c.deaths_total * 1.0, Numeric) / games, 1),
+                    assists=db.func.round(cast(stats.c.assists_total * 1.0, Numeric) / games, 1),
+                    cs=db.func.round(cast(stats.c.cs_total * 1.0, Numeric) / games),
                 )
             )
-        )
-
-        db.session.execute(insert_stat)
-        db.session.commit()
         
+    def rebuild_champion_stats(self, puuid: str = None) -> None:
+        """
+        Vuelve a calcular desde cero las estadísticas de campeón del summoner (o del puuid que se pase) con todas sus filas de match_participants.
+        Hace falta cuando empieza a seguirse un summoner cuyas partidas ya estaban guardadas por la sincronización de otro,
+        o después de rederive_matches. No hace commit.
+        """
+        puuid = puuid or self.puuid
+        db.session.execute(ChampionStatsModel.__table__.delete().where(ChampionStatsModel.summoner_puuid == puuid))
+
+        participations = db.session.query(
+            MatchParticipantModel.puuid,
+            MatchParticipantModel.champion_name,
+            MatchParticipantModel.queue_id,
+            MatchParticipantModel.win,
+            MatchParticipantModel.kills,
+            MatchParticipantModel.deaths,
+            MatchParticipantModel.assists,
+            MatchParticipantModel.cs,
+        ).filter(
+            MatchParticipantModel.puuid == puuid,
+            MatchParticipantModel.queue_id.in_(RANKED_QUEUE_IDS),
+        )
+        self.update_champion_stats([participation._asdict() for participation in participations])
 
-        
     def top_champions_data(self, top=5):
         top_champions_query = db.session.query(
             ChampionStatsModel.champion_name,
@@ -108,24 +161,27 @@ class MatchStats:
 
         return top_champions
         
-    def role_data(self) -> dict:
+    def role_data(self, queue_filter=None, since: int = None, until: int = None) -> dict:
+        """
+        Partidas jugadas en cada posición, contadas por la base de datos con un GROUP BY.
+        Opcionalmente solo de las colas de queue_filter (un queue_id o varios) y de las partidas empezadas entre since y until (game_start, en ms).
+        """
+        role_counts = dict.fromkeys(ROLES, 0)
         role_data_query = db.session.query(
-            MatchModel.team_position
+            MatchParticipantModel.team_position,
+            db.func.count(),
         ).filter(
-            MatchModel.summoner_puuid == self.puuid
+            MatchParticipantModel.puuid == self.puuid,
+            MatchParticipantModel.team_position.in_(ROLES),
         )
-
-        role_data = role_data_query.all()
-        role_counts = {
-            "TOP": 0,
-            "JUNGLE": 0,
-            "MIDDLE": 0,
-            "BOTTOM": 0,
-            "UTILITY": 0,
-        }
-        for role in role_data:
-            role = role[0]
-            if role in role_counts:
-                role_counts[role] += 1
-
-        return role_counts
\ No newline at end of file
+        
+        if queue_filter is not None:
+            queue_ids = [queue_filter] if isinstance(queue_filter, int) else list(queue_filter)
+            role_data_query = role_data_query.filter(MatchParticipantModel.queue_id.in_(queue_ids))
+        if since is not None:
+            role_data_query = role_data_query.filter(MatchParticipantModel.game_start >= since)
+        if until is not None:
+            role_data_query = role_data_query.filter(MatchParticipantModel.game_start < until)
+        
+        role_counts.update(role_data_query.group_by(MatchParticipantModel.team_position))
+        return role_counts
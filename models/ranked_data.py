@@ -4,56 +4,75 @@ from typing import Dict, Any
 
 
 
+QUEUE_PREFIXES = {"RANKED_SOLO_5x5": "soloq", "RANKED_FLEX_SR": "flex"}
+
+
+class RankedSnapshot:
+    """
+    Las entradas de league/v4/entries ya interpretadas: rango, LP, victorias, derrotas y winrate de soloq y flex.
+    Se construye una vez por respuesta, así que los accesores derivados (soloq_rank, flex_rank, partidas jugadas...) no vuelven a pedir nada.
+    """
+    __slots__ = ("league_entries", "ranks")
+
+    def __init__(self, league_entries: list) -> None:
+        self.league_entries = league_entries
+        self.ranks = {}
+        for prefix in QUEUE_PREFIXES.values():
+            self.ranks.update({
+                f"{prefix}_rank": "Unranked",
+                f"{prefix}_lp": 0,
+                f"{prefix}_wins": 0,
+                f"{prefix}_losses": 0,
+                f"{prefix}_wr": 0,
+            })
+        
+        # Itero sobre las 2 entradas (soloq y flex) porque los retrasados de riot las devuelven en orden aleatorio en cada solicitud
+        for entry in league_entries:
+            prefix = QUEUE_PREFIXES.get(entry["queueType"])
+            if prefix is None:
+                continue
+            win_rate = int(round((entry['wins'] / (entry['wins'] + entry['losses'])) * 100))
+            self.ranks[f"{prefix}_rank"] = f"{entry['tier']} {roman.fromRoman(entry['rank'])}"
+            self.ranks[f"{prefix}_lp"] = entry['leaguePoints']
+            self.ranks[f"{prefix}_wins"] = entry['wins']
+            self.ranks[f"{prefix}_losses"] = entry['losses']
+            self.ranks[f"{prefix}_wr"] = win_rate
+
+    def games_played(self, prefix: str) -> int:
+        return self.ranks[f"{prefix}_wins"] + self.ranks[f"{prefix}_losses"]
+
+
 class RankedData:
     def league_entries(self) -> Dict[str, Any]:
         endpoint = f"league/v4/entries/by-summoner/{self.id}"
         return self._get(endpoint)
     
+    def ranked_snapshot(self) -> RankedSnapshot:
+        '''Devuelve el RankedSnapshot de las entradas actuales; solo se reconstruye si la respuesta de league_entries() cambia (p. ej. tras invalidate_responses).'''
+        league_entries = self.league_entries()
+        snapshot = getattr(self, "_ranked_snapshot", None)
+        if snapshot is None or snapshot.league_entries is not league_entries:
+            snapshot = self._ranked_snapshot = RankedSnapshot(league_entries)
+        return snapshot
+    
     def fetch_summoner_ranks(self)-> Dict[str, str]:
         '''Retorna el rank de soloq y flex en formato Dict'''
-        league_entries = self.league_entries()
-        ranks = {
-            "soloq_rank": "Unranked",
-            "soloq_lp": 0,
-            "soloq_wins": 0,
-            "soloq_losses": 0,
-            "soloq_wr": 0,
-            "flex_rank": "Unranked",
-            "flex_lp": 0,
-            "flex_wins": 0,
-            "flex_losses": 0,
-            "flex_wr": 0,
-            "profile_icon_id": self.summoner_icon_id(),
-            "summoner_level": self.summoner_level(),
+        return {
+            **self.ranked_snapshot().ranks,
+            "profile_icon_id": self.icon_id,
+            "summoner_level": self.level,
         }
-        
-        # Itero sobre las 2 entradas (soloq y flex) porque los retrasados de riot las devuelven en orden aleatorio en cada solicitud
-        for entry in league_entries:
-            win_rate = int(round((entry['wins'] / (entry['wins'] + entry['losses'])) * 100))
-            if entry["queueType"] == "RANKED_SOLO_5x5":
-                ranks["soloq_rank"] = f"{entry['tier']} {roman.fromRoman(entry['rank'])}"
-                ranks["soloq_lp"] = entry['leaguePoints']
-                ranks["soloq_wins"] = entry['wins']
-                ranks["soloq_losses"] = entry['losses']
-                ranks["soloq_wr"] = win_rate
-            elif entry["queueType"] == "RANKED_FLEX_SR":
-                ranks["flex_rank"] = f"{entry['tier']} {roman.fromRoman(entry['rank'])}"
-                ranks["flex_lp"] = entry['leaguePoints']
-                ranks["flex_wins"] = entry['wins']
-                ranks["flex_losses"] = entry['losses']
-                ranks["flex_wr"] = win_rate
-        return ranks
     
     def soloq_rank(self) -> str:
-        return self.fetch_summoner_ranks()['soloq_rank']
+        return self.ranked_snapshot().ranks['soloq_rank']
     
     def flex_rank(self) -> str:
-        return self.fetch_summoner_ranks()['flex_rank']
+        return self.ranked_snapshot().ranks['flex_rank']
     
     def league_data(self) -> dict:
         '''
         Intenta obtener los datos de soloq y flex desde la base de datos. Si no existen, los solicita a la API con fetch_summoner_ranks() y los guarda en la base de datos.
-        Además, si han pasado más de una hora desde la última actualización, actualiza los datos de partidas y la información del invocador en la base de datos.
+        Los datos guardados se devuelven aunque sean viejos: refresh_stale_data() los actualiza en segundo plano cuando pasa RANK_TTL.
         '''
         
         summoner_data = self._summoner_data_from_db()
@@ -68,14 +87,5 @@ class RankedData:
             return data
     
     def total_ranked_games_played_per_queue(self) -> tuple:
-        league_entries = self.league_entries()
-        soloq_games_played = 0
-        flex_games_played = 0
-
-        for entry in league_entries:
-            if entry["queueType"] == "RANKED_SOLO_5x5":
-                soloq_games_played = entry["wins"] + entry["losses"]
-            elif entry["queueType"] == "RANKED_FLEX_SR":
-                flex_games_played = entry["wins"] + entry["losses"]
-
-        return (soloq_games_played, flex_games_played)
\ No newline at end of file
+        snapshot = self.ranked_snapshot()
+        return (snapshot.games_played("soloq"), snapshot.games_played("flex"))
@@ -1,26 +1,135 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.request_utils import BACKGROUND, current_priority, request_priority
+from utils.single_flight import SingleFlight
+
 from .api_handler import APIHandler
-from .database_handler import DatabaseHandler
+from .database_handler import DatabaseHandler, HISTORY_COMPLETE
 from .match_stats import MatchStats
 from .ranked_data import RankedData
 from .summoner_info import SummonerInfo
 
 
+# Con SYNC_LOCK_DIR las sincronizaciones también se coordinan entre procesos (p. ej. varios workers de gunicorn)
+SYNC_LOCK_DIR = os.getenv("SYNC_LOCK_DIR")
+summoner_syncs = SingleFlight(lock_dir=SYNC_LOCK_DIR)
+# Match ids que lista cada vuelta del backfill (una página de Riot)
+BACKFILL_PAGE_SIZE = 100
+
+
 class SummonerData(SummonerInfo, DatabaseHandler, APIHandler, RankedData, MatchStats):
-    def __init__(self, summoner_name: str, api_key: str, region: str = "EUW1") -> None:
+    def __init__(self, summoner_name: str, api_key: str, region: str = "EUW1", identity: dict = None) -> None:
         self.api_key = api_key
         self.region = region
         self.summoner_name = summoner_name
         self.base_url = f"https://{region}.api.riotgames.com/lol/"
         
-        self._summoner_info = None
-        self.id = self.summoner_id()
-        # self.cache = cachetools.TTLCache(maxsize=100, ttl=30 * 60)
-        
-        if self._summoner_data_from_db() is not None:
-            self.puuid = self._summoner_data_from_db()["summoner_puuid"]
-            self.icon_id = self._summoner_data_from_db()["profile_icon_id"]
-            self.level = self._summoner_data_from_db()["summoner_level"]
+        # Un invocador ya guardado sale de la caché o de una sola consulta, sin llamar a la API
+        identity = identity or self._summoner_identity()
+        # Si se acaba de buscar en la API su perfil ya está al día
+        self.profile_fetched = identity is None
+        if identity is not None:
+            self.puuid = identity["summoner_puuid"]
+            self.id = identity["summoner_id"]
+            self.icon_id = identity["profile_icon_id"]
+            self.level = identity["summoner_level"]
         else:
+            self.id = self.summoner_id()
             self.puuid = self.summoner_puuid()
             self.icon_id = self.summoner_icon_id()
-            self.level = self.summoner_level()
\ No newline at end of file
+            self.level = self.summoner_level()
+    
+    def refresh_profile(self) -> None:
+        """Vuelve a pedir el invocador a la API (icono y nivel) y lo guarda."""
+        self.invalidate_responses("summoner/v4")
+        self.icon_id = self.summoner_icon_id()
+        self.level = self.summoner_level()
+        self.update_summoner_profile_in_db()
+    
+    def refresh_stale_data(self, progress=None) -> set:
+        """
+        Stale-while-revalidate: la página ya se ha servido con lo guardado, y aquí se refresca lo que ha superado su TTL
+        (rango, perfil y lista de partidas, ver database_handler). Para un invocador nuevo es todo. Devuelve qué se ha refrescado.
+        Como las tres cosas solo dependen de puuid e id, sus llamadas a la API van a la vez en un pool de hilos (la de partidas
+        encadena la lista de ids y la primera tanda de partidas); la base de datos se escribe después, desde este hilo.
+        """
+        stale = self.freshness()[2]
+        if self.profile_fetched:
+            stale.discard("profile")
+        priority = current_priority()
+        
+        def fetch(request, *args):
+            with request_priority(priority):
+                return request(*args)
+        
+        # Las respuestas memorizadas se invalidan antes de lanzar ningún hilo: los de la pool escriben en el mismo diccionario
+        if "profile" in stale:
+            self.invalidate_responses("summoner/v4")
+        if "rank" in stale:
+            self.invalidate_responses("league/v4")
+        if "matches" in stale:
+            self.invalidate_responses("match/v5/matches/by-puuid")
+            plan = self._match_sync_plan()
+        
+        with ThreadPoolExecutor(max_workers=len(stale) or 1) as executor:
+            if "profile" in stale:
+                profile = executor.submit(fetch, self.summoner_info)
+            if "rank" in stale:
+                league_entries = executor.submit(fetch, self.league_entries)
+            if "matches" in stale:
+                new_matches = executor.submit(fetch, self._fetch_new_matches, plan, progress)
+            
+            # El rango primero: para un invocador nuevo crea la fila que necesitan el perfil y las partidas
+            if "profile" in stale:
+                self.icon_id = profile.result()["profileIconId"]
+                self.level = profile.result()["summonerLevel"]
+            if "rank" in stale:
+                league_entries.result()
+                self.save_or_update_summoner_to_db(self.fetch_summoner_ranks())
+            if "profile" in stale:
+                self.update_summoner_profile_in_db()
+            if "matches" in stale:
+                self._save_synced_matches(plan, *new_matches.result())
+        if self.profile_fetched:
+            self._remember_summoner_name(self.summoner_info()["name"])
+        return stale
+
+
+
+def sync_summoner(summoner_name: str, api_key: str, region: str, progress=None) -> int:
+    """
+    Sincroniza un invocador: lo busca en la API si no está guardado y refresca su rango, su perfil y sus partidas si han caducado.
+    Es el trabajo que ejecutan los hilos de utils.sync_queue; necesita un app context. Devuelve el data_version resultante.
+    Las llamadas simultáneas para el mismo (region, puuid) esperan a una sola sincronización y comparten su resultado.
+    """
+    summoner = SummonerData(summoner_name, api_key, region)
+
+    def sync() -> int:
+        summoner.refresh_stale_data(progress=progress)
+        return summoner.data_version()[0]
+
+    return summoner_syncs.do((region.upper(), summoner.puuid), sync, joined=lambda: summoner.data_version()[0])
+
+
+def backfill_matches(summoner_name: str, api_key: str, region: str, progress=None) -> int:
+    """
+    Descarga, página a página, las partidas de la temporada anteriores al historial sincronizado de un invocador ya guardado.
+    Es el trabajo en segundo plano que sigue a una sincronización: todas sus peticiones van con prioridad BACKGROUND,
+    así solo usan el rate limit que dejan las interactivas. Necesita un app context. Devuelve el matches_backfilled_to resultante.
+    """
+    summoner = SummonerData(summoner_name, api_key, region)
+    backfilled_to = summoner.matches_backfilled_to()
+    fetched = page_fetched = 0
+
+    def report(fetched_in_page: int, total_in_page: int) -> None:
+        nonlocal page_fetched
+        page_fetched = fetched_in_page
+        if progress:
+            progress(fetched + fetched_in_page, fetched + total_in_page)
+
+    with request_priority(BACKGROUND):
+        while backfilled_to is not None and backfilled_to != HISTORY_COMPLETE:
+            backfilled_to = summoner.fetch_older_matches(BACKFILL_PAGE_SIZE, progress=report)
+            fetched, page_fetched = fetched + page_fetched, 0
+    return backfilled_to
@@ -1,9 +1,7 @@
 class SummonerInfo:
     def summoner_info(self):
-        if not self._summoner_info:
-            endpoint = f"summoner/v4/summoners/by-name/{self.summoner_name}"
-            self._summoner_info = self._get(endpoint)
-        return self._summoner_info
+        endpoint = f"summoner/v4/summoners/by-name/{self.summoner_name}"
+        return self._get(endpoint)
     
     def summoner_id(self) -> str:
         return self.summoner_info()["id"]
@@ -0,0 +1,27 @@
+import click
+from flask import Blueprint
+
+from models.api_handler import APIHandler
+from models.database_handler import DatabaseHandler
+from models.match_stats import MatchStats
+from utils.raw_cache import get_raw_match_cache
+
+commands_bp = Blueprint("commands", __name__, cli_group=None)
+
+
+class MatchRederiver(APIHandler, DatabaseHandler, MatchStats):
+    """Solo lo necesario para volver a parsear y guardar partidas: no pertenece a ningún invocador ni llama a la API."""
+    puuid = None
+
+
+@commands_bp.cli.command("rederive-matches")
+@click.option("--batch-size", default=500, show_default=True, help="Partidas por commit.")
+def rederive_matches(batch_size):
+    """Vuelve a generar matches y match_participants a partir de la caché de partidas en crudo, sin llamar a la API."""
+    raw_match_cache = get_raw_match_cache()
+    if raw_match_cache is None:
+        raise click.ClickException("La caché de partidas en crudo está desactivada (RAW_MATCH_CACHE_PATH).")
+
+    click.echo(f"Re-derivando {len(raw_match_cache)} partidas de {raw_match_cache.path}")
+    matches, participants = MatchRederiver().rederive_matches(raw_match_cache.items(), batch_size=batch_size)
+    click.echo(f"{matches} partidas y {participants} participantes guardados")
@@ -1,19 +1,192 @@
-from flask import Blueprint, render_template, request
+from flask import Blueprint, abort, current_app, jsonify, make_response, render_template, request
+from cachetools import LRUCache
+from collections import namedtuple
+from datetime import datetime, timezone
+import hashlib
 import os
+import threading
+import time
 
-from models.summoner_data import SummonerData
-from utils.utils import get_game_type
+from models.database_handler import stored_summoner_identity, summoner_cache_key
+from models.summoner_data import SummonerData, backfill_matches, sync_summoner
+from utils.request_utils import RiotNotFoundError
+from utils.sync_queue import DONE, sync_queue
 
 summoner_bp = Blueprint("summoner", __name__)
 
+# Páginas renderizadas por (region, summoner_name, puuid, data_version); el límite es en bytes de HTML
+PAGE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+CachedPage = namedtuple("CachedPage", ["body", "etag", "last_modified"])
+page_cache = LRUCache(maxsize=PAGE_CACHE_MAX_BYTES, getsizeof=lambda page: len(page.body))
+page_cache_lock = threading.Lock()
+# Segundos durante los que un nombre que Riot no encontró devuelve 404 sin volver a preguntar
+NOT_FOUND_TTL = 5 * 60
+# Partidas por página del historial; como mucho una página de ids de Riot
+MATCH_HISTORY_PAGE_SIZE = 20
+MATCH_HISTORY_MAX_PAGE_SIZE = 100
+
+def enqueue_sync(region: str, summoner_name: str):
+    """
+    Encola la sincronización del invocador; si ya hay una pendiente devuelve esa.
+    Al terminar encola el backfill de sus partidas antiguas, que no hace nada si el historial ya está completo.
+    """
+    app = current_app._get_current_object()
+    api_key = os.getenv("RIOT_API_KEY")
+
+    def run(job):
+        with app.app_context():
+            data_version = sync_summoner(summoner_name, api_key, region, progress=job.report)
+        enqueue_backfill(app, region, summoner_name)
+        return data_version
+
+    return sync_queue.enqueue(summoner_cache_key(region, summoner_name), run)
+
+
+def backfill_key(region: str, summoner_name: str) -> tuple:
+    return ("backfill",) + summoner_cache_key(region, summoner_name)
+
+
+def enqueue_backfill(app, region: str, summoner_name: str):
+    """Encola en segundo plano (prioridad baja) la descarga de las partidas de la temporada que faltan por sincronizar."""
+    api_key = os.getenv("RIOT_API_KEY")
+
+    def run(job):
+        with app.app_context():
+            return backfill_matches(summoner_name, api_key, region, progress=job.report)
+
+    return sync_queue.enqueue(backfill_key(region, summoner_name), run, background=True)
+
+
+def recently_not_found(region: str, summoner_name: str) -> bool:
+    job = sync_queue.job(summoner_cache_key(region, summoner_name))
+    return (
+        job is not None
+        and isinstance(job.error, RiotNotFoundError)
+        and time.time() - job.finished_at < NOT_FOUND_TTL
+    )
+
+
 @summoner_bp.route('/summoners/<region>/<summoner_name>', methods=['GET'])
 def summoner_info(region, summoner_name):
     api_key = os.getenv("RIOT_API_KEY")
     
+    # Nunca se llama a Riot desde la petición: la sincronización va a la cola y se sirve lo que ya está guardado
+    identity = stored_summoner_identity(region, summoner_name)
+    if identity is None:
+        if recently_not_found(region, summoner_name):
+            abort(404)
+        enqueue_sync(region, summoner_name)
+        return render_template('summoner_syncing.html', summoner_name=summoner_name, region=region), 202
+    
+    summoner = SummonerData(summoner_name, api_key, region, identity=identity)
+    
+    # Se sirve lo guardado y, si algo ha superado su TTL, se refresca en segundo plano
+    data_version, data_updated_at, stale = summoner.freshness()
+    if stale:
+        syncing = enqueue_sync(region, summoner_name).pending
+    else:
+        job = sync_queue.job(summoner_cache_key(region, summoner_name))
+        syncing = job is not None and job.pending
+    
+    return summoner_page_response(summoner, region, summoner_name, data_version, data_updated_at, syncing)
+
+
+def summoner_page_response(summoner: SummonerData, region: str, summoner_name: str, data_version: int, data_updated_at: int, syncing: bool):
+    # Mientras no cambie data_version la página es la misma: se sirve de la caché o con un 304
+    cache_key = (region, summoner_name, summoner.puuid, data_version, syncing)
+    with page_cache_lock:
+        page = page_cache.get(cache_key)
+    if page is None:
+        page = render_summoner_page(summoner, region, summoner_name, data_version, data_updated_at, syncing)
+        with page_cache_lock:
+            page_cache[cache_key] = page
+    
+    response = make_response(page.body)
+    response.set_etag(page.etag)
+    response.last_modified = page.last_modified
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+@summoner_bp.route('/summoners/<region>/<summoner_name>/sync', methods=['GET'])
+def sync_status(region, summoner_name):
+    """Progreso de la sincronización en segundo plano, para la página en estado "syncing"."""
+    job = sync_queue.job(summoner_cache_key(region, summoner_name))
+    identity = stored_summoner_identity(region, summoner_name)
+    if job is None and identity is None:
+        # La cola es de cada proceso: con varios workers la sincronización puede estar en otro. Se encola también aquí
+        # (con SYNC_LOCK_DIR espera a la del otro proceso en lugar de repetirla) y la página sigue esperando
+        job = enqueue_sync(region, summoner_name)
+    status = job.status() if job else {"state": "idle", "fetched": 0, "total": 0, "error": None}
+    status["not_found"] = bool(job and isinstance(job.error, RiotNotFoundError))
+    backfill = sync_queue.job(backfill_key(region, summoner_name))
+    status["backfill"] = backfill.status() if backfill else None
+
+    if identity is not None:
+        summoner = SummonerData(summoner_name, os.getenv("RIOT_API_KEY"), region, identity=identity)
+        status["data_version"] = summoner.data_version()[0]
+    else:
+        status["data_version"] = None
+        # La sincronización de este proceso terminó sin guardar al invocador: no hay nada que recargar
+        if status["state"] == DONE and stored_summoner_identity(region, summoner_name) is None:
+            status["not_found"] = True
+    return jsonify(status)
+
+
+@summoner_bp.route('/api/summoners/<region>/<summoner_name>/matches', methods=['GET'])
+def match_history(region, summoner_name):
+    """
+    Historial de partidas en JSON con paginación por cursor (keyset sobre game_start y match_id), para el scroll infinito.
+    Parámetros: cursor (el next_cursor de la página anterior), limit y queue (se puede repetir).
+    """
+    identity = stored_summoner_identity(region, summoner_name)
+    if identity is None:
+        if recently_not_found(region, summoner_name):
+            abort(404)
+        enqueue_sync(region, summoner_name)
+        return jsonify({"matches": [], "next_cursor": None, "has_more": True, "syncing": True}), 202
+    
+    before = parse_match_cursor(request.args.get("cursor"))
+    limit = min(max(request.args.get("limit", MATCH_HISTORY_PAGE_SIZE, type=int), 1), MATCH_HISTORY_MAX_PAGE_SIZE)
+    queue_filter = request.args.getlist("queue", type=int) or None
+    
+    summoner = SummonerData(summoner_name, os.getenv("RIOT_API_KEY"), region, identity=identity)
+    matches, has_more = summoner.match_history(before=before, limit=limit, queue_filter=queue_filter)
     
-    summoner = SummonerData(summoner_name, api_key, region)
+    next_cursor = None
+    if has_more:
+        next_cursor = format_match_cursor(matches[-1].cursor) if matches else request.args.get("cursor")
+    job = sync_queue.job(summoner_cache_key(region, summoner_name))
+    return jsonify({
+        "matches": [match.to_dict() for match in matches],
+        "next_cursor": next_cursor,
+        "has_more": has_more,
+        "syncing": job is not None and job.pending,
+    })
+
+
+# game_start de un cursor de una partida sin fecha (las migradas que aún no se han vuelto a pedir)
+UNDATED_CURSOR = "null"
+
+
+def format_match_cursor(cursor: tuple) -> str:
+    game_start, match_id = cursor
+    return f"{UNDATED_CURSOR if game_start is None else game_start}:{match_id}"
+
+
+def parse_match_cursor(cursor: str) -> tuple:
+    """(game_start, match_id) de un cursor de format_match_cursor, None si no hay cursor; 400 si no es válido."""
+    if not cursor:
+        return None
+    game_start, _, match_id = cursor.partition(":")
+    if not match_id or not (game_start.isdigit() or game_start == UNDATED_CURSOR):
+        abort(400)
+    return (None if game_start == UNDATED_CURSOR else int(game_start)), match_id
+
+
+def render_summoner_page(summoner: SummonerData, region: str, summoner_name: str, data_version: int, data_updated_at: int, syncing: bool) -> CachedPage:
     summoner_data = summoner.league_data()
-    recent_matches_data = summoner.recent_matches_data()
+    recent_matches = summoner.recent_matches_data(sync=False)
     top_champs_data = summoner.top_champions_data()
     role_data = summoner.role_data()
 
@@ -50,45 +223,17 @@ def summoner_info(region, summoner_name):
         }
         for champ in top_champs_data
     ]
-    
-    recent_matches = [
-        {
-            "game_type": get_game_type(match["queue_id"]),
-            "game_mode": match["game_mode"],
-            "queue_id": match["queue_id"],
-            "game_duration": match["game_duration"],
-            "win": match["win"],
-            "champion_name": match["champion_name"],
-            "item_ids": [
-                match["item0"], 
-                match["item1"], 
-                match["item2"], 
-                match["item3"], 
-                match["item4"], 
-                match["item5"], 
-                match["item6"]
-                ],
-            "summoner_spell_ids": [
-                match["summoner_spell1"], 
-                match["summoner_spell2"]],
-            "kills": int(match["kills"]),
-            "deaths": int(match["deaths"]),
-            "assists": int(match["assists"]),
-            "cs": match["cs"],
-            "vision": match["vision"],
-            "participant_summoner_names": [match["participant1_summoner_name"], match["participant2_summoner_name"], match["participant3_summoner_name"], match["participant4_summoner_name"], match["participant5_summoner_name"], match["participant6_summoner_name"], match["participant7_summoner_name"], match["participant8_summoner_name"], match["participant9_summoner_name"], match["participant10_summoner_name"]],
-            "participant_champion_names": [match["participant1_champion_name"], match["participant2_champion_name"], match["participant3_champion_name"], match["participant4_champion_name"], match["participant5_champion_name"], match["participant6_champion_name"], match["participant7_champion_name"], match["participant8_champion_name"], match["participant9_champion_name"], match["participant10_champion_name"]
-            ],
-        }
-        for match in recent_matches_data
-    ]
 
     
-    return render_template('summoner_page.html', 
+    body = render_template('summoner_page.html', 
                         summoner_name=summoner_name,
                         summoner_data=summoner_data,
                         champions_played=champions_played,
                         recent_matches=recent_matches,
                         role_data=role_data,
-                        region=region
-                        )
\ No newline at end of file
+                        region=region,
+                        syncing=syncing,
+                        data_version=data_version
+                        ).encode()
+    last_modified = datetime.fromtimestamp(data_updated_at, timezone.utc) if data_updated_at else None
+    return CachedPage(body, hashlib.sha1(body).hexdigest(), last_modified)
\ No newline at end of file
@@ -0,0 +1,38 @@
+from flask import Blueprint, abort, current_app
+import os
+
+from models.async_summoner_data import AsyncSummonerData
+from models.database_handler import stored_summoner_identity
+from models.summoner_data import SummonerData
+from routes.summoner import enqueue_backfill, recently_not_found, summoner_page_response
+from utils.async_request_utils import create_session
+from utils.request_utils import RiotNotFoundError
+
+summoner_async_bp = Blueprint("summoner_async", __name__)
+
+
+@summoner_async_bp.route('/async/summoners/<region>/<summoner_name>', methods=['GET'])
+async def summoner_info(region, summoner_name):
+    """
+    Versión asíncrona de routes.summoner.summoner_info: en lugar de encolar la sincronización la hace dentro de la petición
+    con AsyncSummonerData, con las llamadas a Riot independientes a la vez, y responde directamente con la página al día.
+    Las partidas antiguas siguen llegando con el backfill en segundo plano.
+    """
+    api_key = os.getenv("RIOT_API_KEY")
+    
+    identity = stored_summoner_identity(region, summoner_name)
+    if identity is None and recently_not_found(region, summoner_name):
+        abort(404)
+    
+    async with create_session() as session:
+        try:
+            summoner = await AsyncSummonerData.create(summoner_name, api_key, region, session, identity=identity)
+        except RiotNotFoundError:
+            abort(404)
+        await summoner.sync()
+    enqueue_backfill(current_app._get_current_object(), region, summoner_name)
+    
+    # La página se monta como en la vista síncrona; con todo guardado no hace ninguna llamada a la API
+    summoner = SummonerData(summoner_name, api_key, region, identity=stored_summoner_identity(region, summoner_name))
+    data_version, data_updated_at, _ = summoner.freshness()
+    return summoner_page_response(summoner, region, summoner_name, data_version, data_updated_at, syncing=False)
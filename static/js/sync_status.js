@@ -0,0 +1,43 @@
+/**
+ * Sigue la sincronización en segundo plano de un invocador.
+ * El elemento #sync-status indica en data-status-url el endpoint JSON de progreso y en
+ * data-data-version la versión de los datos con la que se generó la página.
+ */
+(function() {
+  "use strict";
+
+  const POLL_INTERVAL = 1500
+
+  const banner = document.getElementById("sync-status")
+  if (!banner) {
+    return
+  }
+  const statusUrl = banner.dataset.statusUrl
+  const dataVersion = Number(banner.dataset.dataVersion)
+  const message = banner.querySelector(".sync-message")
+
+  const poll = () => {
+    fetch(statusUrl, { headers: { "Accept": "application/json" } })
+      .then(response => response.json())
+      .then(status => {
+        if (status.state === "queued" || status.state === "running") {
+          if (status.total) {
+            message.textContent = `Downloading matches (${status.fetched}/${status.total})...`
+          }
+          setTimeout(poll, POLL_INTERVAL)
+        } else if (status.not_found) {
+          message.textContent = "Summoner not found."
+        } else if (status.state === "failed") {
+          message.textContent = "The update failed, try again later."
+        } else if (status.data_version !== dataVersion) {
+          // Hay datos nuevos: se recarga para mostrar la página actualizada
+          window.location.reload()
+        } else {
+          banner.remove()
+        }
+      })
+      .catch(() => setTimeout(poll, POLL_INTERVAL))
+  }
+
+  setTimeout(poll, POLL_INTERVAL)
+})();
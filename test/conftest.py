@@ -0,0 +1,106 @@
+import threading
+from collections import Counter
+
+import pytest
+from sqlalchemy import event
+
+import bench.common
+import routes.summoner
+from bench.common import create_bench_app
+from bench.fake_riot import FakeRiot, FakeRiotServer
+from models.api_handler import APIHandler
+from models.database_handler import summoner_cache
+from models.db_models import db
+from routes.summoner import page_cache
+from utils import request_utils
+from utils.request_utils import get_session, method_key
+from utils.sync_queue import SyncQueue
+
+
+class FakeClock:
+    """Stands in for the time module of utils.request_utils: sleep() moves monotonic() forward."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(request_utils, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def riot():
+    return FakeRiot(summoners=3, matches_per_summoner=40)
+
+
+@pytest.fixture
+def riot_server(riot, monkeypatch):
+    """The fake Riot API serving riot, with production key limits."""
+    with FakeRiotServer(riot, headers={"X-App-Rate-Limit": "500:10,30000:600"}) as server:
+        monkeypatch.setattr(APIHandler, "api_base_url", server.api_base_url)
+        yield server
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """The app on a fresh SQLite database, inside an app context, with empty in-process caches and sync queue."""
+    monkeypatch.setenv("RIOT_API_KEY", "test")
+    fresh_queue = SyncQueue()
+    for module in (routes.summoner, bench.common):
+        monkeypatch.setattr(module, "sync_queue", fresh_queue)
+    summoner_cache.clear()
+    page_cache.clear()
+    app = create_bench_app(f"sqlite:///{tmp_path / 'test.db'}")
+    with app.app_context():
+        yield app
+    summoner_cache.clear()
+    page_cache.clear()
+
+
+@pytest.fixture
+def client(app, riot_server):
+    return app.test_client()
+
+
+class Counts:
+    """SQL statements and Riot calls made on any thread."""
+
+    def __init__(self) -> None:
+        self.statements = 0
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def count_statement(self, *args) -> None:
+        with self._lock:
+            self.statements += 1
+
+    def count_call(self, response, *args, **kwargs) -> None:
+        with self._lock:
+            self.calls[method_key(response.url).split("/lol/", 1)[-1]] += 1
+
+    def measure(self, action) -> tuple:
+        """(SQL statements, Riot calls) made while action() runs."""
+        statements, calls = self.statements, sum(self.calls.values())
+        action()
+        return self.statements - statements, sum(self.calls.values()) - calls
+
+
+@pytest.fixture
+def counts(app):
+    counts = Counts()
+    event.listen(db.engine, "before_cursor_execute", counts.count_statement)
+    get_session().hooks["response"].append(counts.count_call)
+    yield counts
+    get_session().hooks["response"].remove(counts.count_call)
+    event.remove(db.engine, "before_cursor_execute", counts.count_statement)
@@ -0,0 +1,51 @@
+from bench.common import load_profile
+from bench.query_plans import full_scans, record_statements
+from models.api_handler import APIHandler
+from models.database_handler import DatabaseHandler
+from models.db_models import db, ChampionStatsModel, MatchModel, MatchParticipantModel
+from models.match_stats import MatchStats
+
+
+class MatchSaver(DatabaseHandler, APIHandler, MatchStats):
+    def __init__(self, puuid: str) -> None:
+        self.puuid = puuid
+
+
+def stored_rows() -> tuple:
+    return (
+        MatchModel.query.count(),
+        MatchParticipantModel.query.count(),
+        db.session.query(db.func.sum(ChampionStatsModel.matches_played)).scalar(),
+    )
+
+
+def test_saving_the_same_matches_twice_adds_no_rows(app, riot):
+    puuid = next(iter(riot.match_ids))
+    saver = MatchSaver(puuid)
+    matches_data = {match_id: saver._parse_match_data(riot.matches[match_id]) for match_id in riot.match_ids[puuid]}
+
+    saver.save_matches_data_to_db(matches_data)
+    saved = stored_rows()
+    saver.save_matches_data_to_db(matches_data)
+
+    assert saved[:2] == (len(matches_data), 10 * len(matches_data))
+    assert stored_rows() == saved
+
+
+def test_summoner_page_queries_use_indexes(client, riot):
+    summoner_names = [summoner["name"] for summoner in riot.summoners.values()]
+    # Other summoners in the database, so a full scan would have rows to skip
+    for summoner_name in summoner_names[1:]:
+        load_profile(client, "EUW1", summoner_name)
+
+    statements = record_statements(db.engine)
+    for _ in range(2):
+        assert load_profile(client, "EUW1", summoner_names[0]).status_code == 200
+
+    tables = set(db.metadata.tables)
+    scans = {
+        " ".join(statement.split()): full_scans(statement, parameters, tables)[0]
+        for statement, parameters in statements
+    }
+    assert statements
+    assert {statement: tables for statement, tables in scans.items() if tables} == {}
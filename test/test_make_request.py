@@ -0,0 +1,82 @@
+from contextlib import ExitStack
+
+import pytest
+
+from bench.fake_riot import FakeRiot, FakeRiotServer
+from utils import request_utils
+from utils.request_utils import (
+    MAX_RETRIES, RateLimiter, RiotAuthError, RiotNotFoundError, RiotRateLimitError, RiotServerError, make_request,
+)
+
+
+class FlakyRiot(FakeRiot):
+    """Answers with the given error statuses first, then like FakeRiot."""
+
+    def __init__(self, statuses: list) -> None:
+        super().__init__(summoners=1, matches_per_summoner=1)
+        self.statuses = list(statuses)
+
+    def route(self, path: str, params: dict):
+        if self.statuses:
+            status = self.statuses.pop(0)
+            return status, {"status": {"status_code": status}}
+        return super().route(path, params)
+
+
+@pytest.fixture
+def serve(clock, monkeypatch):
+    """Starts FlakyRiot servers for a test, on a fresh rate limiter and the fake clock."""
+    monkeypatch.setattr(request_utils, "rate_limiter", RateLimiter())
+    with ExitStack() as stack:
+        def serve(statuses: list, headers: dict = None) -> tuple:
+            """(server, url of its summoner by name) of a server answering with statuses first."""
+            riot = FlakyRiot(statuses)
+            server = stack.enter_context(FakeRiotServer(riot, headers=headers))
+            summoner_name = next(iter(riot.summoners.values()))["name"]
+            return server, f"{server.api_base_url.format(region='euw1')}summoner/v4/summoners/by-name/{summoner_name}"
+
+        yield serve
+
+
+def test_429_is_retried_after_retry_after(serve, clock):
+    server, url = serve([429, 429], headers={"Retry-After": "3"})
+
+    assert make_request(url, {})["name"]
+    assert server.request_count == 3
+    assert clock.sleeps == [3, 3]
+
+
+def test_429_on_every_attempt_raises(serve):
+    server, url = serve([429] * (MAX_RETRIES + 1), headers={"Retry-After": "1"})
+
+    with pytest.raises(RiotRateLimitError):
+        make_request(url, {})
+    assert server.request_count == MAX_RETRIES + 1
+
+
+def test_5xx_gives_up_after_max_retries(serve, clock):
+    server, url = serve([503] * (MAX_RETRIES + 1))
+
+    with pytest.raises(RiotServerError) as error:
+        make_request(url, {})
+    assert error.value.status_code == 503
+    assert server.request_count == MAX_RETRIES + 1
+    assert len(clock.sleeps) == MAX_RETRIES
+
+
+def test_5xx_then_success_is_retried(serve):
+    server, url = serve([500, 502])
+
+    assert make_request(url, {})["name"]
+    assert server.request_count == 3
+
+
+@pytest.mark.parametrize("status, error_class", [(401, RiotAuthError), (403, RiotAuthError), (404, RiotNotFoundError)])
+def test_client_errors_are_raised_without_retrying(serve, clock, status, error_class):
+    server, url = serve([status])
+
+    with pytest.raises(error_class) as error:
+        make_request(url, {})
+    assert error.value.status_code == status
+    assert server.request_count == 1
+    assert clock.sleeps == []
@@ -0,0 +1,83 @@
+import pytest
+
+from bench.common import load_profile
+from models.db_models import db, MatchModel, MatchParticipantModel
+from routes.summoner import MATCH_HISTORY_MAX_PAGE_SIZE, format_match_cursor, parse_match_cursor
+
+
+@pytest.fixture
+def summoner_name(client, riot):
+    summoner = next(iter(riot.summoners.values()))
+    riot.add_games(summoner["puuid"], 120 - len(riot.match_ids[summoner["puuid"]]))
+    assert load_profile(client, "EUW1", summoner["name"]).status_code == 200
+    return summoner["name"]
+
+
+def history_url(summoner_name: str) -> str:
+    return f"/api/summoners/EUW1/{summoner_name}/matches"
+
+
+def undate(match_ids: list) -> None:
+    """Leaves matches without a game_start, as the migration from the old per-summoner table does."""
+    for model in (MatchModel, MatchParticipantModel):
+        db.session.execute(db.update(model).where(model.match_id.in_(match_ids)).values(game_start=None))
+    db.session.commit()
+
+
+def all_pages(client, summoner_name: str, limit: int) -> list:
+    pages, cursor = [], None
+    while True:
+        query = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = client.get(history_url(summoner_name), query_string=query)
+        assert response.status_code == 200
+        pages.append(response.json)
+        if not response.json["has_more"]:
+            return pages
+        cursor = response.json["next_cursor"]
+        assert len(pages) < 100
+
+
+def test_pages_cover_dated_and_undated_matches_once(client, summoner_name):
+    stored = [match_id for (match_id,) in db.session.query(MatchModel.match_id).order_by(MatchModel.game_start.desc())]
+    # Undated rows at the start, in the middle and at the end of the dated order
+    undated = stored[:3] + stored[50:60] + stored[-5:]
+    undate(undated)
+
+    pages = all_pages(client, summoner_name, limit=7)
+    match_ids = [match["match_id"] for page in pages for match in page["matches"]]
+
+    assert sorted(match_ids) == sorted(stored)
+    dated = [match_id for match_id in stored if match_id not in undated]
+    assert match_ids == dated + sorted(undated, reverse=True)
+    assert any(page["next_cursor"].startswith("null:") for page in pages[:-1])
+    assert pages[-1]["next_cursor"] is None
+    assert all(len(page["matches"]) == 7 for page in pages[:-1])
+
+
+def test_undated_cursor_continues_among_undated_matches(client, summoner_name):
+    stored = sorted(match_id for (match_id,) in db.session.query(MatchModel.match_id))
+    undate(stored[:4])
+
+    response = client.get(history_url(summoner_name), query_string={"cursor": format_match_cursor((None, stored[2])), "limit": 10})
+
+    assert [match["match_id"] for match in response.json["matches"]] == stored[1::-1]
+    assert not response.json["has_more"]
+
+
+@pytest.mark.parametrize("limit, expected", [(0, 1), (-5, 1), (3, 3), (1000, MATCH_HISTORY_MAX_PAGE_SIZE)])
+def test_limit_is_clamped(client, summoner_name, limit, expected):
+    response = client.get(history_url(summoner_name), query_string={"limit": limit})
+
+    assert len(response.json["matches"]) == expected
+    assert response.json["has_more"]
+
+
+@pytest.mark.parametrize("cursor", ["abc", "123", ":EUW1_1", "12x:EUW1_1", "None:EUW1_1", "-5:EUW1_1"])
+def test_malformed_cursor_is_rejected(client, summoner_name, cursor):
+    assert client.get(history_url(summoner_name), query_string={"cursor": cursor}).status_code == 400
+
+
+@pytest.mark.parametrize("cursor, text", [((1673474400000, "EUW1_1"), "1673474400000:EUW1_1"), ((None, "EUW1_1"), "null:EUW1_1")])
+def test_cursor_round_trip(cursor, text):
+    assert format_match_cursor(cursor) == text
+    assert parse_match_cursor(text) == cursor
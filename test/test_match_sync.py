@@ -0,0 +1,96 @@
+import threading
+from collections import Counter
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from models.database_handler import HISTORY_COMPLETE, INITIAL_SYNC_MATCHES, UNDATED_MATCHES_PER_SYNC
+from models.db_models import db, MatchModel, MatchParticipantModel, SummonerModel
+from models.summoner_data import BACKFILL_PAGE_SIZE, SummonerData, backfill_matches, sync_summoner
+from utils.request_utils import BACKGROUND, INTERACTIVE, current_priority, get_session, method_key
+
+
+def first_summoner(riot) -> dict:
+    return next(iter(riot.summoners.values()))
+
+
+@pytest.fixture
+def riot_calls(app):
+    """(priority, endpoint) of every Riot call, with the count asked of each match id listing."""
+    calls = Counter()
+    listed_counts = []
+    lock = threading.Lock()
+
+    def record(response, *args, **kwargs) -> None:
+        endpoint = method_key(response.url).split("/lol/", 1)[-1]
+        with lock:
+            calls[(current_priority(), endpoint)] += 1
+            if endpoint.endswith("/ids"):
+                listed_counts.append(int(parse_qs(urlparse(response.url).query)["count"][0]))
+
+    get_session().hooks["response"].append(record)
+    yield calls, listed_counts
+    get_session().hooks["response"].remove(record)
+
+
+def undated_rows() -> int:
+    return MatchParticipantModel.query.filter(MatchParticipantModel.game_start.is_(None)).count()
+
+
+def test_backfill_of_undated_legacy_matches_ends(app, riot, riot_server):
+    summoner = first_summoner(riot)
+    riot.add_games(summoner["puuid"], 250 - len(riot.match_ids[summoner["puuid"]]))
+    sync_summoner(summoner["name"], "test", "EUW1")
+    backfill_matches(summoner["name"], "test", "EUW1")
+    stored = MatchModel.query.count()
+
+    # What the migration from the old per-summoner table leaves: no game_start and no sync markers
+    db.session.execute(db.update(MatchModel).values(game_start=None))
+    db.session.execute(db.update(MatchParticipantModel).values(game_start=None))
+    db.session.execute(db.update(SummonerModel).values(matches_synced_until=None, matches_backfilled_to=None, matches_synced_at=None))
+    db.session.commit()
+
+    sync_summoner(summoner["name"], "test", "EUW1")
+    assert undated_rows() == 10 * (stored - UNDATED_MATCHES_PER_SYNC)
+
+    data = SummonerData(summoner["name"], "test", "EUW1")
+    markers = [data.matches_backfilled_to()]
+    for _ in range(stored // BACKFILL_PAGE_SIZE + 2):
+        if markers[-1] == HISTORY_COMPLETE:
+            break
+        markers.append(data.fetch_older_matches(BACKFILL_PAGE_SIZE))
+
+    assert markers[-1] == HISTORY_COMPLETE
+    assert markers[1:-1] == sorted(markers[1:-1], reverse=True) and len(set(markers)) == len(markers)
+    assert undated_rows() == 0
+    assert MatchModel.query.count() == stored
+
+
+def test_first_sync_lists_the_newest_matches_and_backfill_fetches_the_rest(app, riot, riot_server, riot_calls):
+    calls, listed_counts = riot_calls
+    summoner = first_summoner(riot)
+    riot.add_games(summoner["puuid"], 250 - len(riot.match_ids[summoner["puuid"]]))
+    match_ids = "match/v5/matches/by-puuid/{}/ids"
+    match = "match/v5/matches/{}"
+
+    sync_summoner(summoner["name"], "test", "EUW1")
+
+    assert listed_counts == [INITIAL_SYNC_MATCHES]
+    assert calls[(INTERACTIVE, match)] == INITIAL_SYNC_MATCHES
+    assert MatchModel.query.count() == INITIAL_SYNC_MATCHES
+    oldest_synced = db.session.query(db.func.min(MatchModel.game_start)).scalar()
+    assert SummonerData(summoner["name"], "test", "EUW1").matches_backfilled_to() == oldest_synced
+
+    calls.clear()
+    assert backfill_matches(summoner["name"], "test", "EUW1") == HISTORY_COMPLETE
+
+    # Every backfill call is BACKGROUND: 230 older games in pages of BACKFILL_PAGE_SIZE, the last one short
+    assert {priority for priority, _ in calls} == {BACKGROUND}
+    assert calls[(BACKGROUND, match)] == 250 - INITIAL_SYNC_MATCHES
+    assert calls[(BACKGROUND, match_ids)] == -(-(250 - INITIAL_SYNC_MATCHES) // BACKFILL_PAGE_SIZE)
+    assert MatchModel.query.count() == 250
+    assert db.session.query(SummonerModel.matches_backfilled_to).scalar() == HISTORY_COMPLETE
+
+    calls.clear()
+    assert backfill_matches(summoner["name"], "test", "EUW1") == HISTORY_COMPLETE
+    assert not calls
@@ -0,0 +1,118 @@
+import pytest
+
+from utils.request_utils import (
+    BACKGROUND, BACKGROUND_POLL, INTERACTIVE, RateLimiter, TokenBucket, method_key, parse_rate_limits,
+)
+
+
+HOST = "europe.api.riotgames.com"
+MATCH = "/lol/match/v5/matches/{}"
+MATCH_IDS = "/lol/match/v5/matches/by-puuid/{}/ids"
+
+
+def acquire_times(limiter: RateLimiter, clock, count: int, method: str = MATCH, priority: int = INTERACTIVE) -> list:
+    """Seconds since the start at which each of count acquires got its token."""
+    start = clock.now
+    times = []
+    for _ in range(count):
+        limiter.acquire(HOST, method, priority)
+        times.append(round(clock.now - start, 6))
+    return times
+
+
+def test_bucket_refills_when_its_window_closes():
+    bucket = TokenBucket(2, 10)
+    assert bucket.wait_time(0) == 0
+    bucket.consume(0)
+    bucket.consume(3)
+
+    assert bucket.wait_time(4) == 6
+    assert bucket.wait_time(10) == 0
+    assert bucket.tokens == 2
+
+
+def test_bucket_keeps_the_reserve():
+    bucket = TokenBucket(5, 1)
+    for _ in range(3):
+        bucket.consume(0)
+
+    assert bucket.wait_time(0, reserve=2) == 1
+    assert bucket.wait_time(0, reserve=1) == 0
+
+
+def test_acquire_waits_for_both_windows(clock):
+    limiter = RateLimiter(app_limits=((3, 1), (5, 10)))
+
+    # Three per second until the sustained window runs out, then wait for it to close
+    assert acquire_times(limiter, clock, 7) == [0, 0, 0, 1, 1, 10, 10]
+
+
+def test_hosts_have_separate_buckets(clock):
+    limiter = RateLimiter(app_limits=((1, 1),))
+    limiter.acquire(HOST, MATCH)
+    limiter.acquire("euw1.api.riotgames.com", MATCH)
+
+    assert clock.sleeps == []
+
+
+def test_headers_retune_the_app_and_method_buckets(clock):
+    limiter = RateLimiter(app_limits=((100, 1),))
+    limiter.acquire(HOST, MATCH)
+    limiter.update_from_headers(HOST, MATCH, {
+        "X-App-Rate-Limit": "50:1,200:60",
+        "X-App-Rate-Limit-Count": "1:1,1:60",
+        "X-Method-Rate-Limit": "2:10",
+        "X-Method-Rate-Limit-Count": "2:10",
+    })
+
+    # The method window is used up, other methods only share the app windows
+    assert acquire_times(limiter, clock, 1, MATCH_IDS) == [0]
+    assert acquire_times(limiter, clock, 1, MATCH) == [10]
+
+
+def test_counts_header_catches_up_with_requests_made_elsewhere(clock):
+    limiter = RateLimiter(app_limits=((20, 1),))
+    limiter.acquire(HOST, MATCH)
+    limiter.update_from_headers(HOST, MATCH, {"X-App-Rate-Limit": "20:1", "X-App-Rate-Limit-Count": "20:1"})
+
+    assert acquire_times(limiter, clock, 1) == [1]
+
+
+def test_background_requests_leave_the_reserve_to_interactive_ones(clock):
+    limiter = RateLimiter(app_limits=((10, 1),), background_reserve=0.2)
+
+    assert acquire_times(limiter, clock, 9, priority=BACKGROUND) == [0] * 8 + [1]
+    assert acquire_times(limiter, clock, 3, priority=INTERACTIVE) == [0, 0, 0]
+
+
+def test_interactive_waiters_go_first(clock):
+    limiter = RateLimiter(app_limits=((1, 1),))
+    limiter.acquire(HOST, MATCH)
+
+    # An interactive request is now waiting for the window to close
+    wait, waiting = limiter._try_acquire(HOST, MATCH, INTERACTIVE, False)
+    assert wait == 1 and waiting
+    clock.now += wait
+
+    background_wait, _ = limiter._try_acquire(HOST, MATCH, BACKGROUND, False)
+    assert background_wait >= BACKGROUND_POLL
+    assert limiter._try_acquire(HOST, MATCH, INTERACTIVE, waiting) == (0, True)
+    limiter._stop_waiting(HOST)
+    clock.now += 1
+    assert limiter._try_acquire(HOST, MATCH, BACKGROUND, False) == (0, False)
+
+
+def test_parse_rate_limits():
+    assert parse_rate_limits("20:1,100:120") == [(20, 1), (100, 120)]
+    assert parse_rate_limits(" 500:10 , 30000:600") == [(500, 10), (30000, 600)]
+
+
+@pytest.mark.parametrize("url, key", [
+    ("https://europe.api.riotgames.com/lol/match/v5/matches/EUW1_6345549710?api_key=x", "/lol/match/v5/matches/{}"),
+    ("https://europe.api.riotgames.com/lol/match/v5/matches/by-puuid/abc-DEF_123/ids", "/lol/match/v5/matches/by-puuid/{}/ids"),
+    # Lowercase names look like fixed segments: what follows a by-* segment is always an id
+    ("https://euw1.api.riotgames.com/lol/summoner/v4/summoners/by-name/flan", "/lol/summoner/v4/summoners/by-name/{}"),
+    ("https://euw1.api.riotgames.com/lol/league/v4/entries/by-summoner/x1Y2", "/lol/league/v4/entries/by-summoner/{}"),
+])
+def test_method_key_blanks_the_ids(url, key):
+    assert method_key(url) == key
@@ -0,0 +1,49 @@
+import os
+import threading
+import time
+
+from utils.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_run():
+    single_flight = SingleFlight()
+    runs = []
+
+    def run() -> int:
+        runs.append(1)
+        time.sleep(0.1)
+        return 42
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(single_flight.do("key", run))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [42] * 5
+    assert len(runs) == 1
+    assert not single_flight.in_flight("key")
+
+
+def test_lock_files_coordinate_and_are_removed(tmp_path):
+    # flock locks belong to the open file, so two instances in one process behave like two processes
+    leader, follower = SingleFlight(lock_dir=str(tmp_path)), SingleFlight(lock_dir=str(tmp_path))
+    started = threading.Event()
+    results = {}
+
+    def run() -> str:
+        started.set()
+        time.sleep(0.2)
+        return "leader"
+
+    thread = threading.Thread(target=lambda: results.setdefault("leader", leader.do("key", run)))
+    thread.start()
+    assert started.wait(5)
+    results["follower"] = follower.do("key", lambda: "ran again", joined=lambda: "joined")
+    thread.join()
+
+    assert results == {"leader": "leader", "follower": "joined"}
+    assert os.listdir(tmp_path) == []
+    assert follower.do("key", lambda: "next") == "next"
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,56 @@
+import threading
+
+from bench.common import load_profile
+from models.database_handler import summoner_cache
+from models.db_models import MatchModel, MatchParticipantModel, SummonerModel
+from models.summoner_data import SummonerData, sync_summoner
+
+
+def first_summoner(riot) -> dict:
+    return next(iter(riot.summoners.values()))
+
+
+def test_known_summoner_is_built_without_riot_calls(client, riot, counts):
+    summoner_name = first_summoner(riot)["name"]
+    assert load_profile(client, "EUW1", summoner_name).status_code == 200
+
+    assert counts.measure(lambda: SummonerData(summoner_name, "test", "EUW1")) == (0, 0)
+    summoner_cache.clear()
+    assert counts.measure(lambda: SummonerData(summoner_name, "test", "EUW1")) == (1, 0)
+
+
+def test_known_summoner_page_view_makes_no_riot_calls(client, riot, counts):
+    summoner_name = first_summoner(riot)["name"]
+    assert load_profile(client, "EUW1", summoner_name).status_code == 200
+    summoner_cache.clear()
+
+    statements, calls = counts.measure(lambda: load_profile(client, "EUW1", summoner_name))
+    assert calls == 0
+    assert statements <= 7
+    # The second view is served from the page cache
+    assert counts.measure(lambda: load_profile(client, "EUW1", summoner_name)) == (1, 0)
+
+
+def test_concurrent_syncs_of_a_summoner_run_once(app, riot, riot_server, counts):
+    summoner = first_summoner(riot)
+    data_versions = []
+
+    def sync() -> None:
+        with app.app_context():
+            data_versions.append(sync_summoner(summoner["name"], "test", "EUW1"))
+
+    threads = [threading.Thread(target=sync) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    def calls_to(prefix: str) -> int:
+        return sum(calls for path, calls in counts.calls.items() if path.startswith(prefix))
+
+    assert calls_to("match/v5/matches/by-puuid") == 1
+    assert calls_to("league/v4") == 1
+    assert len(set(data_versions)) == 1 and len(data_versions) == 8
+    assert SummonerModel.query.count() == 1
+    stored_matches = MatchModel.query.count()
+    assert MatchParticipantModel.query.count() == 10 * stored_matches
@@ -0,0 +1,22 @@
+import threading
+
+from utils.sync_queue import DONE, SyncQueue
+
+
+def test_pending_jobs_are_not_evicted_by_finished_ones():
+    sync_queue = SyncQueue(workers=1, background_workers=1, finished_jobs_kept=2)
+    release = threading.Event()
+    pending = sync_queue.enqueue("pending", lambda job: release.wait(5), background=True)
+
+    finished = [sync_queue.enqueue(key, lambda job: key) for key in range(5)]
+    for job in finished:
+        assert job.wait(5)
+
+    assert sync_queue.job("pending") is pending
+    assert sync_queue.enqueue("pending", lambda job: None, background=True) is pending
+    assert sync_queue.job(0) is None
+    assert sync_queue.job(4).state == DONE
+
+    release.set()
+    assert pending.wait(5)
+    assert sync_queue.job("pending") is pending
@@ -0,0 +1,24 @@
+from bench.common import wait_for_sync
+
+
+def test_poll_without_a_local_job_keeps_waiting(client, riot):
+    # A poll that lands on a worker that did not queue the sync (several gunicorn workers)
+    summoner_name = next(iter(riot.summoners.values()))["name"]
+
+    status = client.get(f"/summoners/EUW1/{summoner_name}/sync").json
+
+    assert status["state"] != "idle"
+    assert not status["not_found"]
+    wait_for_sync("EUW1", summoner_name)
+    status = client.get(f"/summoners/EUW1/{summoner_name}/sync").json
+    assert not status["not_found"] and status["data_version"] is not None
+
+
+def test_unknown_summoner_is_reported_not_found(client):
+    assert client.get("/summoners/EUW1/nobody here").status_code == 202
+    wait_for_sync("EUW1", "nobody here", raise_error=False)
+
+    status = client.get("/summoners/EUW1/nobody here/sync").json
+
+    assert status["not_found"]
+    assert status["data_version"] is None
@@ -0,0 +1,46 @@
+import asyncio
+from urllib.parse import urlparse
+
+import aiohttp
+
+from utils.request_utils import (
+    MAX_RETRIES, POOL_MAXSIZE, REQUEST_TIMEOUT, RETRY_STATUS_CODES,
+    RiotConnectionError, backoff_delay, current_priority, method_key, rate_limiter, status_error,
+)
+
+
+def create_session() -> aiohttp.ClientSession:
+    """aiohttp session for the Riot API. Must be created (and closed) inside the event loop that uses it."""
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=POOL_MAXSIZE),
+        timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+    )
+
+
+async def make_request_async(session: aiohttp.ClientSession, url: str, params: dict):
+    """Async counterpart of make_request: same rate limiter, retries and errors, without blocking the thread."""
+    host = urlparse(url).netloc
+    method = method_key(url)
+    priority = current_priority()
+
+    for attempt in range(MAX_RETRIES + 1):
+        await rate_limiter.acquire_async(host, method, priority)
+        retry_after = None
+        try:
+            async with session.get(url, params=params) as response:
+                rate_limiter.update_from_headers(host, method, response.headers)
+                if response.ok:
+                    return await response.json()
+
+                error = status_error(response.status, response.reason, str(response.url))
+                if response.status not in RETRY_STATUS_CODES:
+                    raise error
+                retry_after = response.headers.get('Retry-After')
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            error = RiotConnectionError(f"Error connecting to {host} for {method}: {type(e).__name__}")
+
+        if attempt == MAX_RETRIES:
+            raise error
+        delay = backoff_delay(attempt, retry_after)
+        print(f"{error} Retrying in {delay:.1f} seconds.")
+        await asyncio.sleep(delay)
@@ -0,0 +1,94 @@
+import gzip
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+# Fichero SQLite con el JSON original de cada partida; RAW_MATCH_CACHE_PATH="" lo desactiva
+DEFAULT_RAW_MATCH_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instance", "raw_matches.db")
+RAW_MATCH_CACHE_PATH = os.getenv("RAW_MATCH_CACHE_PATH", DEFAULT_RAW_MATCH_CACHE_PATH)
+COMPRESSION_LEVEL = 6
+# Partidas que se leen de cada vez al recorrer la caché entera
+ITER_BATCH_SIZE = 500
+
+
+class RawMatchCache:
+    """Gzip-compressed match/v5/matches/{id} payloads, kept in their own SQLite file.
+
+    A finished match never changes, so its JSON is stored once, exactly as Riot sent it, under its
+    match id. Whatever the app does not parse today (damage, gold, runes...) can be derived later
+    from here instead of refetching the season. The file is separate from the app database so it
+    can grow, be copied or be dropped on its own.
+
+    Each thread gets its own connection; the file uses WAL so readers don't wait for writers.
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS raw_matches (match_id TEXT PRIMARY KEY, payload BLOB NOT NULL, stored_at INTEGER NOT NULL)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    def get(self, match_id: str) -> dict:
+        """The stored payload of match_id, or None."""
+        row = self._connection().execute("SELECT payload FROM raw_matches WHERE match_id = ?", (match_id,)).fetchone()
+        return self._decode(row[0]) if row else None
+
+    def put(self, match_id: str, payload: dict) -> None:
+        data = gzip.compress(json.dumps(payload, separators=(",", ":")).encode(), COMPRESSION_LEVEL)
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR IGNORE INTO raw_matches (match_id, payload, stored_at) VALUES (?, ?, ?)",
+                (match_id, data, int(time.time())),
+            )
+
+    def items(self, batch_size: int = ITER_BATCH_SIZE):
+        """Yields (match_id, payload) for every stored match, reading batch_size rows at a time."""
+        cursor = self._connection().execute("SELECT match_id, payload FROM raw_matches ORDER BY match_id")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for match_id, data in rows:
+                yield match_id, self._decode(data)
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT count(*) FROM raw_matches").fetchone()[0]
+
+    @staticmethod
+    def _decode(data: bytes) -> dict:
+        return json.loads(gzip.decompress(data))
+
+
+raw_match_cache = None
+raw_match_cache_path = RAW_MATCH_CACHE_PATH
+raw_match_cache_lock = threading.Lock()
+
+def get_raw_match_cache() -> RawMatchCache:
+    """Shared cache, opened on first use; None if it is disabled."""
+    global raw_match_cache
+    with raw_match_cache_lock:
+        if raw_match_cache is None and raw_match_cache_path:
+            raw_match_cache = RawMatchCache(raw_match_cache_path)
+        return raw_match_cache
+
+
+def use_raw_match_cache(path: str) -> None:
+    """Points the shared cache at another file, or disables it with None (e.g. benchmarks that count API calls)."""
+    global raw_match_cache, raw_match_cache_path
+    with raw_match_cache_lock:
+        raw_match_cache = None
+        raw_match_cache_path = path
@@ -1,32 +1,358 @@
+import asyncio
+import os
+import random
+import re
 import requests
+import threading
 import time
+from contextlib import contextmanager
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlparse
+
+from utils.riot_fixtures import mount_transport
 
 BURST_LIMIT = 20
 BURST_TIME = 1
 SUSTAINED_LIMIT = 100
 SUSTAINED_TIME = 120
 
-last_request_time = 0
+DEFAULT_APP_LIMITS = ((BURST_LIMIT, BURST_TIME), (SUSTAINED_LIMIT, SUSTAINED_TIME))
 
-def throttle():
-    global last_request_time
-    time_since_last_request = time.time() - last_request_time
-    if time_since_last_request < BURST_TIME:
-        time.sleep(BURST_TIME - time_since_last_request)
-    last_request_time = time.time()
+REQUEST_TIMEOUT = 10
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# Conexiones keep-alive que se guardan por host (europe, euw1...)
+POOL_MAXSIZE = 32
 
+# "record" guarda cada respuesta de Riot en RIOT_FIXTURES_DIR; "replay" responde desde ahí sin red (ver utils.riot_fixtures)
+RIOT_TRANSPORT = os.getenv("RIOT_TRANSPORT", "")
+RIOT_FIXTURES_DIR = os.getenv("RIOT_FIXTURES_DIR", "test/fixtures")
+# Opciones de replay: segundos por respuesta (o "recorded") y parte de las peticiones que reciben un 429
+RIOT_REPLAY_LATENCY = os.getenv("RIOT_REPLAY_LATENCY", "0")
+RIOT_REPLAY_429_RATE = float(os.getenv("RIOT_REPLAY_429_RATE", 0))
 
-def make_request(url, params):
-    throttle()
+# Prioridad de las peticiones: las de segundo plano (p. ej. el backfill de partidas antiguas) ceden ante las interactivas
+INTERACTIVE = 0
+BACKGROUND = 1
+# Parte de cada ventana de rate limit que las peticiones en segundo plano dejan libre para las interactivas
+BACKGROUND_RESERVE = 0.2
+# Segundos entre comprobaciones de una petición en segundo plano que espera a que terminen las interactivas
+BACKGROUND_POLL = 0.05
+
+# Segmentos fijos de un endpoint (lol, match, v5, by-puuid...); el resto son ids
+METHOD_SEGMENT = re.compile(r"^[a-z][a-z0-9-]*$")
+
+
+class TokenBucket:
+    """Holds `limit` tokens for a window of `period` seconds.
+
+    Riot counts requests in fixed windows that open with the first request, so the
+    bucket refills completely once its window closes instead of dripping tokens back.
+    """
+    def __init__(self, limit: int, period: float) -> None:
+        self.limit = limit
+        self.period = period
+        self.tokens = limit
+        self.window_start = None
+
+    def wait_time(self, now: float, reserve: int = 0) -> float:
+        """Seconds until a token is available (0 if there is one now) while leaving `reserve` tokens untouched."""
+        if self.window_start is not None and now - self.window_start >= self.period:
+            self.tokens = self.limit
+            self.window_start = None
+        if self.tokens > reserve:
+            return 0
+        if self.window_start is None:
+            return self.period
+        return self.window_start + self.period - now
+
+    def consume(self, now: float) -> None:
+        if self.window_start is None:
+            self.window_start = now
+        self.tokens -= 1
+
+    def sync(self, count: int, now: float) -> None:
+        """Lowers the remaining tokens to match the count Riot reports for this window."""
+        if self.window_start is None:
+            self.window_start = now
+        self.tokens = min(self.tokens, self.limit - count)
+
+
+class RateLimiter:
+    """Thread-safe limiter for the Riot API.
+
+    Every routing host (europe, euw1...) gets its own app-level buckets, and every
+    (host, method) pair gets method-level buckets once Riot reports them. A request
+    needs a token from all of them, so both the burst and the sustained window are
+    used up to their limit and never past it.
+
+    BACKGROUND requests only use what interactive ones leave: they keep
+    `background_reserve` of every window free and wait while an INTERACTIVE request
+    to the same host is waiting for a token.
+    """
+    def __init__(self, app_limits=DEFAULT_APP_LIMITS, background_reserve: float = BACKGROUND_RESERVE) -> None:
+        self.app_limits = tuple(app_limits)
+        self.background_reserve = background_reserve
+        self._app_buckets = {}
+        self._method_buckets = {}
+        # Peticiones INTERACTIVE esperando un token, por host
+        self._interactive_waiting = {}
+        self._lock = threading.Lock()
+
+    def _buckets(self, host: str, method: str) -> list:
+        if host not in self._app_buckets:
+            self._app_buckets[host] = [TokenBucket(limit, period) for limit, period in self.app_limits]
+        return self._app_buckets[host] + self._method_buckets.get((host, method), [])
+
+    def acquire(self, host: str, method: str, priority: int = INTERACTIVE) -> None:
+        """Blocks until a request to `method` on `host` fits in every window, then reserves it."""
+        waiting = False
+        try:
+            while True:
+                wait, waiting = self._try_acquire(host, method, priority, waiting)
+                if wait <= 0:
+                    return
+                time.sleep(wait)
+        finally:
+            if waiting:
+                self._stop_waiting(host)
+
+    async def acquire_async(self, host: str, method: str, priority: int = INTERACTIVE) -> None:
+        """Same as acquire, but waits with asyncio.sleep so the event loop keeps serving other tasks."""
+        waiting = False
+        try:
+            while True:
+                wait, waiting = self._try_acquire(host, method, priority, waiting)
+                if wait <= 0:
+                    return
+                await asyncio.sleep(wait)
+        finally:
+            if waiting:
+                self._stop_waiting(host)
+
+    def _try_acquire(self, host: str, method: str, priority: int, waiting: bool) -> tuple:
+        """Reserves the request if it fits now. Returns (seconds to wait before trying again or 0, waiting),
+        where waiting says whether the caller is now counted as an INTERACTIVE request waiting on host."""
+        with self._lock:
+            now = time.monotonic()
+            buckets = self._buckets(host, method)
+            if priority == INTERACTIVE:
+                wait = max(bucket.wait_time(now) for bucket in buckets)
+            else:
+                wait = max(bucket.wait_time(now, int(bucket.limit * self.background_reserve)) for bucket in buckets)
+                if self._interactive_waiting.get(host):
+                    wait = max(wait, BACKGROUND_POLL)
+            if wait <= 0:
+                for bucket in buckets:
+                    bucket.consume(now)
+                return 0, waiting
+            if priority == INTERACTIVE and not waiting:
+                self._interactive_waiting[host] = self._interactive_waiting.get(host, 0) + 1
+            return wait, waiting or priority == INTERACTIVE
+
+    def _stop_waiting(self, host: str) -> None:
+        with self._lock:
+            self._interactive_waiting[host] -= 1
+
+    def update_from_headers(self, host: str, method: str, headers) -> None:
+        """Tunes the buckets to the X-App-Rate-Limit / X-Method-Rate-Limit headers of a response."""
+        with self._lock:
+            now = time.monotonic()
+            self._buckets(host, method)
+            self._app_buckets[host] = self._tuned(
+                self._app_buckets[host],
+                headers.get("X-App-Rate-Limit"),
+                headers.get("X-App-Rate-Limit-Count"),
+                now,
+            )
+            self._method_buckets[(host, method)] = self._tuned(
+                self._method_buckets.get((host, method), []),
+                headers.get("X-Method-Rate-Limit"),
+                headers.get("X-Method-Rate-Limit-Count"),
+                now,
+            )
+
+    @staticmethod
+    def _tuned(buckets: list, limits_header: str, counts_header: str, now: float) -> list:
+        if limits_header:
+            limits = parse_rate_limits(limits_header)
+            if limits != [(bucket.limit, bucket.period) for bucket in buckets]:
+                buckets = [TokenBucket(limit, period) for limit, period in limits]
+        if counts_header:
+            counts = {period: count for count, period in parse_rate_limits(counts_header)}
+            for bucket in buckets:
+                if bucket.period in counts:
+                    bucket.sync(counts[bucket.period], now)
+        return buckets
+
+
+def parse_rate_limits(header: str) -> list:
+    """'20:1,100:120' -> [(20, 1), (100, 120)]"""
+    limits = []
+    for window in header.split(","):
+        value, period = window.strip().split(":")
+        limits.append((int(value), int(period)))
+    return limits
+
+
+def method_key(url: str) -> str:
+    """Path of a Riot endpoint with its ids blanked out, e.g. /lol/match/v5/matches/{}."""
+    segments = urlparse(url).path.split("/")
+    for index, segment in enumerate(segments):
+        if not METHOD_SEGMENT.match(segment) or (index > 0 and segments[index - 1].startswith("by-")):
+            segments[index] = "{}" if segment else segment
+    return "/".join(segments)
+
+
+class RiotAPIError(Exception):
+    """Base error for failed Riot API requests."""
+    def __init__(self, message: str, status_code: int = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class RiotConnectionError(RiotAPIError):
+    """The API could not be reached (connection error or timeout)."""
+
+
+class RiotAuthError(RiotAPIError):
+    """401/403: the API key is missing, invalid or expired."""
+
+
+class RiotNotFoundError(RiotAPIError):
+    """404: the summoner, match or league entry does not exist."""
+
+
+class RiotRateLimitError(RiotAPIError):
+    """429 returned after every retry."""
+
+
+class RiotServerError(RiotAPIError):
+    """5xx returned after every retry."""
+
+
+def api_error(response: requests.Response) -> RiotAPIError:
+    return status_error(response.status_code, response.reason, response.url)
+
+
+def status_error(status_code: int, reason: str, url: str) -> RiotAPIError:
+    """The RiotAPIError subclass for an HTTP error status of a Riot endpoint."""
+    if status_code in (401, 403):
+        error_class = RiotAuthError
+    elif status_code == 404:
+        error_class = RiotNotFoundError
+    elif status_code == 429:
+        error_class = RiotRateLimitError
+    elif status_code >= 500:
+        error_class = RiotServerError
+    else:
+        error_class = RiotAPIError
+    return error_class(f"Error fetching data from API: {status_code} {reason} for {method_key(url)}", status_code)
+
+
+def backoff_delay(attempt: int, retry_after: str = None) -> float:
+    """Seconds to wait before retry number `attempt` (0-based).
+
+    Retry-After wins when Riot sends it; otherwise the delay doubles each attempt up
+    to BACKOFF_MAX, with jitter so concurrent workers do not retry in lockstep.
+    """
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)
+    return random.uniform(delay / 2, delay)
+
+
+session = None
+session_lock = threading.Lock()
+transport = None
+
+if RIOT_TRANSPORT == "replay":
+    transport = {
+        "mode": "replay",
+        "directory": RIOT_FIXTURES_DIR,
+        "latency": RIOT_REPLAY_LATENCY if RIOT_REPLAY_LATENCY == "recorded" else float(RIOT_REPLAY_LATENCY),
+        "rate_limit_rate": RIOT_REPLAY_429_RATE,
+    }
+elif RIOT_TRANSPORT:
+    transport = {"mode": RIOT_TRANSPORT, "directory": RIOT_FIXTURES_DIR}
+
+
+def get_session() -> requests.Session:
+    """Shared session, so every routing host keeps a pool of keep-alive connections."""
+    global session
+    with session_lock:
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=POOL_MAXSIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            if transport is not None:
+                mount_transport(session, **transport)
+        return session
+
+
+def use_transport(mode: str = None, directory: str = RIOT_FIXTURES_DIR, **options):
+    """Makes make_request record to or replay from the fixtures in directory (see utils.riot_fixtures),
+    or go back to the network with mode None. Returns the new adapter, e.g. for its request_count."""
+    global session, transport
+    with session_lock:
+        if session is not None:
+            session.close()
+        transport = {"mode": mode, "directory": directory, **options} if mode else None
+        session = None
+    get_session()
+    return session.get_adapter("https://") if mode else None
+
+
+rate_limiter = RateLimiter()
+request_context = threading.local()
+
+
+def current_priority() -> int:
+    """Priority of the requests made by this thread (INTERACTIVE unless inside request_priority)."""
+    return getattr(request_context, "priority", INTERACTIVE)
+
+
+@contextmanager
+def request_priority(priority: int):
+    """Makes the Riot requests of this thread inside the block use `priority`."""
+    previous = current_priority()
+    request_context.priority = priority
     try:
-        response = requests.get(url=url, params=params)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        if response.status_code == 429:
-            retry_after = int(response.headers.get('Retry-After', 1))
-            print(f"API rate limit exceeded. Retrying in {retry_after} seconds.")
-            time.sleep(retry_after)
-            return make_request(url, params)
+        yield
+    finally:
+        request_context.priority = previous
+
+
+def make_request(url, params):
+    host = urlparse(url).netloc
+    method = method_key(url)
+    priority = current_priority()
+
+    for attempt in range(MAX_RETRIES + 1):
+        rate_limiter.acquire(host, method, priority)
+        retry_after = None
+        try:
+            response = get_session().get(url=url, params=params, timeout=REQUEST_TIMEOUT)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            error = RiotConnectionError(f"Error connecting to {host} for {method}: {type(e).__name__}")
         else:
-            raise Exception(f"Error fetching data from API: {e}")
\ No newline at end of file
+            rate_limiter.update_from_headers(host, method, response.headers)
+            if response.ok:
+                return response.json()
+
+            error = api_error(response)
+            if response.status_code not in RETRY_STATUS_CODES:
+                raise error
+            retry_after = response.headers.get('Retry-After')
+
+        if attempt == MAX_RETRIES:
+            raise error
+        delay = backoff_delay(attempt, retry_after)
+        print(f"{error} Retrying in {delay:.1f} seconds.")
+        time.sleep(delay)
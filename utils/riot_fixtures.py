@@ -0,0 +1,152 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+
+# Cabeceras que se guardan con cada respuesta: las del rate limit son las que ajustan el RateLimiter al reproducirlas
+FIXTURE_HEADERS = (
+    "Content-Type", "Retry-After", "X-Rate-Limit-Type",
+    "X-App-Rate-Limit", "X-App-Rate-Limit-Count", "X-Method-Rate-Limit", "X-Method-Rate-Limit-Count",
+)
+
+
+class MissingFixtureError(LookupError):
+    """Replay mode got a request that was never recorded."""
+
+
+def fixture_path(directory: str, url: str) -> str:
+    """File of the fixture for a Riot API url, the same whichever host served it.
+
+    https://euw1.api.riotgames.com/lol/summoner/v4/... and a local fake server's
+    http://127.0.0.1:8000/euw1/lol/summoner/v4/... both map to
+    <directory>/euw1/summoner/v4/....json. The api_key is left out and the query is
+    sorted, so a fixture recorded with one key replays with any other.
+    """
+    parsed = urlparse(url)
+    prefix, _, endpoint = parsed.path.partition("/lol/")
+    region = prefix.strip("/") or parsed.hostname.split(".")[0]
+    query = urlencode(sorted((key, value) for key, value in parse_qsl(parsed.query) if key != "api_key"))
+    name = endpoint.strip("/") + (f"__{query}" if query else "")
+    return os.path.join(directory, region.lower(), *name.split("/")) + ".json"
+
+
+class RecordingAdapter(BaseAdapter):
+    """Sends requests through another adapter and writes every response (status, rate
+    limit headers, body and elapsed time) to a fixture file that ReplayAdapter can
+    serve later. A url requested twice keeps its last response.
+    """
+    def __init__(self, directory: str, adapter: BaseAdapter) -> None:
+        super().__init__()
+        self.directory = directory
+        self.adapter = adapter
+
+    def send(self, request, **kwargs) -> requests.Response:
+        response = self.adapter.send(request, **kwargs)
+        try:
+            body = response.json()
+        except ValueError:
+            body = response.text
+        fixture = {
+            "url": request.url.split("?")[0],
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": {name: response.headers[name] for name in FIXTURE_HEADERS if name in response.headers},
+            "elapsed": response.elapsed.total_seconds(),
+            "body": body,
+        }
+        path = fixture_path(self.directory, request.url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Fichero temporal + replace: las partidas se piden desde varios hilos
+        temporary_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump(fixture, file, ensure_ascii=False)
+        os.replace(temporary_path, path)
+        return response
+
+    def close(self) -> None:
+        self.adapter.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """Answers requests from the fixtures of RecordingAdapter, without any network access.
+
+    latency is the seconds each response takes ("recorded" reuses the time the real
+    one took). rate_limit_rate is the share of requests answered with a 429 and a
+    Retry-After of retry_after seconds instead, picked from the seed, the url and
+    the attempt, so every run injects them in the same places. A request with no fixture raises
+    MissingFixtureError.
+    """
+    def __init__(self, directory: str, latency=0.0, rate_limit_rate: float = 0.0, retry_after: float = 1, seed: int = 0) -> None:
+        super().__init__()
+        self.directory = directory
+        self.latency = latency
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.seed = seed
+        self.request_count = 0
+        self.rate_limited_count = 0
+        self._attempts = Counter()
+        self._lock = threading.Lock()
+
+    def send(self, request, **kwargs) -> requests.Response:
+        path = fixture_path(self.directory, request.url)
+        try:
+            with open(path, encoding="utf-8") as file:
+                fixture = json.load(file)
+        except FileNotFoundError:
+            raise MissingFixtureError(f"No fixture for {request.url.split('?')[0]} ({path})") from None
+
+        with self._lock:
+            self.request_count += 1
+            self._attempts[path] += 1
+            # Se decide por url e intento, no por orden de llegada: los hilos de las partidas no cambian dónde caen los 429
+            rate_limited = random.Random(f"{self.seed}:{path}:{self._attempts[path]}").random() < self.rate_limit_rate
+            self.rate_limited_count += rate_limited
+        time.sleep(fixture["elapsed"] if self.latency == "recorded" else self.latency)
+
+        if rate_limited:
+            fixture = {
+                "status": 429,
+                "reason": "Too Many Requests",
+                "headers": {**fixture["headers"], "Retry-After": str(self.retry_after), "X-Rate-Limit-Type": "application"},
+                "body": {"status": {"message": "Rate limit exceeded", "status_code": 429}},
+            }
+        return self._response(request, fixture)
+
+    def _response(self, request, fixture: dict) -> requests.Response:
+        response = requests.Response()
+        response.status_code = fixture["status"]
+        response.reason = fixture["reason"]
+        response.headers = CaseInsensitiveDict(fixture["headers"])
+        body = fixture["body"]
+        response._content = (body if isinstance(body, str) else json.dumps(body)).encode()
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+def mount_transport(session: requests.Session, mode: str, directory: str, **options) -> BaseAdapter:
+    """Mounts on session the adapter of mode ("record" or "replay") for every http(s) url and returns it.
+    Recording goes through the adapter already mounted for https."""
+    if mode == "record":
+        adapter = RecordingAdapter(directory, session.get_adapter("https://"), **options)
+    elif mode == "replay":
+        adapter = ReplayAdapter(directory, **options)
+    else:
+        raise ValueError(f"Unknown Riot API transport {mode!r}, expected 'record' or 'replay'")
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return adapter
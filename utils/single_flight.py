@@ -0,0 +1,146 @@
+import asyncio
+import hashlib
+import os
+import threading
+from concurrent.futures import Future
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; concurrent callers with the same key share its outcome.
+
+    Within a process, the first caller (the leader) runs `fn` and the threads that arrive while it
+    runs wait for it and get the same return value or exception.
+
+    With `lock_dir`, the leader also holds an exclusive lock file for the key, so callers in other
+    processes (several gunicorn workers) coalesce too. The leader deletes the file before releasing it. A process cannot hand its return value to
+    another one, so a caller that had to wait for another process's leader gets `joined()` instead,
+    which should read the result back from wherever the leader stored it (e.g. the database).
+    """
+    def __init__(self, lock_dir: str = None) -> None:
+        if lock_dir and fcntl is None:
+            raise RuntimeError("lock files need fcntl, which is not available on this platform")
+        self.lock_dir = lock_dir
+        self._calls = {}
+        self._lock = threading.Lock()
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+
+    def do(self, key, fn, joined=None):
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = Future()
+
+        if not is_leader:
+            return call.result()
+
+        try:
+            result = self._run(key, fn, joined)
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    async def do_async(self, key, fn, joined=None):
+        """Like do, for a coroutine function `fn`, without blocking the event loop while waiting.
+
+        Shares the calls of do: a task and a thread with the same key wait for each other, whichever
+        came first. `joined` is still a plain function.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = Future()
+
+        if not is_leader:
+            return await asyncio.wrap_future(call)
+
+        try:
+            result = await self._run_async(key, fn, joined)
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def in_flight(self, key) -> bool:
+        with self._lock:
+            return key in self._calls
+
+    def _run(self, key, fn, joined):
+        if not self.lock_dir:
+            return fn()
+
+        lock_file, locked = self._acquire_lock_file(key)
+        if not locked:
+            # Otro proceso ya lo está haciendo: se espera a que suelte el lock y se usa su resultado
+            with lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            return joined() if joined else fn()
+        try:
+            return fn()
+        finally:
+            self._release_lock_file(key, lock_file)
+
+    async def _run_async(self, key, fn, joined):
+        if not self.lock_dir:
+            return await fn()
+
+        lock_file, locked = self._acquire_lock_file(key)
+        if not locked:
+            # La espera al lock del otro proceso va en un hilo aparte para no parar el event loop
+            with lock_file:
+                await asyncio.to_thread(fcntl.flock, lock_file, fcntl.LOCK_EX)
+            return joined() if joined else await fn()
+        try:
+            return await fn()
+        finally:
+            self._release_lock_file(key, lock_file)
+
+    def _acquire_lock_file(self, key) -> tuple:
+        """Opens the lock file of key and tries to lock it without waiting. Returns (file, whether it is locked)."""
+        path = self._lock_path(key)
+        while True:
+            lock_file = open(path, "a")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return lock_file, False
+            if self._is_lock_path(lock_file, path):
+                return lock_file, True
+            # El líder anterior ha borrado el fichero entre el open y el flock: hay que bloquear el que haya ahora
+            lock_file.close()
+
+    def _release_lock_file(self, key, lock_file) -> None:
+        # Se borra antes de soltar el lock, así los ficheros no se acumulan y nadie puede bloquear uno ya borrado sin darse cuenta (_acquire_lock_file)
+        os.unlink(self._lock_path(key))
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+
+    @staticmethod
+    def _is_lock_path(lock_file, path: str) -> bool:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return False
+        opened = os.fstat(lock_file.fileno())
+        return (stat.st_dev, stat.st_ino) == (opened.st_dev, opened.st_ino)
+
+    def _lock_path(self, key) -> str:
+        return os.path.join(self.lock_dir, hashlib.sha1(repr(key).encode()).hexdigest() + ".lock")
@@ -0,0 +1,137 @@
+import queue
+import threading
+import time
+import traceback
+
+from cachetools import LRUCache
+
+
+# Hilos que ejecutan sincronizaciones en cada proceso
+SYNC_WORKERS = 2
+# Hilos aparte para los trabajos en segundo plano (backfill), así nunca ocupan los de las sincronizaciones
+BACKGROUND_WORKERS = 1
+# Trabajos terminados que se recuerdan para el endpoint de progreso
+FINISHED_JOBS_KEPT = 4096
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class SyncJob:
+    """One summoner sync waiting in or taken from a SyncQueue.
+
+    `target(job)` does the work and may call `job.report(fetched, total)` while it runs; its
+    return value ends up in `job.result` and any exception in `job.error`.
+    """
+    def __init__(self, key, target) -> None:
+        self.key = key
+        self.target = target
+        self.state = QUEUED
+        self.fetched = 0
+        self.total = 0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._finished = threading.Event()
+
+    @property
+    def pending(self) -> bool:
+        return self.state in (QUEUED, RUNNING)
+
+    def report(self, fetched: int, total: int) -> None:
+        self.fetched = fetched
+        self.total = total
+
+    def wait(self, timeout: float = None) -> bool:
+        """Blocks until the job has finished; False if timeout ran out first."""
+        return self._finished.wait(timeout)
+
+    def run(self) -> None:
+        self.state = RUNNING
+        try:
+            self.result = self.target(self)
+        except Exception as e:
+            self.error = e
+            self.state = FAILED
+            traceback.print_exc()
+        else:
+            self.state = DONE
+        finally:
+            self.finished_at = time.time()
+            self._finished.set()
+
+    def status(self) -> dict:
+        return {
+            "state": self.state,
+            "fetched": self.fetched,
+            "total": self.total,
+            "error": str(self.error) if self.error else None,
+        }
+
+
+class SyncQueue:
+    """In-process job queue served by background worker threads.
+
+    Jobs are identified by a key (the summoner); enqueuing a key that already has a queued or
+    running job returns that job instead of adding another, so any number of page views of the
+    same profile cost a single sync. The workers are daemon threads started with the first job.
+
+    Background jobs (e.g. backfilling a summoner's older matches) wait in their own queue, served
+    by their own workers, so a long backfill never delays the syncs of the profiles being viewed.
+    """
+    def __init__(self, workers: int = SYNC_WORKERS, background_workers: int = BACKGROUND_WORKERS, finished_jobs_kept: int = FINISHED_JOBS_KEPT) -> None:
+        self.workers = workers
+        self.background_workers = background_workers
+        self._queue = queue.Queue()
+        self._background_queue = queue.Queue()
+        # Los trabajos pendientes no se pueden perder; solo los terminados van a la caché con tamaño máximo
+        self._pending_jobs = {}
+        self._finished_jobs = LRUCache(maxsize=finished_jobs_kept)
+        self._lock = threading.Lock()
+        self._threads = []
+        self._background_threads = []
+
+    def enqueue(self, key, target, background: bool = False) -> SyncJob:
+        with self._lock:
+            job = self._pending_jobs.get(key)
+            if job is not None and job.pending:
+                return job
+
+            job = self._pending_jobs[key] = SyncJob(key, target)
+            if background:
+                self._start_workers(self._background_threads, self.background_workers, self._background_queue, "backfill-worker")
+            else:
+                self._start_workers(self._threads, self.workers, self._queue, "sync-worker")
+        (self._background_queue if background else self._queue).put(job)
+        return job
+
+    def job(self, key) -> SyncJob:
+        """The pending or most recent job for key, or None."""
+        with self._lock:
+            job = self._pending_jobs.get(key)
+            return job if job is not None else self._finished_jobs.get(key)
+
+    def _start_workers(self, threads: list, workers: int, jobs: queue.Queue, name: str) -> None:
+        while len(threads) < workers:
+            thread = threading.Thread(target=self._work, args=(jobs,), name=f"{name}-{len(threads)}", daemon=True)
+            thread.start()
+            threads.append(thread)
+
+    def _work(self, jobs: queue.Queue) -> None:
+        while True:
+            job = jobs.get()
+            job.run()
+            self._finish(job)
+
+    def _finish(self, job: SyncJob) -> None:
+        with self._lock:
+            # Si ya se ha encolado otro trabajo para la misma clave, ese sigue siendo el pendiente
+            if self._pending_jobs.get(job.key) is job:
+                del self._pending_jobs[job.key]
+            self._finished_jobs[job.key] = job
+
+
+sync_queue = SyncQueue()